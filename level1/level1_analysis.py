@@ -11,87 +11,201 @@
 # Additionally, create a bar chart visualization to display the top 3 cuisines.
 
 # Import necessary libraries
+# Plotting libraries are imported inside the chart draw functions, so startup stays fast
+import time
+START_TIME = time.perf_counter()
+from collections import Counter
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-
-# Example code
-print("Hello, Cognifyz Technologies!")
-
-# Load the dataset into a DataFrame
-try:
-    df = pd.read_csv("cognifyz_dataset.csv")
-except FileNotFoundError:
-    print("Error: The file 'cognifyz_dataset.csv' was not found.")
-    exit(1)
-except pd.errors.EmptyDataError:
-    print("Error: The file 'cognifyz_dataset.csv' is empty.")
-    exit(1)
-except pd.errors.ParserError:
-    print("Error: The file 'cognifyz_dataset.csv' could not be parsed.")
-    exit(1)
-except Exception as e:
-    print(f"An unexpected error occurred: {e}")
-    exit(1)
-
-# Display the first few rows of the DataFrame
-print(df.head())
-
-# Print the column names to check the available columns
-print(df.columns)
-
-# Check for unique city names
-unique_cities = df['City'].unique()
-print("Unique city names:\n", unique_cities)
-
-# Inspect rows where the city is 'Inner City'
-inner_city_rows = df[df['City'] == 'Inner City']
-print("Rows with 'Inner City':\n", inner_city_rows)
-
-# Exclude 'Inner City' from the DataFrame
-df = df[df['City'] != 'Inner City']
-
-# Check for missing values in the 'Cuisines' column
-if df['Cuisines'].isnull().any():
-    print("Warning: There are missing values in the 'Cuisines' column. These rows will be excluded.")
-    df = df.dropna(subset=['Cuisines'])
+import os
+import sys
+
+# Make the shared 'restaurants' package importable when run as a script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from restaurants.aggregation import Grouper
+from restaurants.artifacts import open_output
+from restaurants.charts import submit_chart
+from restaurants.incremental import incremental_aggregates
+from restaurants.metrics import DEBUG, count_rows_out, debug, enabled, log, warn
+from restaurants.runner import arguments, intermediate, run_level, task
+from restaurants.streaming import DEFAULT_CHUNKSIZE, CountAccumulator, MeanAccumulator, iter_chunks
+
+# Columns used by the Level 1 tasks; nothing else is parsed from the CSV
+LEVEL_1_COLUMNS = ['City', 'Cuisines', 'Price range', 'Has Online delivery', 'Aggregate rating']
+
+# 'Has Online delivery' is loaded as a boolean; label the chart bars as in the CSV
+DELIVERY_LABELS = {True: 'Yes', False: 'No'}
+
+# The tasks below are registered with the task runner (restaurants/runner.py).
+# Running this script executes all of them; `python -m restaurants run level1.task2`
+# runs a single task together with only the intermediates it requires.
+
+
+@arguments('level1')
+def add_arguments(parser):
+    # Tasks 1-4 only need counts and means, so they are computed from mergeable
+    # accumulators. The in-memory run feeds the whole DataFrame as one chunk and
+    # --stream feeds the CSV chunk by chunk; both write identical output files.
+    parser.add_argument("--stream", action="store_true", help="read the CSV in chunks with constant memory instead of loading it at once")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="rows per chunk in --stream mode")
+
+
+def accumulate(chunks, index=None, sketches=None):
+    """Reduce DataFrame chunks to the counts and means needed by Tasks 1-4.
+
+    With the bitmap `index` of the loaded dataset (passed as a single chunk),
+    the delivery split is counted from its bitmaps. With `sketches`
+    ({'cuisines': HeavyHitters, 'distinct': {column: HyperLogLog}}), cuisine
+    combinations are counted approximately in bounded memory.
+    """
+    aggregates = {
+        'rows': 0,
+        'missing_cuisines': 0,
+        'missing': Counter(),
+        'cuisines': CountAccumulator(),
+        'cities': CountAccumulator(),
+        'city_ratings': MeanAccumulator(),
+        'price_ranges': CountAccumulator(),
+        'online_delivery': CountAccumulator(),
+        'online_delivery_ratings': MeanAccumulator(),
+    }
+    if sketches:
+        aggregates.update(sketches)
+    for chunk in chunks:
+        # Exclude 'Inner City' and rows without cuisines, as the in-memory analysis always has,
+        # by masking them out of the grouping rather than copying the chunk
+        outside_inner_city = (chunk['City'] != 'Inner City').to_numpy()
+        missing_cuisines = chunk['Cuisines'].isnull().to_numpy() & outside_inner_city
+        aggregates['missing_cuisines'] += int(missing_cuisines.sum())
+        rows = outside_inner_city & ~missing_cuisines
+
+        # Every table below comes from the same factorized key columns
+        grouped = Grouper(chunk, rows=rows)
+        aggregates['rows'] += int(rows.sum())
+        aggregates['missing'].update(grouped.missing(chunk.columns))
+        # Counts are added in order of first appearance, which value_counts() keeps for equal counts
+        cuisines = grouped.first_seen('Cuisines')
+        cities = grouped.first_seen('City')
+        aggregates['cuisines'].add(cuisines)
+        aggregates['cities'].add(cities)
+        if sketches:
+            aggregates['distinct']['Cuisines'].add(list(cuisines))
+            aggregates['distinct']['City'].add(list(cities))
+        aggregates['city_ratings'].add(grouped.observed(['City', 'Aggregate rating']))
+        aggregates['price_ranges'].add(grouped.first_seen('Price range'))
+        if index is None:
+            aggregates['online_delivery'].add(grouped.first_seen('Has Online delivery'))
+        else:
+            aggregates['online_delivery'].add(index.first_seen('Has Online delivery', where=rows))
+        aggregates['online_delivery_ratings'].add(grouped.observed(['Has Online delivery', 'Aggregate rating']))
+    return aggregates
+
+
+@intermediate('level1.aggregates', requires=['run'], columns=LEVEL_1_COLUMNS)
+def level1_aggregates(run):
+    """Counts and means shared by Tasks 1-4, from the loaded dataset, streamed chunks or saved state."""
+    # Example code
+    log("Hello, Cognifyz Technologies!")
+
+    # Sketches only grow, so saved aggregates that also retract rows stay exact
+    sketches = None
+    if run.approximate and run.incremental:
+        warn("Warning: --approximate is ignored with --incremental; counts stay exact.")
+    elif run.approximate:
+        sketches = {'cuisines': run.heavy_hitters(), 'distinct': {'City': run.distinct_counter(), 'Cuisines': run.distinct_counter()}}
+
+    # Update the saved aggregates with new or changed restaurants only
+    if run.incremental:
+        aggregates = incremental_aggregates('level1.aggregates', LEVEL_1_COLUMNS, accumulate, path=run.path, delta=run.options.delta)
+    # Load the dataset into a DataFrame, or open it for chunked reading
+    elif getattr(run.options, 'stream', False):
+        log(f"Streaming the dataset in chunks of {run.options.chunksize} rows")
+        aggregates = accumulate(iter_chunks(LEVEL_1_COLUMNS, path=run.path, chunksize=run.options.chunksize), sketches=sketches)
+    else:
+        df = run.get('dataset')
+
+        # Inspecting the frame is only worth its cost when debugging
+        if enabled(DEBUG):
+            # Display the first few rows of the DataFrame
+            debug(df.head())
+
+            # Print the column names to check the available columns
+            debug(df.columns)
+
+            # Check for unique city names
+            unique_cities = df['City'].unique()
+            debug("Unique city names:\n", unique_cities)
+
+            # Inspect rows where the city is 'Inner City'
+            inner_city_rows = df[df['City'] == 'Inner City']
+            debug("Rows with 'Inner City':\n", inner_city_rows)
+
+        aggregates = accumulate([df[LEVEL_1_COLUMNS]], index=run.get('bitmaps'), sketches=sketches)
+
+    # Check for missing values in the 'Cuisines' column
+    if aggregates['missing_cuisines']:
+        warn("Warning: There are missing values in the 'Cuisines' column. These rows will be excluded.")
+    return aggregates
+
 
 # Task 1: Top Cuisines
-with open("Level_1_Task_1_Output.txt", "w") as file:
-    try:
-        cuisine_counts = df['Cuisines'].value_counts()
-        top_3_cuisines = cuisine_counts[:3]
-        total_restaurants = len(df)
-
-        # Calculate the percentage of restaurants serving each of the top cuisine
-        top_3_percentages = (top_3_cuisines / total_restaurants) * 100
-
-        # Print the results neatly
-        file.write("Top 3 Cuisines:\n")
-        for cuisine, count, percentage in zip(top_3_cuisines.index, top_3_cuisines.values, top_3_percentages.values):
-            file.write(f"{cuisine}: {count} restaurants ({percentage:.2f}%)\n")
-
-        # Create a bar chart visualization
-        plt.figure(figsize=(10, 6))
-        sns.barplot(x=top_3_cuisines.index, y=top_3_cuisines.values, palette="viridis", hue=top_3_cuisines.index, dodge=False)
-        plt.title("Top 3 Cuisines")
-        plt.xlabel("Cuisine")
-        plt.ylabel("Number of Restaurants")
-        plt.legend([],[], frameon=False)
-
-        # Add labels to the bars
-        for index, value in enumerate(top_3_cuisines.values):
-            plt.text(index, value, str(value), ha='center', va='bottom')
-
-        plt.savefig("Level_1_Task_1_Top_3_Cuisines.png")
-        plt.show()
-
-    except KeyError:
-        file.write('Error: The column "Cuisines" does not exist in the DataFrame.\n')
-    except Exception as e:
-        file.write(f"An unexpected error occurred while processing the data: {e}\n")
-
-print("Finished Task 1: Top Cuisines")  # Debug print
+@task('level1.task1', requires=['level1.aggregates'], incremental=True)
+def task1(aggregates):
+    # Number of restaurants left after excluding 'Inner City' and missing cuisines
+    total_restaurants = aggregates['rows']
+
+    with open_output("Level_1_Task_1_Output.txt") as file:
+        try:
+            cuisine_counts = aggregates['cuisines'].to_series()
+            count_rows_out(len(cuisine_counts))
+            top_3_cuisines = cuisine_counts[:3]
+
+            # Calculate the percentage of restaurants serving each of the top cuisine
+            top_3_percentages = (top_3_cuisines / total_restaurants) * 100
+
+            # Print the results neatly
+            file.write("Top 3 Cuisines:\n")
+            for cuisine, count, percentage in zip(top_3_cuisines.index, top_3_cuisines.values, top_3_percentages.values):
+                file.write(f"{cuisine}: {count} restaurants ({percentage:.2f}%)\n")
+
+            # State the accuracy of sketched counts next to them
+            if 'distinct' in aggregates:
+                write_sketch_accuracy(file, aggregates['cuisines'], aggregates['distinct']['Cuisines'], "cuisine combinations", 3)
+
+            # Create a bar chart visualization, rendered once all tasks have run
+            submit_chart("Level_1_Task_1_Top_3_Cuisines.png", draw_top_3_cuisines, figsize=(10, 6), top_3_cuisines=top_3_cuisines)
+
+        except KeyError:
+            file.write('Error: The column "Cuisines" does not exist in the DataFrame.\n')
+        except Exception as e:
+            file.write(f"An unexpected error occurred while processing the data: {e}\n")
+
+    log("Finished Task 1: Top Cuisines")
+
+
+def write_sketch_accuracy(file, sketch, distinct, label, k):
+    """Write the error bounds of a top-K sketch and an approximate distinct count."""
+    file.write(f"\nApproximate counts: each is at most {sketch.error_bound()} restaurants above the true count "
+               f"(bound {sketch.epsilon:g} x {sketch.total()} rows)\n")
+    certainty = "guaranteed" if sketch.guaranteed(k) else "not guaranteed"
+    file.write(f"The top {k} {label} are {certainty} to be the true top {k}\n")
+    file.write(f"Distinct {label} (approximate): {distinct.estimate():.0f} (standard error {distinct.error:.1%})\n")
+
+
+def draw_top_3_cuisines(top_3_cuisines):
+    # Plotting libraries are only imported when charts are rendered
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    sns.barplot(x=top_3_cuisines.index, y=top_3_cuisines.values, palette="viridis", hue=top_3_cuisines.index, dodge=False)
+    plt.title("Top 3 Cuisines")
+    plt.xlabel("Cuisine")
+    plt.ylabel("Number of Restaurants")
+    plt.legend([],[], frameon=False)
+
+    # Add labels to the bars
+    for index, value in enumerate(top_3_cuisines.values):
+        plt.text(index, value, str(value), ha='center', va='bottom')
+
 
 # Task 2: City Analysis
 
@@ -103,67 +217,82 @@ print("Finished Task 1: Top Cuisines")  # Debug print
 
 # Additionally, create bar chart visualizations to display the number of restaurants in each city and the average ratings per city.
 
-print("Starting Task 2: City Analysis")  # Debug print
-
-# Analyze the number of restaurants and average aggregate ratings per city
-with open("Level_1_Task_2_Output.txt", "w") as file:
-    try:
-        # Check for missing values in 'City' and 'Aggregate rating' columns
-        if df['City'].isnull().any() or df['Aggregate rating'].isnull().any():
-            raise KeyError("Missing values found in 'City' or 'Aggregate rating' columns.")
-
-        # Debug prints to check the data
-        print("City column data:\n", df['City'].head())
-        print("Aggregate rating column data:\n", df['Aggregate rating'].head())
-
-        # Count the number of restaurants in each city
-        city_counts = df['City'].value_counts()
-        print("City counts:\n", city_counts)  # Debug print
-    
-        # Identify the city with the highest number of restaurants
-        city_most_restaurants = city_counts.idxmax()
-        print("City with most restaurants:", city_most_restaurants)  # Debug print
-
-        # Calculate the average rating for restaurants in each city
-        average_ratings = df.groupby('City')['Aggregate rating'].mean()
-        print("Average ratings:\n", average_ratings)  # Debug print
-    
-        # Identify the city with the highest average rating
-        city_highest_rating = average_ratings.idxmax()
-        print("City with highest average rating:", city_highest_rating)  # Debug print
-
-        # Print the results neatly
-        file.write(f"City with most restaurants: {city_most_restaurants}\n")
-        file.write(f"City with highest average rating: {city_highest_rating}\n")
-
-        # Create a bar chart visualization for the number of restaurants in each city
-        plt.figure(figsize=(14, 8))
-        sns.barplot(x=city_counts.index[:10], y=city_counts.values[:10], palette="viridis", hue=city_counts.index[:10], dodge=False)
-        plt.title("Top 10 Cities with Most Restaurants")
-        plt.xlabel("City")
-        plt.ylabel("Number of Restaurants")
-        plt.xticks(rotation=45)
-        plt.legend([],[], frameon=False)
-        plt.savefig("Level_1_Task_2_Top_10_Cities_Most_Restaurants.png")
-        plt.show()
-
-        # Create a bar chart visualization for the average ratings per city
-        plt.figure(figsize=(14, 8))
-        sns.barplot(x=average_ratings.index[:10], y=average_ratings.values[:10], palette="viridis", hue=average_ratings.index[:10], dodge=False)
-        plt.title("Top 10 Cities with Highest Average Ratings")
-        plt.xlabel("City")
-        plt.ylabel("Average Rating")
-        plt.xticks(rotation=45)
-        plt.legend([],[], frameon=False)
-        plt.savefig("Level_1_Task_2_Top_10_Cities_Highest_Average_Ratings.png")
-        plt.show()
-
-    except KeyError as e:
-        file.write(f"Error: {e}\n")
-    except Exception as e:
-        file.write(f"An unexpected error occurred: {e}\n")
-
-print("Finished Task 2: City Analysis")  # Debug print
+@task('level1.task2', requires=['level1.aggregates'], incremental=True)
+def task2(aggregates):
+    log("Starting Task 2: City Analysis")
+
+    missing_values = aggregates['missing']
+
+    # Analyze the number of restaurants and average aggregate ratings per city
+    with open_output("Level_1_Task_2_Output.txt") as file:
+        try:
+            # Check for missing values in 'City' and 'Aggregate rating' columns
+            if missing_values['City'] or missing_values['Aggregate rating']:
+                raise KeyError("Missing values found in 'City' or 'Aggregate rating' columns.")
+
+            # Count the number of restaurants in each city
+            city_counts = aggregates['cities'].to_series()
+            count_rows_out(len(city_counts))
+            debug("City counts:\n", city_counts)
+
+            # Identify the city with the highest number of restaurants
+            city_most_restaurants = city_counts.idxmax()
+            debug("City with most restaurants:", city_most_restaurants)
+
+            # Calculate the average rating for restaurants in each city
+            average_ratings = aggregates['city_ratings'].to_series()
+            debug("Average ratings:\n", average_ratings)
+
+            # Identify the city with the highest average rating
+            city_highest_rating = average_ratings.idxmax()
+            debug("City with highest average rating:", city_highest_rating)
+
+            # Print the results neatly
+            file.write(f"City with most restaurants: {city_most_restaurants}\n")
+            file.write(f"City with highest average rating: {city_highest_rating}\n")
+            if 'distinct' in aggregates:
+                distinct = aggregates['distinct']['City']
+                file.write(f"\nDistinct cities (approximate): {distinct.estimate():.0f} (standard error {distinct.error:.1%})\n")
+
+            # Create a bar chart visualization for the number of restaurants in each city, rendered once all tasks have run
+            submit_chart("Level_1_Task_2_Top_10_Cities_Most_Restaurants.png", draw_top_10_cities_most_restaurants, figsize=(14, 8), city_counts=city_counts)
+
+            # Create a bar chart visualization for the average ratings per city, rendered once all tasks have run
+            submit_chart("Level_1_Task_2_Top_10_Cities_Highest_Average_Ratings.png", draw_top_10_cities_highest_average_ratings, figsize=(14, 8), average_ratings=average_ratings)
+
+        except KeyError as e:
+            file.write(f"Error: {e}\n")
+        except Exception as e:
+            file.write(f"An unexpected error occurred: {e}\n")
+
+    log("Finished Task 2: City Analysis")
+
+
+def draw_top_10_cities_most_restaurants(city_counts):
+    # Plotting libraries are only imported when charts are rendered
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    sns.barplot(x=city_counts.index[:10], y=city_counts.values[:10], palette="viridis", hue=city_counts.index[:10], dodge=False)
+    plt.title("Top 10 Cities with Most Restaurants")
+    plt.xlabel("City")
+    plt.ylabel("Number of Restaurants")
+    plt.xticks(rotation=45)
+    plt.legend([],[], frameon=False)
+
+
+def draw_top_10_cities_highest_average_ratings(average_ratings):
+    # Plotting libraries are only imported when charts are rendered
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    sns.barplot(x=average_ratings.index[:10], y=average_ratings.values[:10], palette="viridis", hue=average_ratings.index[:10], dodge=False)
+    plt.title("Top 10 Cities with Highest Average Ratings")
+    plt.xlabel("City")
+    plt.ylabel("Average Rating")
+    plt.xticks(rotation=45)
+    plt.legend([],[], frameon=False)
+
 
 # Task 3: Price Range Distribution
 
@@ -175,52 +304,63 @@ print("Finished Task 2: City Analysis")  # Debug print
 
 # Additionally, create a bar chart visualization to display the price range distribution.
 
-print("Starting Task 3: Price Range Distribution")  # Debug print
-
-# Analyze the distribution of restaurants across different price ranges
-with open("Level_1_Task_3_Output.txt", "w") as file:
-    try:
-        # Check for missing values in 'Price range' column
-        if df['Price range'].isnull().any():
-            raise KeyError("Missing values found in 'Price range' column.")
-
-        # Count the number of restaurants in each price range
-        price_range_counts = df['Price range'].value_counts()
-        total_restaurants = len(df)
-        price_range_percentages = (price_range_counts / total_restaurants) * 100
-        print("Price range counts:\n", price_range_counts)  # Debug print
-
-        # Define price range descriptions
-        price_range_descriptions = {
-            1: "Low cost ($)",
-            2: "Moderate cost ($$)",
-            3: "High cost ($$$)",
-            4: "Very high cost ($$$$)"
-        }
-    
-        # Print the results neatly
-        file.write("Price Range Distribution:\n")
-        for price_range, count, percentage in zip(price_range_counts.index, price_range_counts.values, price_range_percentages.values):
-            description = price_range_descriptions.get(price_range, f"Price Range {price_range}")
-            file.write(f"{description}: {count} restaurants ({percentage:.2f}%)\n")
-    
-        # Create a bar chart visualization for the price range distribution
-        plt.figure(figsize=(10, 6))
-        sns.barplot(x=price_range_counts.index.astype(str), y=price_range_counts.values, palette="viridis", hue=price_range_counts.index.astype(str), dodge=False)
-        plt.title("Price Range Distribution")
-        plt.xlabel("Price Range")
-        plt.ylabel("Number of Restaurants")
-        plt.xticks(rotation=45)
-        plt.legend([],[], frameon=False)
-        plt.savefig("Level_1_Task_3_Price_Range_Distribution.png")
-        plt.show()
-
-    except KeyError as e:
-        file.write(f"Error: {e}\n")
-    except Exception as e:
-        file.write(f"An unexpected error occurred: {e}\n")
-
-print("Finished Task 3: Price Range Distribution")  # Debug print
+@task('level1.task3', requires=['level1.aggregates'], incremental=True)
+def task3(aggregates):
+    log("Starting Task 3: Price Range Distribution")
+
+    total_restaurants = aggregates['rows']
+    missing_values = aggregates['missing']
+
+    # Analyze the distribution of restaurants across different price ranges
+    with open_output("Level_1_Task_3_Output.txt") as file:
+        try:
+            # Check for missing values in 'Price range' column
+            if missing_values['Price range']:
+                raise KeyError("Missing values found in 'Price range' column.")
+
+            # Count the number of restaurants in each price range
+            price_range_counts = aggregates['price_ranges'].to_series()
+            count_rows_out(len(price_range_counts))
+            price_range_percentages = (price_range_counts / total_restaurants) * 100
+            debug("Price range counts:\n", price_range_counts)
+
+            # Define price range descriptions
+            price_range_descriptions = {
+                1: "Low cost ($)",
+                2: "Moderate cost ($$)",
+                3: "High cost ($$$)",
+                4: "Very high cost ($$$$)"
+            }
+
+            # Print the results neatly
+            file.write("Price Range Distribution:\n")
+            for price_range, count, percentage in zip(price_range_counts.index, price_range_counts.values, price_range_percentages.values):
+                description = price_range_descriptions.get(price_range, f"Price Range {price_range}")
+                file.write(f"{description}: {count} restaurants ({percentage:.2f}%)\n")
+
+            # Create a bar chart visualization for the price range distribution, rendered once all tasks have run
+            submit_chart("Level_1_Task_3_Price_Range_Distribution.png", draw_price_range_distribution, figsize=(10, 6), price_range_counts=price_range_counts)
+
+        except KeyError as e:
+            file.write(f"Error: {e}\n")
+        except Exception as e:
+            file.write(f"An unexpected error occurred: {e}\n")
+
+    log("Finished Task 3: Price Range Distribution")
+
+
+def draw_price_range_distribution(price_range_counts):
+    # Plotting libraries are only imported when charts are rendered
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    sns.barplot(x=price_range_counts.index.astype(str), y=price_range_counts.values, palette="viridis", hue=price_range_counts.index.astype(str), dodge=False)
+    plt.title("Price Range Distribution")
+    plt.xlabel("Price Range")
+    plt.ylabel("Number of Restaurants")
+    plt.xticks(rotation=45)
+    plt.legend([],[], frameon=False)
+
 
 # Task 4: Online Delivery Analysis
 
@@ -232,62 +372,81 @@ print("Finished Task 3: Price Range Distribution")  # Debug print
 
 # Additionally, create a bar chart visualization to display the average ratings by online delivery status.
 
-print("Starting Task 4: Online Delivery Analysis")  # Debug print
-
-# Analyze the percentage of restaurants offering online delivery and compare the average ratings of restaurants with and without online delivery
-with open("Level_1_Task_4_Output.txt", "w") as file:
-    try:
-        # Check for missing values in 'Has Online delivery' and 'Aggregate rating' columns
-        if df['Has Online delivery'].isnull().any() or df['Aggregate rating'].isnull().any():
-            raise KeyError("Missing values found in 'Has Online delivery' or 'Aggregate rating' columns.")
-
-        # Calculate the percentage of restaurants offering online delivery
-        online_delivery_counts = df['Has Online delivery'].value_counts()
-        total_restaurants = len(df)
-        online_delivery_percentages = (online_delivery_counts / total_restaurants) * 100
-        print("Online delivery counts:\n", online_delivery_counts)  # Debug print
-
-        # Print the results neatly
-        file.write("Online Delivery Distributions:\n")
-        for delivery_status, count, percentage in zip(online_delivery_counts.index, online_delivery_counts.values, online_delivery_percentages.values):
-            status = "Offers Online Delivery" if delivery_status == 'Yes' else "Does Not offer Online Delivery"
-            file.write(f"{status}: {count} restaurants ({percentage:.2f}%)\n")
-        
-        # Compare the average ratings of restaurants with and without online delivery
-        average_ratings_online_delivery = df.groupby('Has Online delivery')['Aggregate rating'].mean()
-        file.write("\nAverage Ratings by Online Delivery Status:\n")
-        for delivery_status, avg_rating in average_ratings_online_delivery.items():
-            status = "Offers Online Delivery" if delivery_status == 'Yes' else "Does Not Offer Online Delivery"
-            file.write(f"{status}: {avg_rating:.2f}\n")
-
-        # Create a bar chart visualization for the online delivery distribution
-        plt.figure(figsize=(10, 6))
-        sns.barplot(x=online_delivery_counts.index.astype(str), y=online_delivery_counts.values, palette="viridis", hue=online_delivery_counts.index.astype(str), dodge=False)
-        plt.title("Online Delivery Distribution")
-        plt.xlabel("Online Delivery Status")
-        plt.ylabel("Number of Restaurants")
-        plt.xticks(rotation=45)
-        plt.legend([],[], frameon=False)
-        plt.savefig("Level_1_Task_4_Online_Delivery_Distribution.png")
-        plt.savefig("Level_1_Task_4_Average_Ratings_Online_Delivery_Status.png")
-        plt.show()
-
-        # Create a bar chart visualization for the average ratings by online delivery status
-        plt.figure(figsize=(10, 6))
-        sns.barplot(x=average_ratings_online_delivery.index.astype(str), y=average_ratings_online_delivery.values, palette="viridis", hue=average_ratings_online_delivery.index.astype(str), dodge=False)
-        plt.title("Average Ratings by Online Delivery Status")
-        plt.xlabel("Online Delivery Status")
-        plt.ylabel("Average Rating")
-        plt.xticks(rotation=45)
-        plt.legend([],[], frameon=False)
-        plt.show()
-
-    except KeyError as e:
-        file.write(f"Error: {e}\n")
-    except Exception as e:
-        file.write(f"An unexpected error occurred: {e}\n")
-
-print("Finished Task 4: Online Delivery Analysis")  # Debug print
+@task('level1.task4', requires=['level1.aggregates'], incremental=True)
+def task4(aggregates):
+    log("Starting Task 4: Online Delivery Analysis")
+
+    total_restaurants = aggregates['rows']
+    missing_values = aggregates['missing']
+
+    # Analyze the percentage of restaurants offering online delivery and compare the average ratings of restaurants with and without online delivery
+    with open_output("Level_1_Task_4_Output.txt") as file:
+        try:
+            # Check for missing values in 'Has Online delivery' and 'Aggregate rating' columns
+            if missing_values['Has Online delivery'] or missing_values['Aggregate rating']:
+                raise KeyError("Missing values found in 'Has Online delivery' or 'Aggregate rating' columns.")
+
+            # Calculate the percentage of restaurants offering online delivery
+            online_delivery_counts = aggregates['online_delivery'].to_series()
+            count_rows_out(len(online_delivery_counts))
+            online_delivery_percentages = (online_delivery_counts / total_restaurants) * 100
+            debug("Online delivery counts:\n", online_delivery_counts)
+
+            # Print the results neatly
+            file.write("Online Delivery Distributions:\n")
+            for delivery_status, count, percentage in zip(online_delivery_counts.index, online_delivery_counts.values, online_delivery_percentages.values):
+                status = "Offers Online Delivery" if delivery_status else "Does Not offer Online Delivery"
+                file.write(f"{status}: {count} restaurants ({percentage:.2f}%)\n")
+
+            # Compare the average ratings of restaurants with and without online delivery
+            average_ratings_online_delivery = aggregates['online_delivery_ratings'].to_series()
+            file.write("\nAverage Ratings by Online Delivery Status:\n")
+            for delivery_status, avg_rating in average_ratings_online_delivery.items():
+                status = "Offers Online Delivery" if delivery_status else "Does Not Offer Online Delivery"
+                file.write(f"{status}: {avg_rating:.2f}\n")
+
+            # Create a bar chart visualization for the online delivery distribution, rendered once all tasks have run
+            submit_chart("Level_1_Task_4_Online_Delivery_Distribution.png", draw_online_delivery_distribution, figsize=(10, 6), online_delivery_counts=online_delivery_counts)
+
+            # Create a bar chart visualization for the average ratings by online delivery status, rendered once all tasks have run
+            submit_chart("Level_1_Task_4_Average_Ratings_Online_Delivery_Status.png", draw_average_ratings_online_delivery_status, figsize=(10, 6), average_ratings_online_delivery=average_ratings_online_delivery)
+
+        except KeyError as e:
+            file.write(f"Error: {e}\n")
+        except Exception as e:
+            file.write(f"An unexpected error occurred: {e}\n")
+
+    log("Finished Task 4: Online Delivery Analysis")
+
+
+def draw_online_delivery_distribution(online_delivery_counts):
+    # Plotting libraries are only imported when charts are rendered
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    sns.barplot(x=online_delivery_counts.index.map(DELIVERY_LABELS), y=online_delivery_counts.values, palette="viridis", hue=online_delivery_counts.index.map(DELIVERY_LABELS), dodge=False)
+    plt.title("Online Delivery Distribution")
+    plt.xlabel("Online Delivery Status")
+    plt.ylabel("Number of Restaurants")
+    plt.xticks(rotation=45)
+    plt.legend([],[], frameon=False)
+
+
+def draw_average_ratings_online_delivery_status(average_ratings_online_delivery):
+    # Plotting libraries are only imported when charts are rendered
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    sns.barplot(x=average_ratings_online_delivery.index.map(DELIVERY_LABELS), y=average_ratings_online_delivery.values, palette="viridis", hue=average_ratings_online_delivery.index.map(DELIVERY_LABELS), dodge=False)
+    plt.title("Average Ratings by Online Delivery Status")
+    plt.xlabel("Online Delivery Status")
+    plt.ylabel("Average Rating")
+    plt.xticks(rotation=45)
+    plt.legend([],[], frameon=False)
+
+
+if __name__ == "__main__":
+    run_level('level1', start_time=START_TIME)
 
 # Summary of Results
 
@@ -9,84 +9,195 @@
 # Additionally, create a histogram visualization to display the rating distribution.
 
 # Import necessary libraries
+# Plotting, folium and scikit-learn are imported inside the functions that use them, so startup stays fast
+import time
+START_TIME = time.perf_counter()
+from collections import Counter
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import folium
-from sklearn.cluster import DBSCAN
-import numpy as np
-
-# Load the dataset into a DataFrame
-try:
-    df = pd.read_csv("cognifyz_dataset.csv")
-except FileNotFoundError:
-    print("Error: The file 'cognifyz_dataset.csv' was not found.")
-    exit(1)
-except pd.errors.EmptyDataError:
-    print("Error: The file 'cognifyz_dataset.csv' is empty.")
-    exit(1)
-except pd.errors.ParserError:
-    print("Error: The file 'cognifyz_dataset.csv' could not be parsed.")
-    exit(1)
-except Exception as e:
-    print(f"An unexpected error occurred: {e}")
-    exit(1)
-
-print("Starting Level 2, Task 1: Restaurant Ratings")  # Debug print
-
-# Analyze the distribution of aggregate restaurant ratings, determine the most common rating range, and calculate the average number of votes received by restaurants in each rating range
+import os
+import sys
+
+# Make the shared 'restaurants' package importable when run as a script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from restaurants.aggregation import Grouper
+from restaurants.artifacts import open_output
+from restaurants.chains import DEFAULT_SIMILARITY, resolve_chains
+from restaurants.clustering import DEFAULT_EPS_KM, DEFAULT_MAX_ROWS, DEFAULT_MIN_SAMPLES, PARTITION_COLUMNS, cluster_locations
+from restaurants.combinations import mine_combinations, top_k
+from restaurants.charts import submit_chart
+from restaurants.cuisines import CuisineMatrix
+from restaurants.distribution import Distribution
+from restaurants.incremental import incremental_aggregates
+from restaurants.maps import DEFAULT_MAX_BYTES, DEFAULT_MAX_POINTS, DEFAULT_MAX_SECONDS, MAP_MODES, render_map
+from restaurants.metrics import count_rows_out, log, note_file, note_metric, warn
+from restaurants.runner import arguments, intermediate, run_level, task
+from restaurants.sketches import HeavyHitters, TrackedMeans
+from restaurants.streaming import DEFAULT_CHUNKSIZE, CountAccumulator, IntegerMeanAccumulator, MeanAccumulator, iter_chunks
+
+# Columns used by Task 1, whose per-rating totals can be kept up to date with --incremental
+RATING_COLUMNS = ['Aggregate rating', 'Votes']
+
+# Columns used by Task 4, whose per-name aggregates can be kept up to date with --incremental
+CHAIN_COLUMNS = ['Restaurant Name', 'Aggregate rating', 'Votes']
+
+# The tasks below are registered with the task runner (restaurants/runner.py) and
+# each declares the columns it reads, so `python -m restaurants run level2.task4`
+# parses only 'Restaurant Name', 'Aggregate rating' and 'Votes'.
+
+
+@arguments('level2')
+def add_arguments(parser):
+    parser.add_argument("--map-mode", choices=MAP_MODES, default='auto', help="how restaurants are drawn on the Task 3 map")
+    parser.add_argument("--map-max-points", type=int, default=DEFAULT_MAX_POINTS, help="maximum number of points written to the Task 3 map")
+    parser.add_argument("--map-max-bytes", type=int, default=DEFAULT_MAX_BYTES, help="largest Task 3 map page; in 'auto' mode a larger one is drawn in a cheaper mode")
+    parser.add_argument("--map-max-seconds", type=float, default=DEFAULT_MAX_SECONDS, help="longest time to build the Task 3 map; in 'auto' mode a slower one is drawn in a cheaper mode")
+    parser.add_argument("--cluster-partition", choices=sorted(PARTITION_COLUMNS), default='country', help="split restaurants by country or city before clustering them in Task 3")
+    parser.add_argument("--cluster-eps-km", type=float, default=DEFAULT_EPS_KM, help="DBSCAN neighbourhood radius in kilometres")
+    parser.add_argument("--cluster-min-samples", type=int, default=DEFAULT_MIN_SAMPLES, help="DBSCAN minimum number of restaurants per cluster core")
+    parser.add_argument("--cluster-max-rows", type=int, default=DEFAULT_MAX_ROWS, help="partitions with more restaurants are clustered in overlapping grid cells of at most this many")
+    parser.add_argument("--cluster-workers", type=int, default=None, help="worker processes used for clustering (default: one per CPU)")
+    parser.add_argument("--chain-similarity", type=float, default=DEFAULT_SIMILARITY, help="trigram similarity from which two restaurant names are the same chain in Task 4 (1 matches normalized names exactly)")
+
+
+def accumulate_ratings(chunks, ratings, votes):
+    """Reduce DataFrame chunks to restaurants and votes per rating, adding both columns to their DistributionSketches."""
+    totals = []
+    for chunk in chunks:
+        totals.append(Grouper(chunk).totals(['Aggregate rating'], ['Votes']))
+        ratings.add(chunk['Aggregate rating'])
+        votes.add(chunk['Votes'])
+    return pd.concat(totals).groupby(level=0).sum()
+
+
+def accumulate_rating_totals(chunks):
+    """Reduce DataFrame chunks to the restaurants and votes per rating, as accumulators --incremental can retract."""
+    aggregates = {'rows': CountAccumulator(), 'votes': IntegerMeanAccumulator()}
+    for chunk in chunks:
+        grouped = Grouper(chunk)
+        aggregates['rows'].add(grouped.observed(['Aggregate rating']))
+        aggregates['votes'].add(*grouped.observed_sums(['Aggregate rating'], 'Votes'))
+    return aggregates
+
+
+def rating_totals(aggregates):
+    """The frame of Grouper.totals(['Aggregate rating'], ['Votes']) from accumulate_rating_totals() aggregates."""
+    rows, votes = aggregates['rows'].counts, aggregates['votes']
+    ratings = sorted(rows)
+    return pd.DataFrame({'rows': [rows[rating] for rating in ratings],
+                         'Votes count': [votes.counts[rating] for rating in ratings],
+                         'Votes sum': [votes.sums[rating] for rating in ratings]},
+                        index=pd.Index(ratings, dtype='float32', name='Aggregate rating'), dtype='int64')
+
+
+@intermediate('level2.ratings', requires=['run'], columns=RATING_COLUMNS)
+def rating_summary(run):
+    """Restaurants and votes per rating and the rating distribution, from the loaded dataset, saved state or, with --approximate, streamed sketches."""
+    # Ratings take few distinct values: one pass counts the restaurants and sums their
+    # votes per rating, and everything in Task 1 is computed from those totals
+    if run.incremental or not run.approximate:
+        if run.incremental:
+            if run.approximate:
+                warn("Warning: --approximate is ignored with --incremental; rating statistics stay exact.")
+            aggregates = incremental_aggregates('level2.ratings', RATING_COLUMNS, accumulate_rating_totals, path=run.path, delta=run.options.delta)
+            by_rating = rating_totals(aggregates)
+        else:
+            by_rating = Grouper(run.get('dataset')).totals(['Aggregate rating'], ['Votes'])
+        ratings = Distribution(by_rating.index.to_numpy(), by_rating['rows'], name='Aggregate rating')
+        return {'by_rating': by_rating, 'ratings': ratings, 'distribution': ratings, 'votes': None}
+
+    # Stream the CSV into mergeable sketches, which also summarize the votes in bounded memory
+    chunks = iter_chunks(RATING_COLUMNS, path=run.path, chunksize=getattr(run.options, 'chunksize', DEFAULT_CHUNKSIZE))
+    ratings, votes = run.distribution_sketch('Aggregate rating'), run.distribution_sketch('Votes')
+    by_rating = accumulate_ratings(chunks, ratings, votes)
+    return {'by_rating': by_rating, 'ratings': ratings, 'distribution': ratings.distribution(), 'votes': votes}
+
 
 # Task 1: Restaurant Ratings
-with open("Level_2_Task_1_Output.txt", "w") as file:
-    try:
-        # Calculate rating statistics
-        rating_stats = df['Aggregate rating'].describe()
-        file.write("\nAggregate Rating Statistics:\n")
-        file.write(f"{rating_stats}\n")
-
-        # Determine most common rating range
-        rating_ranges = pd.cut(df['Aggregate rating'], bins=[0, 1, 2, 3, 4, 5])
-        most_common_rating_range = rating_ranges.value_counts().idxmax()
-        file.write(f"\nMost common rating range: {most_common_rating_range}\n")
-
-        # Calculate average votes
-        average_votes_by_rating_range = df.groupby(rating_ranges, observed=False)['Votes'].mean()
-        file.write("\nAverage number of votes by rating range:\n")
-        for rating_range, avg_votes in average_votes_by_rating_range.items():
-            file.write(f"{rating_range}: {avg_votes:.2f}\n")
-
-        # Analyze rating distribution
-        plt.figure(figsize=(8, 6))
-        sns.histplot(df['Aggregate rating'], kde=True)
-        plt.title("Distribution of Aggregate Ratings", fontsize=16)
-        plt.xlabel("Aggregate Rating", fontsize=14)
-        plt.ylabel("Frequency", fontsize=14)
-        plt.xticks(fontsize=12)
-        plt.yticks(fontsize=12)
-        plt.grid(True)
-
-        # Add a vertical line to highlight the most common rating range
-        plt.axvline(x=most_common_rating_range.left + 0.5, color='red', linestyle='--', linewidth=2, label='Most Common Rating Range')
-
-        # Annotate the most common rating range
-        plt.annotate(f'Most common rating range: {most_common_rating_range}', 
-                     xy=(most_common_rating_range.left + 0.5, 0), 
-                     xytext=(most_common_rating_range.left + 0.5, 10),
-                     arrowprops=dict(facecolor='black', shrink=0.05),
-                     fontsize=12, ha='center')
-        
-        # Add legend
-        plt.legend()
-        
-        plt.savefig("Level_2_Task_1_Rating_Distribution.png")
-        plt.show()
-
-    except KeyError:
-        file.write("Error: One or more required columns ('Aggregate rating', 'Votes') are missing.\n")
-    except Exception as e:
-        file.write(f"An unexpected error occurred: {e}\n")
-
-print("Finished Level 2, Task 1: Restaurant Ratings")  # Debug print
+@task('level2.task1', requires=['level2.ratings'], incremental=True)
+def task1(summary):
+    log("Starting Level 2, Task 1: Restaurant Ratings")
+
+    # Analyze the distribution of aggregate restaurant ratings, determine the most common rating range, and calculate the average number of votes received by restaurants in each rating range
+    with open_output("Level_2_Task_1_Output.txt") as file:
+        try:
+            by_rating = summary['by_rating']
+
+            # Calculate rating statistics
+            rating_stats = summary['ratings'].describe()
+            file.write("\nAggregate Rating Statistics:\n")
+            file.write(f"{rating_stats}\n")
+            if summary['votes'] is not None:
+                write_sketch_statistics(file, summary['ratings'])
+
+            # Determine most common rating range
+            by_range = by_rating.groupby(pd.cut(by_rating.index, bins=[0, 1, 2, 3, 4, 5]), observed=False).sum()
+            most_common_rating_range = by_range['rows'].idxmax()
+            file.write(f"\nMost common rating range: {most_common_rating_range}\n")
+
+            # Calculate average votes
+            average_votes_by_rating_range = by_range['Votes sum'] / by_range['Votes count']
+            count_rows_out(len(average_votes_by_rating_range))
+            file.write("\nAverage number of votes by rating range:\n")
+            for rating_range, avg_votes in average_votes_by_rating_range.items():
+                file.write(f"{rating_range}: {avg_votes:.2f}\n")
+
+            # The streamed run also summarizes the votes, which take too many values to count one by one
+            if summary['votes'] is not None:
+                file.write("\nVotes Statistics:\n")
+                file.write(f"{summary['votes'].describe()}\n")
+                write_sketch_statistics(file, summary['votes'])
+
+            # Chart the rating distribution, rendered once all tasks have run
+            submit_chart("Level_2_Task_1_Rating_Distribution.png", draw_rating_distribution, figsize=(8, 6), ratings=summary['distribution'], most_common_rating_range=most_common_rating_range)
+
+        except KeyError:
+            file.write("Error: One or more required columns ('Aggregate rating', 'Votes') are missing.\n")
+        except Exception as e:
+            file.write(f"An unexpected error occurred: {e}\n")
+
+    log("Finished Level 2, Task 1: Restaurant Ratings")
+
+
+def write_sketch_statistics(file, sketch):
+    """State how exact the describe() statistics of a DistributionSketch are."""
+    if sketch.rank_error():
+        file.write(f"Quartiles are approximate: each is the value at most {sketch.rank_error():.2%} of the rows away from its exact rank; the other statistics are exact\n")
+    else:
+        file.write("All statistics are exact\n")
+
+
+def draw_rating_distribution(ratings, most_common_rating_range):
+    # Plotting libraries are only imported when charts are rendered
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    # The histogram and KDE of histplot(kde=True), computed from the counts per rating
+    edges = ratings.edges()
+    sns.histplot(data={'rating': ratings.values.astype(float), 'rows': ratings.counts}, x='rating', weights='rows', bins=edges.tolist(), alpha=0.5)
+    curve = ratings.kde(cut=0)
+    if curve is not None:
+        grid, density = curve
+        plt.plot(grid, density * ratings.total() * (edges[1] - edges[0]), color='C0')
+    plt.title("Distribution of Aggregate Ratings", fontsize=16)
+    plt.xlabel("Aggregate Rating", fontsize=14)
+    plt.ylabel("Frequency", fontsize=14)
+    plt.xticks(fontsize=12)
+    plt.yticks(fontsize=12)
+    plt.grid(True)
+
+    # Add a vertical line to highlight the most common rating range
+    plt.axvline(x=most_common_rating_range.left + 0.5, color='red', linestyle='--', linewidth=2, label='Most Common Rating Range')
+
+    # Annotate the most common rating range
+    plt.annotate(f'Most common rating range: {most_common_rating_range}', 
+                 xy=(most_common_rating_range.left + 0.5, 0), 
+                 xytext=(most_common_rating_range.left + 0.5, 10),
+                 arrowprops=dict(facecolor='black', shrink=0.05),
+                 fontsize=12, ha='center')
+
+    # Add legend
+    plt.legend()
+
 
 # Level 2, Task 2: Cuisine Combination
 
@@ -98,57 +209,83 @@ print("Finished Level 2, Task 1: Restaurant Ratings")  # Debug print
 
 # Additionally, create a bar chart visualization to display the average ratings by cuisine combination.
 
-print("Starting Level 2, Task 2: Cuisine Combination")  # Debug print
-
-# Analyze the cuisine combinations in the dataset, identify the most common cuisine combinations, and determine if certain cuisine combinations tend to receive higher ratings
-
 # Task 2: Cuisine Combination
-with open("Level_2_Task_2_Output.txt", "w") as file:
-    try:
-        # Identify the most common cuisine combinations
-        cuisine_combinations = df['Cuisines'].value_counts()
-        top_cuisine_combinations = cuisine_combinations[:10]
-        file.write("\nTop 10 Cuisine Combinations:\n")
-        for combination, count in zip(top_cuisine_combinations.index, top_cuisine_combinations.values):
-            file.write(f"{combination}: {count} restaurants\n")
-
-        # Calculate the average ratings for each cuisine combination
-        average_ratings_by_combination = df.groupby('Cuisines')['Aggregate rating'].mean()
-        top_average_ratings = average_ratings_by_combination[top_cuisine_combinations.index]
-        file.write("\nAverage Ratings for Top 10 Cuisine Combinations:\n")
-        for combination, avg_rating in zip(top_average_ratings.index, top_average_ratings.values):
-            file.write(f"{combination}: {avg_rating:.2f}\n")
-
-        # Create a bar chart visualization for the frequency of top cuisine combinations
-        plt.figure(figsize=(12, 8))
-        sns.barplot(x=top_cuisine_combinations.index, y=top_cuisine_combinations.values, hue=top_cuisine_combinations.index, palette="viridis", dodge=False, legend=False)
-        plt.title("Frequency of Top 10 Cuisine Combinations", fontsize=16)
-        plt.xlabel("Cuisine Combination", fontsize=14)
-        plt.ylabel("Number of Restaurants", fontsize=14)
-        plt.xticks(rotation=45, fontsize=12, ha='right')
-        plt.yticks(fontsize=12)
-        plt.grid(True)
-        plt.savefig("Level_2_Task_2_Top_10_Cuisine_Combinations.png")
-        plt.show() 
-
-        # Create a bar chart visualization for the average ratings by cuisine combination
-        plt.figure(figsize=(12, 8))
-        sns.barplot(x=top_average_ratings.index, y=top_average_ratings.values, hue=top_average_ratings.index, palette="viridis", dodge=False, legend=False)
-        plt.title("Average Ratings by Top 10 Cuisine Combinations", fontsize=16)
-        plt.xlabel("Cuisine Combination", fontsize=14)
-        plt.ylabel("Average Rating", fontsize=14)
-        plt.xticks(rotation=45, fontsize=12, ha='right')
-        plt.yticks(fontsize=12)
-        plt.grid(True)
-        plt.savefig("Level_2_Task_2_Average_Ratings_Top_10_Cuisine_Combinations.png")
-        plt.show()
-
-    except KeyError as e:
-        file.write(f"Error: {e}\n")
-    except Exception as e:
-        file.write(f"An unexpected error occurred: {e}\n")
-
-print("Finished Level 2, Task 2: Cuisine Combination")  # Debug print
+@task('level2.task2', requires=['dataset'], columns=['Cuisines', 'Aggregate rating', 'Votes'])
+def task2(df):
+    log("Starting Level 2, Task 2: Cuisine Combination")
+
+    # Analyze the cuisine combinations in the dataset, identify the most common cuisine combinations, and determine if certain cuisine combinations tend to receive higher ratings
+    with open_output("Level_2_Task_2_Output.txt") as file:
+        try:
+            # Identify the most common cuisine combinations
+            # Counted in order of first appearance: value_counts() on the categorical would break ties by category
+            cuisine_combinations = Grouper(df).value_counts('Cuisines')
+            count_rows_out(len(cuisine_combinations))
+            top_cuisine_combinations = cuisine_combinations[:10]
+            file.write("\nTop 10 Cuisine Combinations:\n")
+            for combination, count in zip(top_cuisine_combinations.index, top_cuisine_combinations.values):
+                file.write(f"{combination}: {count} restaurants\n")
+
+            # Calculate the average ratings for each cuisine combination
+            average_ratings_by_combination = df.groupby('Cuisines', observed=True)['Aggregate rating'].mean()
+            top_average_ratings = average_ratings_by_combination[top_cuisine_combinations.index]
+            file.write("\nAverage Ratings for Top 10 Cuisine Combinations:\n")
+            for combination, avg_rating in zip(top_average_ratings.index, top_average_ratings.values):
+                file.write(f"{combination}: {avg_rating:.2f}\n")
+
+            # Mine cuisine pairs and triples that appear together, with support, lift and ratings, from the
+            # restaurants x cuisines matrix, which splits every distinct combination string once
+            cuisine_matrix = CuisineMatrix(df['Cuisines'])
+            itemsets = mine_combinations(cuisine_matrix, df['Aggregate rating'], df['Votes'])
+            itemset_columns = ['itemset', 'count', 'support', 'lift', 'mean rating', 'weighted rating']
+            for title, metric, size in [("Top 10 Cuisine Pairs by Count", 'count', 2),
+                                        ("Top 10 Cuisine Pairs by Lift", 'lift', 2),
+                                        ("Top 10 Cuisine Triples by Count", 'count', 3)]:
+                ranked = top_k(itemsets, metric=metric, k=10, size=size, min_count=10)
+                file.write(f"\n{title}:\n")
+                file.write(f"{ranked[itemset_columns].to_string(index=False, float_format='{:.3f}'.format)}\n")
+
+            # Create a bar chart visualization for the frequency of top cuisine combinations, rendered once all tasks have run
+            submit_chart("Level_2_Task_2_Top_10_Cuisine_Combinations.png", draw_top_10_cuisine_combinations, figsize=(12, 8), top_cuisine_combinations=top_cuisine_combinations)
+
+            # Create a bar chart visualization for the average ratings by cuisine combination, rendered once all tasks have run
+            submit_chart("Level_2_Task_2_Average_Ratings_Top_10_Cuisine_Combinations.png", draw_average_ratings_top_10_cuisine_combinations, figsize=(12, 8), top_average_ratings=top_average_ratings)
+
+        except KeyError as e:
+            file.write(f"Error: {e}\n")
+        except Exception as e:
+            file.write(f"An unexpected error occurred: {e}\n")
+
+    log("Finished Level 2, Task 2: Cuisine Combination")
+
+
+def draw_top_10_cuisine_combinations(top_cuisine_combinations):
+    # Plotting libraries are only imported when charts are rendered
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    sns.barplot(x=top_cuisine_combinations.index.astype(str), y=top_cuisine_combinations.values, hue=top_cuisine_combinations.index.astype(str), palette="viridis", dodge=False, legend=False)
+    plt.title("Frequency of Top 10 Cuisine Combinations", fontsize=16)
+    plt.xlabel("Cuisine Combination", fontsize=14)
+    plt.ylabel("Number of Restaurants", fontsize=14)
+    plt.xticks(rotation=45, fontsize=12, ha='right')
+    plt.yticks(fontsize=12)
+    plt.grid(True)
+
+
+def draw_average_ratings_top_10_cuisine_combinations(top_average_ratings):
+    # Plotting libraries are only imported when charts are rendered
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    sns.barplot(x=top_average_ratings.index.astype(str), y=top_average_ratings.values, hue=top_average_ratings.index.astype(str), palette="viridis", dodge=False, legend=False)
+    plt.title("Average Ratings by Top 10 Cuisine Combinations", fontsize=16)
+    plt.xlabel("Cuisine Combination", fontsize=14)
+    plt.ylabel("Average Rating", fontsize=14)
+    plt.xticks(rotation=45, fontsize=12, ha='right')
+    plt.yticks(fontsize=12)
+    plt.grid(True)
+
 
 # Level 2, Task 3: Geographic Analysis
 
@@ -160,51 +297,68 @@ print("Finished Level 2, Task 2: Cuisine Combination")  # Debug print
 
 # Additionally, create a map visualization to display the geographic distribution of restaurants.
 
-print("Starting Level 2, Task 3: Geographic Analysis")  # Debug print
-
-# Plot the locations of restaurants on a map using longitude and latitude coordinates
-
 # Task 3: Geographic Analysis
-with open("Level_2_Task_3_Output.txt", "w") as file:
-    try:
-        # Extract longitude and latitude
-        locations = df[['Longitude', 'Latitude']].dropna()
-
-        # Create a map centered around the mean latitude and longitude
-        map_center = [locations['Latitude'].mean(), locations['Longitude'].mean()]
-        restaurant_map = folium.Map(location=map_center, zoom_start=12)
-
-        # Add points to the map
-        for _, row in locations.iterrows():
-            folium.Marker([row['Latitude'], row['Longitude']]).add_to(restaurant_map)
-
-        # Save the map to an HTML file
-        restaurant_map.save("Level_2_Task_3_Restaurant_Map.html")
-
-        # Perform clustering using DBSCAN
-        db = DBSCAN(eps=0.01, min_samples=10).fit(locations)
-        labels = db.labels_
-
-        # Add cluster labels to the DataFrame
-        df['Cluster'] = labels
-
-        # Calculate the number of restaurants in each cluster
-        cluster_counts = df['Cluster'].value_counts()
-        file.write("\nCluster Summary:\n")
-        file.write(f"{cluster_counts}\n")
-
-        # Calculate the average rating for each cluster
-        average_ratings_by_cluster = df.groupby('Cluster')['Aggregate rating'].mean()
-        file.write("\nAverage Ratings by Cluster:\n")
-        for cluster, avg_rating in average_ratings_by_cluster.items():
-            file.write(f"Cluster {cluster}: {avg_rating:.2f}\n")
-
-    except KeyError as e:
-        file.write(f"Error: {e}\n")
-    except Exception as e:
-        file.write(f"An unexpected error occurred: {e}\n")
+@task('level2.task3', requires=['dataset', 'options'], columns=['Country Code', 'City', 'Latitude', 'Longitude', 'Aggregate rating'])
+def task3(df, options):
+    log("Starting Level 2, Task 3: Geographic Analysis")
+
+    # Plot the locations of restaurants on a map using longitude and latitude coordinates
+    with open_output("Level_2_Task_3_Output.txt") as file:
+        try:
+            # Extract longitude and latitude
+            locations = df[['Longitude', 'Latitude']].dropna()
+
+            # Create a map centered around the mean latitude and longitude, drawn within the point, size and time budgets
+            map_html, map_details = render_map(locations['Latitude'].to_numpy(), locations['Longitude'].to_numpy(), mode=options.map_mode,
+                                               max_points=options.map_max_points, max_bytes=options.map_max_bytes, max_seconds=options.map_max_seconds)
+
+            # Save the map to an HTML file
+            with open("Level_2_Task_3_Restaurant_Map.html", "w", encoding="utf-8") as page:
+                page.write(map_html)
+            note_file("Level_2_Task_3_Restaurant_Map.html")
+            # The build time goes to the task's metrics, so the text output only changes with the data
+            note_metric('map_build_seconds', map_details['seconds'])
+            note_metric('map_fallbacks', [{'mode': mode, 'points': points, 'over_budget': over} for mode, points, over in map_details['fallbacks']])
+            if map_details['over_budget']:
+                warn(f"Warning: the {map_details['mode']} map exceeds its {' and '.join(map_details['over_budget'])} budget; "
+                     "use --map-mode auto or a larger budget.")
+            file.write("\nRestaurant Map:\n")
+            file.write(f"Mode: {map_details['mode']}{' (aggregated to grid cells)' if map_details['aggregated'] else ''}\n")
+            file.write(f"Points drawn: {map_details['points']} for {map_details['restaurants']} restaurants\n")
+            file.write(f"File size: {map_details['bytes'] / 1024:.1f} KiB\n")
+
+            # Perform clustering using haversine DBSCAN, one country (or city, or grid cell of a large one) per worker process
+            labels, cluster_report, cluster_seconds = cluster_locations(df, partition=options.cluster_partition, eps_km=options.cluster_eps_km,
+                                                                        min_samples=options.cluster_min_samples, workers=options.cluster_workers,
+                                                                        max_rows=options.cluster_max_rows)
+            note_metric('cluster_seconds', {str(partition): seconds for partition, seconds in cluster_seconds.items()})
+
+            # Name the cluster labels; the shared DataFrame is left untouched for the other tasks
+            clusters = labels.rename('Cluster')
+            count_rows_out(len(clusters))
+
+            # Report the partitions; their clustering times are in the task's metrics
+            file.write("\nClustering by Partition:\n")
+            file.write(f"{cluster_report.to_string(index=False)}\n")
+
+            # Calculate the number of restaurants in each cluster
+            cluster_counts = clusters.value_counts()
+            file.write("\nCluster Summary:\n")
+            file.write(f"{cluster_counts}\n")
+
+            # Calculate the average rating for each cluster
+            average_ratings_by_cluster = df['Aggregate rating'].groupby(clusters).mean()
+            file.write("\nAverage Ratings by Cluster:\n")
+            for cluster, avg_rating in average_ratings_by_cluster.items():
+                file.write(f"Cluster {cluster}: {avg_rating:.2f}\n")
+
+        except KeyError as e:
+            file.write(f"Error: {e}\n")
+        except Exception as e:
+            file.write(f"An unexpected error occurred: {e}\n")
+
+    log("Finished Level 2, Task 3: Geographic Analysis")
 
-print("Finished Level 2, Task 3: Geographic Analysis")  # Debug print
 
 # Level 2, Task 4: Restaurant Chains
 
@@ -216,67 +370,146 @@ print("Finished Level 2, Task 3: Geographic Analysis")  # Debug print
 
 # Additionally, create bar chart visualizations to display the average ratings and popularity of restaurant chains.
 
-print("Starting Level 2, Task 4: Restaurant Chains")  # Debug print
+def accumulate_chains(chunks, sketch=None):
+    """Reduce DataFrame chunks to the per-name counts and means needed by Task 4.
+
+    With a HeavyHitters `sketch` tracking 'Aggregate rating' and 'Votes', only
+    the most frequent names are kept, with their rating and vote sums.
+    """
+    aggregates = {'missing': Counter()}
+    if sketch is None:
+        aggregates.update({'names': CountAccumulator(), 'ratings': MeanAccumulator(), 'votes': IntegerMeanAccumulator()})
+    else:
+        aggregates.update({'names': sketch, 'ratings': TrackedMeans(sketch, 'Aggregate rating'), 'votes': TrackedMeans(sketch, 'Votes')})
+    for chunk in chunks:
+        # The names are factorized once for all three tables
+        grouped = Grouper(chunk)
+        aggregates['missing'].update(grouped.missing(chunk.columns))
+        if sketch is not None:
+            sums = {column: grouped.observed_sums(['Restaurant Name'], column) for column in sketch.summary.values}
+            sketch.add(grouped.observed(['Restaurant Name']), sums)
+            continue
+        # Names are added in order of first appearance, which Task 4 keeps for equal counts
+        aggregates['names'].add(grouped.first_seen('Restaurant Name'))
+        aggregates['ratings'].add(grouped.observed(['Restaurant Name', 'Aggregate rating']))
+        aggregates['votes'].add(*grouped.observed_sums(['Restaurant Name'], 'Votes'))
+    return aggregates
+
+
+@intermediate('level2.chains', requires=['run'], columns=CHAIN_COLUMNS)
+def chain_aggregates(run):
+    """Restaurants, mean rating and mean votes per name, from the loaded dataset, saved state or streamed sketches."""
+    # Update the saved aggregates with new or changed restaurants only; sketches cannot retract rows
+    if run.incremental:
+        if run.approximate:
+            warn("Warning: --approximate is ignored with --incremental; chain counts stay exact.")
+        return incremental_aggregates('level2.chains', CHAIN_COLUMNS, accumulate_chains, path=run.path, delta=run.options.delta)
+    # Keep only the most frequent names while streaming the CSV, in bounded memory
+    if run.approximate:
+        chunks = iter_chunks(CHAIN_COLUMNS, path=run.path, chunksize=getattr(run.options, 'chunksize', DEFAULT_CHUNKSIZE))
+        return accumulate_chains(chunks, sketch=run.heavy_hitters(values=['Aggregate rating', 'Votes']))
+    return accumulate_chains([run.get('dataset')[CHAIN_COLUMNS]])
 
-# Identify restaurant chains and analyze their ratings and popularity
 
 # Task 4: Restaurant Chains
-with open("Level_2_Task_4_Output.txt", "w") as file:
-    try:
-        # Check for missing values in 'Restaurant Name' and 'Aggregate rating' columns
-        if df['Restaurant Name'].isnull().any() or df['Aggregate rating'].isnull().any():
-            raise KeyError("Missing values found in 'Restaurant Name' or 'Aggregate rating' columns.")
-
-        # Identify restaurant chains by grouping by 'Restaurant Name' and counting the occurrences
-        restaurant_chains = df['Restaurant Name'].value_counts()
-        chains = restaurant_chains[restaurant_chains > 1]
-        file.write("\nRestaurant Chains:\n")
-        file.write(f"{chains}\n")
-
-        # Analyze the ratings and popularity of different restaurant chains
-        chain_ratings = df[df['Restaurant Name'].isin(chains.index)].groupby('Restaurant Name')['Aggregate rating'].mean()
-        chain_popularity = df[df['Restaurant Name'].isin(chains.index)].groupby('Restaurant Name')['Votes'].mean()
-
-        # Limit to top 10 restaurant chains based on the number of restaurants
-        top_chains = chains[:10].index
-        top_chain_ratings = chain_ratings[top_chains]
-        top_chain_popularity = chain_popularity[top_chains]
-       
-        # Print the results neatly
-        file.write("\nAverage Ratings for Top 10 Restaurant Chains:\n")
-        for chain, avg_rating in top_chain_ratings.items():
-            file.write(f"{chain}: {avg_rating:.2f}\n")
-
-        file.write("\nPopularity (Average Votes) for Top 10 Restaurant Chains:\n")
-        for chain, avg_votes in top_chain_popularity.items():
-            file.write(f"{chain}: {avg_votes:.2f}\n")
-
-        # Create a bar chart visualization for the average ratings of restaurant chains
-        plt.figure(figsize=(14, 8))
-        sns.barplot(x=top_chain_ratings.index, y=top_chain_ratings.values, hue=top_chain_ratings.index, palette="viridis", dodge=False, legend=False)
-        plt.title("Average Ratings of Top 10 Restaurant Chains")
-        plt.xlabel("Restaurant Chain")
-        plt.ylabel("Average Rating")
-        plt.xticks(rotation=45)
-        plt.savefig("Level_2_Task_4_Average_Ratings_Top_10_Restaurant_Chains.png")
-        plt.show()
-
-        # Create a bar chart visualization for the popularity (average votes) of restaurant chains
-        plt.figure(figsize=(14, 8))
-        sns.barplot(x=top_chain_popularity.index, y=top_chain_popularity.values, hue=top_chain_popularity.index, palette="viridis", dodge=False, legend=False)
-        plt.title("Popularity (Average Votes) of Top 10 Restaurant Chains")
-        plt.xlabel("Restaurant Chain")
-        plt.ylabel("Average Votes")
-        plt.xticks(rotation=45)
-        plt.savefig("Level_2_Task_4_Popularity_Top_10_Restaurant_Chains.png")
-        plt.show()
-
-    except KeyError as e:
-        file.write(f"Error: {e}\n")
-    except Exception as e:
-        file.write(f"An unexpected error occurred: {e}\n")
-
-print("Finished Level 2, Task 4: Restaurant Chains")  # Debug print
+@task('level2.task4', requires=['level2.chains', 'options'], incremental=True)
+def task4(aggregates, options):
+    log("Starting Level 2, Task 4: Restaurant Chains")
+
+    # Identify restaurant chains and analyze their ratings and popularity
+    with open_output("Level_2_Task_4_Output.txt") as file:
+        try:
+            # Check for missing values in 'Restaurant Name' and 'Aggregate rating' columns
+            if aggregates['missing']['Restaurant Name'] or aggregates['missing']['Aggregate rating']:
+                raise KeyError("Missing values found in 'Restaurant Name' or 'Aggregate rating' columns.")
+
+            # Resolve spelling variants of a name ("Domino's Pizza", "Dominos Pizza") to one chain,
+            # named after its most common spelling, and combine their restaurants
+            resolved = resolve_chains(aggregates['names'].counts, similarity=options.chain_similarity)
+            variants = resolved[resolved.index != resolved['chain']]
+            mapping = variants['chain'].to_dict()
+            names = aggregates['names'].regroup(mapping)
+
+            # Identify restaurant chains by counting the restaurants of each chain
+            # Names are kept in order of first appearance and sorted as value_counts() sorts them, so equal counts come out as before
+            restaurant_chains = pd.Series(names.counts, dtype='int64').sort_values(ascending=False).rename('count').rename_axis('Restaurant Name')
+            chains = restaurant_chains[restaurant_chains > 1]
+            count_rows_out(len(chains))
+            file.write("\nRestaurant Chains:\n")
+            file.write(f"{chains}\n")
+
+            # List the names that were merged into another spelling
+            if len(variants):
+                file.write("\nName Variants Merged into Chains:\n")
+                for name, chain in variants['chain'].sort_values(kind='stable').items():
+                    file.write(f"{name!r} -> {chain!r}\n")
+
+            # Analyze the ratings and popularity of different restaurant chains
+            chain_ratings = aggregates['ratings'].regroup(mapping).to_series()
+            chain_popularity = aggregates['votes'].regroup(mapping).to_series()
+
+            # Limit to top 10 restaurant chains based on the number of restaurants
+            top_chains = chains[:10].index
+            top_chain_ratings = chain_ratings[top_chains]
+            top_chain_popularity = chain_popularity[top_chains]
+
+            # Print the results neatly
+            file.write("\nAverage Ratings for Top 10 Restaurant Chains:\n")
+            for chain, avg_rating in top_chain_ratings.items():
+                file.write(f"{chain}: {avg_rating:.2f}\n")
+
+            file.write("\nPopularity (Average Votes) for Top 10 Restaurant Chains:\n")
+            for chain, avg_votes in top_chain_popularity.items():
+                file.write(f"{chain}: {avg_votes:.2f}\n")
+
+            # Only the most frequent names were kept; say how far their counts may be off
+            if isinstance(aggregates['names'], HeavyHitters):
+                file.write(f"\nApproximate counts of the {len(aggregates['names'].counts)} most frequent names: each is at most "
+                           f"{names.error_bound()} restaurants above the true count; means cover the rows seen while a name was tracked\n")
+
+            # Save the chain of every restaurant name, with its normalized key and stable chain id
+            with open_output("Level_2_Task_4_Chain_Ids.csv") as ids:
+                resolved.sort_index().to_csv(ids)
+
+            # Create a bar chart visualization for the average ratings of restaurant chains, rendered once all tasks have run
+            submit_chart("Level_2_Task_4_Average_Ratings_Top_10_Restaurant_Chains.png", draw_average_ratings_top_10_restaurant_chains, figsize=(14, 8), top_chain_ratings=top_chain_ratings)
+
+            # Create a bar chart visualization for the popularity (average votes) of restaurant chains, rendered once all tasks have run
+            submit_chart("Level_2_Task_4_Popularity_Top_10_Restaurant_Chains.png", draw_popularity_top_10_restaurant_chains, figsize=(14, 8), top_chain_popularity=top_chain_popularity)
+
+        except KeyError as e:
+            file.write(f"Error: {e}\n")
+        except Exception as e:
+            file.write(f"An unexpected error occurred: {e}\n")
+
+    log("Finished Level 2, Task 4: Restaurant Chains")
+
+
+def draw_average_ratings_top_10_restaurant_chains(top_chain_ratings):
+    # Plotting libraries are only imported when charts are rendered
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    sns.barplot(x=top_chain_ratings.index.astype(str), y=top_chain_ratings.values, hue=top_chain_ratings.index.astype(str), palette="viridis", dodge=False, legend=False)
+    plt.title("Average Ratings of Top 10 Restaurant Chains")
+    plt.xlabel("Restaurant Chain")
+    plt.ylabel("Average Rating")
+    plt.xticks(rotation=45)
+
+
+def draw_popularity_top_10_restaurant_chains(top_chain_popularity):
+    # Plotting libraries are only imported when charts are rendered
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    sns.barplot(x=top_chain_popularity.index.astype(str), y=top_chain_popularity.values, hue=top_chain_popularity.index.astype(str), palette="viridis", dodge=False, legend=False)
+    plt.title("Popularity (Average Votes) of Top 10 Restaurant Chains")
+    plt.xlabel("Restaurant Chain")
+    plt.ylabel("Average Votes")
+    plt.xticks(rotation=45)
+
+if __name__ == "__main__":
+    run_level('level2', start_time=START_TIME)
 
 # Summary of Results
 
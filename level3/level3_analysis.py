@@ -8,131 +8,176 @@
 # Additionally, create visualizations to display the most common keywords and the relationship between review length and rating.
 
 # Import necessary libraries for analysis
-from collections import Counter
-from wordcloud import WordCloud
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
+# Plotting and NLTK are imported inside the functions that use them, so startup stays fast
+import time
+START_TIME = time.perf_counter()
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-
-# Download NLTK data files (if not already downloaded)
-nltk.download('punkt')
-nltk.download('stopwords')
-
-# Load the dataset into a DataFrame
-try:
-    df = pd.read_csv("cognifyz_dataset.csv")
-except FileNotFoundError:
-    print("Error: The file 'cognifyz_dataset.csv' was not found.")
-    exit(1)
-except pd.errors.EmptyDataError:
-    print("Error: The file 'cognifyz_dataset.csv' is empty.")
-    exit(1)
-except pd.errors.ParserError:
-    print("Error: The file 'cognifyz_dataset.csv' could not be parsed.")
-    exit(1)
-except Exception as e:
-    print(f"An unexpected error occurred: {e}")
-    exit(1)
-
-print("Starting Level 3, Task 1: Restaurant Reviews")  # Debug print
-
-# Analyze the text reviews
-with open("Level_3_Task_1_Output.txt", "w") as file:
-    try:
-        # Check if 'Review' column exists
-        if 'Review' not in df.columns:
-            file.write("The column 'Review' does not exist in the DataFrame. Skipping review analysis.\n")
-        else:
-            # Check for missing values in 'Review' and 'Aggregate rating' columns
-            if df['Review'].isnull().any() or df['Aggregate rating'].isnull().any():
-                raise KeyError("Missing values found in 'Review' or 'Aggregate rating' columns.")
-
-            # Tokenize the reviews and remove stopwords
-            stop_words = set(stopwords.words('english'))
-            df['Review Tokens'] = df['Review'].apply(lambda x: [word for word in word_tokenize(x.lower()) if word.isalnum() and word not in stop_words])
-
-            # Identify the most common positive and negative keywords
-            positive_reviews = df[df['Aggregate rating'] >= 4]['Review Tokens'].sum()
-            negative_reviews = df[df['Aggregate rating'] <= 2]['Review Tokens'].sum()
-
-            positive_keywords = Counter(positive_reviews).most_common(10)
-            negative_keywords = Counter(negative_reviews).most_common(10)
-
-            file.write("\nMost Common Positive Keywords:\n")
-            for word, count in positive_keywords:
-                file.write(f"{word}: {count}\n")
-
-            file.write("\nMost Common Negative Keywords:\n")
-            for word, count in negative_keywords:
-                file.write(f"{word}: {count}\n")
-
-            # Calculate the average length of reviews
-            df['Review Length'] = df['Review'].apply(len)
-            average_review_length = df['Review Length'].mean()
-            file.write(f"\nAverage Length of Reviews: {average_review_length:.2f} characters\n")
-
-            # Explore the relationship between review length and rating
-            plt.figure(figsize=(12, 8))
-            sns.boxplot(x='Aggregate rating', y='Review Length', data=df)
-            plt.title("Relationship Between Review Length and Rating", fontsize=16)
-            plt.xlabel("Rating", fontsize=14)
-            plt.ylabel("Review Length (characters)", fontsize=14)
-            plt.xticks(fontsize=12)
-            plt.yticks(fontsize=12)
-            plt.grid(True)
-            plt.savefig("Level_3_Task_1_Review_Length_vs_Rating.png")
-            plt.show()
-
-    except KeyError as e:
-        file.write(f"Error: {e}\n")
-    except Exception as e:
-        file.write(f"An unexpected error occurred: {e}\n")
-
-print("Finished Level 3, Task 1: Restaurant Reviews")  # Debug print
+import os
+import sys
+
+# Make the shared 'restaurants' package importable when run as a script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from restaurants.aggregation import Grouper
+from restaurants.artifacts import open_output
+from restaurants.charts import submit_chart
+from restaurants.incremental import incremental_aggregates
+from restaurants.keywords import DEFAULT_BATCH_SIZE, TOKENIZERS, count_keywords
+from restaurants.metrics import count_rows_out, log, warn
+from restaurants.runner import arguments, intermediate, run_level, task
+from restaurants.scatter import DEFAULT_MAX_POINTS, SCATTER_MODES, ScatterSummary, draw_scatter_summary
+from restaurants.stopwords import english_stop_words, nltk_tokenizer_available
+from restaurants.streaming import CountAccumulator
+
+# Columns used by Task 3, whose counts can be kept up to date with --incremental
+SERVICE_COLUMNS = ['Price range', 'Has Online delivery', 'Has Table booking']
+
+# Service flags are loaded as booleans; report them as 'No'/'Yes' columns as in the CSV
+SERVICE_LABELS = {False: 'No', True: 'Yes'}
+
+# The tasks below are registered with the task runner (restaurants/runner.py) and
+# each declares the columns it reads, so a single task parses only those columns.
+
+
+@arguments('level3')
+def add_arguments(parser):
+    parser.add_argument("--tokenizer", choices=('auto',) + TOKENIZERS, default='auto',
+                        help="how reviews are split into words in Task 1 ('auto': NLTK's word_tokenize as before when its data is installed, else the regex)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="reviews per tokenization batch in Task 1")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes used to count review keywords in Task 1")
+    parser.add_argument("--scatter-mode", choices=SCATTER_MODES, default='auto', help="how restaurants are drawn on the votes vs. rating charts")
+    parser.add_argument("--scatter-max-points", type=int, default=DEFAULT_MAX_POINTS, help="largest number of restaurants drawn point by point on the votes vs. rating charts")
+
+
+# Task 1: Restaurant Reviews
+@task('level3.task1', requires=['dataset', 'options'], columns=['Review', 'Aggregate rating'])
+def task1(df, options):
+    log("Starting Level 3, Task 1: Restaurant Reviews")
+
+    # Analyze the text reviews
+    with open_output("Level_3_Task_1_Output.txt") as file:
+        try:
+            # Check if 'Review' column exists
+            if 'Review' not in df.columns:
+                file.write("The column 'Review' does not exist in the DataFrame. Skipping review analysis.\n")
+            else:
+                # Check for missing values in 'Review' and 'Aggregate rating' columns
+                if df['Review'].isnull().any() or df['Aggregate rating'].isnull().any():
+                    raise KeyError("Missing values found in 'Review' or 'Aggregate rating' columns.")
+
+                # Tokenize the reviews in batches, remove stopwords and count keywords for positive (>= 4) and negative (<= 2) ratings
+                # NLTK data is never downloaded here: use local resources, or the bundled stop words and regex tokenizer
+                stop_words = english_stop_words()
+                tokenizer = options.tokenizer
+                if tokenizer == 'auto':
+                    # word_tokenize keeps the keyword counts of the original analysis (hyphenated words, "'s" tokens)
+                    tokenizer = 'nltk' if nltk_tokenizer_available() else 'regex'
+                elif tokenizer == 'nltk' and not nltk_tokenizer_available():
+                    warn("NLTK 'punkt' tokenizer is not installed locally; using the regex tokenizer instead.")
+                    tokenizer = 'regex'
+                keyword_counts, average_review_length = count_keywords(df['Review'].to_numpy(), df['Aggregate rating'].to_numpy(), stop_words,
+                                                                       tokenizer=tokenizer, batch_size=options.batch_size, workers=options.workers)
+
+                # Identify the most common positive and negative keywords
+                count_rows_out(sum(len(counts) for counts in keyword_counts.values()))
+                positive_keywords = keyword_counts['positive'].most_common(10)
+                negative_keywords = keyword_counts['negative'].most_common(10)
+
+                file.write("\nMost Common Positive Keywords:\n")
+                for word, count in positive_keywords:
+                    file.write(f"{word}: {count}\n")
+
+                file.write("\nMost Common Negative Keywords:\n")
+                for word, count in negative_keywords:
+                    file.write(f"{word}: {count}\n")
+
+                # Report the average length of reviews, measured while counting keywords
+                file.write(f"\nAverage Length of Reviews: {average_review_length:.2f} characters\n")
+
+                # Explore the relationship between review length and rating, on a copy so the shared DataFrame is unchanged
+                review_lengths = df[['Aggregate rating']].assign(**{'Review Length': df['Review'].str.len()})
+
+                # Rendered once all tasks have run
+                submit_chart("Level_3_Task_1_Review_Length_vs_Rating.png", draw_review_length_vs_rating, figsize=(12, 8), review_lengths=review_lengths)
+
+        except KeyError as e:
+            file.write(f"Error: {e}\n")
+        except Exception as e:
+            file.write(f"An unexpected error occurred: {e}\n")
+
+    log("Finished Level 3, Task 1: Restaurant Reviews")
+
+
+def draw_review_length_vs_rating(review_lengths):
+    # Plotting libraries are only imported when charts are rendered
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    sns.boxplot(x='Aggregate rating', y='Review Length', data=review_lengths)
+    plt.title("Relationship Between Review Length and Rating", fontsize=16)
+    plt.xlabel("Rating", fontsize=14)
+    plt.ylabel("Review Length (characters)", fontsize=14)
+    plt.xticks(fontsize=12)
+    plt.yticks(fontsize=12)
+    plt.grid(True)
+
+
+# The alternative analysis and Task 2 chart the same votes and ratings, so the
+# fitted line and the density or point sample are computed once for both
+@intermediate('level3.votes_ratings', requires=['dataset', 'options'], columns=['Votes', 'Aggregate rating'])
+def votes_ratings(df, options):
+    """What the votes vs. rating charts draw: a linear fit and the points or their density."""
+    return ScatterSummary(df, 'Votes', 'Aggregate rating', mode=options.scatter_mode, max_points=options.scatter_max_points)
+
 
 # Alternative Analysis: Sentiment Analysis on Rating Text and Votes
-with open("Level_3_Task_1_Alternative_Analysis_Output.txt", "w") as file:
-    try:
-        # Check if 'Rating text' and 'Votes' columns exist
-        if 'Rating text' not in df.columns or 'Votes' not in df.columns:
-            raise KeyError("The required columns 'Rating text' or 'Votes' do not exist in the DataFrame.")
-
-        # Map 'Rating text' to sentiment scores
-        sentiment_mapping = {
-            'Excellent': 5,
-            'Very Good': 4,
-            'Good': 3,
-            'Average': 2,
-            'Poor': 1
-        }
-        df['Sentiment Score'] = df['Rating text'].map(sentiment_mapping)
-
-        # Calculate the average sentiment score
-        average_sentiment_score = df['Sentiment Score'].mean()
-        file.write(f"\nAverage Sentiment Score: {average_sentiment_score:.2f}\n")
-
-        # Analyze the relationship between the number of votes and the aggregate rating
-        plt.figure(figsize=(12, 8))
-        sns.scatterplot(x='Votes', y='Aggregate rating', data=df)
-        sns.regplot(x='Votes', y='Aggregate rating', data=df, scatter=False, color='red')
-        plt.title("Relationship Between Number of Votes and Aggregate Rating", fontsize=16)
-        plt.xlabel("Number of Votes", fontsize=14)
-        plt.ylabel("Aggregate Rating", fontsize=14)
-        plt.xticks(fontsize=12)
-        plt.yticks(fontsize=12)
-        plt.grid(True)
-        plt.savefig("Level_3_Task_1_Votes_vs_Rating.png")
-        plt.show()
-
-    except KeyError as e:
-        file.write(f"Error: {e}\n")
-    except Exception as e:
-        file.write(f"An unexpected error occurred: {e}\n")
-
-print("Finished Level 3, Task 1: Restaurant Reviews and Alternative Analysis")  # Debug print
+@task('level3.task1_alternative', requires=['dataset', 'level3.votes_ratings'], columns=['Rating text', 'Aggregate rating', 'Votes'])
+def task1_alternative(df, votes_ratings):
+    with open_output("Level_3_Task_1_Alternative_Analysis_Output.txt") as file:
+        try:
+            # Check if 'Rating text' and 'Votes' columns exist
+            if 'Rating text' not in df.columns or 'Votes' not in df.columns:
+                raise KeyError("The required columns 'Rating text' or 'Votes' do not exist in the DataFrame.")
+
+            # Map 'Rating text' to sentiment scores
+            sentiment_mapping = {
+                'Excellent': 5,
+                'Very Good': 4,
+                'Good': 3,
+                'Average': 2,
+                'Poor': 1
+            }
+            sentiment_scores = df['Rating text'].map(sentiment_mapping).astype('float64')
+            count_rows_out(len(sentiment_scores))
+
+            # Calculate the average sentiment score
+            average_sentiment_score = sentiment_scores.mean()
+            file.write(f"\nAverage Sentiment Score: {average_sentiment_score:.2f}\n")
+
+            # Analyze the relationship between the number of votes and the aggregate rating, rendered once all tasks have run
+            submit_chart("Level_3_Task_1_Votes_vs_Rating.png", draw_votes_vs_rating, figsize=(12, 8), votes_ratings=votes_ratings,
+                         title="Relationship Between Number of Votes and Aggregate Rating")
+
+        except KeyError as e:
+            file.write(f"Error: {e}\n")
+        except Exception as e:
+            file.write(f"An unexpected error occurred: {e}\n")
+
+    log("Finished Level 3, Task 1: Restaurant Reviews and Alternative Analysis")
+
+
+def draw_votes_vs_rating(votes_ratings, title, alpha=None):
+    # Plotting libraries are only imported when charts are rendered
+    import matplotlib.pyplot as plt
+
+    # Points or their density, and the regression line with its 95% confidence band
+    draw_scatter_summary(votes_ratings, alpha=alpha, color='red')
+    plt.title(title, fontsize=16)
+    plt.xlabel("Number of Votes", fontsize=14)
+    plt.ylabel("Aggregate Rating", fontsize=14)
+    plt.xticks(fontsize=12)
+    plt.yticks(fontsize=12)
+    plt.grid(True)
+
 
 # Level 3, Task 2: Votes Analysis
 
@@ -143,45 +188,41 @@ print("Finished Level 3, Task 1: Restaurant Reviews and Alternative Analysis")
 
 # Additionally, create visualizations to display the correlation between votes and rating.
 
-print("Starting Level 3, Task 2: Votes Analysis")  # Debug print
-
-# Analyze the votes data
-with open("Level_3_Task_2_Output.txt", "w") as file:
-    try:
-        # Check if 'Votes' and 'Aggregate rating' columns exist
-        if 'Votes' not in df.columns or 'Aggregate rating' not in df.columns:
-            raise KeyError("The required columns 'Votes' or 'Aggregate rating' do not exist in the DataFrame.")
-
-        # Identify the restaurants with the highest and lowest number of votes
-        highest_votes = df.loc[df['Votes'].idxmax()]
-        lowest_votes = df.loc[df['Votes'].idxmin()]
-
-        file.write(f"\nRestaurant with the highest number of votes:\n{highest_votes[['Restaurant Name', 'Votes', 'Aggregate rating']]}\n")
-        file.write(f"\nRestaurant with the lowest number of votes:\n{lowest_votes[['Restaurant Name', 'Votes', 'Aggregate rating']]}\n")
-
-        # Analyze the correlation between the number of votes and the rating
-        correlation = df['Votes'].corr(df['Aggregate rating'])
-        file.write(f"\nCorrelation between number of votes and aggregate rating: {correlation:.2f}\n")
-
-        # Create a scatter plot with a regression line to visualize the correlation
-        plt.figure(figsize=(12, 8))
-        sns.scatterplot(x='Votes', y='Aggregate rating', data=df, alpha=0.5)
-        sns.regplot(x='Votes', y='Aggregate rating', data=df, scatter=False, color='red')
-        plt.title("Correlation Between Number of Votes and Aggregate Rating", fontsize=16)
-        plt.xlabel("Number of Votes", fontsize=14)
-        plt.ylabel("Aggregate Rating", fontsize=14)
-        plt.xticks(fontsize=12)
-        plt.yticks(fontsize=12)
-        plt.grid(True)
-        plt.savefig("Level_3_Task_2_Votes_vs_Rating.png")
-        plt.show()
-
-    except KeyError as e:
-        file.write(f"Error: {e}\n")
-    except Exception as e:
-        file.write(f"An unexpected error occurred: {e}\n")
-
-print("Finished Level 3, Task 2: Votes Analysis")  # Debug print
+# Task 2: Votes Analysis
+@task('level3.task2', requires=['dataset', 'level3.votes_ratings'], columns=['Restaurant Name', 'Aggregate rating', 'Votes'])
+def task2(df, votes_ratings):
+    log("Starting Level 3, Task 2: Votes Analysis")
+
+    # Analyze the votes data
+    with open_output("Level_3_Task_2_Output.txt") as file:
+        try:
+            # Check if 'Votes' and 'Aggregate rating' columns exist
+            if 'Votes' not in df.columns or 'Aggregate rating' not in df.columns:
+                raise KeyError("The required columns 'Votes' or 'Aggregate rating' do not exist in the DataFrame.")
+
+            # Identify the restaurants with the highest and lowest number of votes
+            highest_votes = df.loc[df['Votes'].idxmax()]
+            lowest_votes = df.loc[df['Votes'].idxmin()]
+            count_rows_out(2)
+
+            file.write(f"\nRestaurant with the highest number of votes:\n{highest_votes[['Restaurant Name', 'Votes', 'Aggregate rating']]}\n")
+            file.write(f"\nRestaurant with the lowest number of votes:\n{lowest_votes[['Restaurant Name', 'Votes', 'Aggregate rating']]}\n")
+
+            # Analyze the correlation between the number of votes and the rating
+            correlation = df['Votes'].corr(df['Aggregate rating'])
+            file.write(f"\nCorrelation between number of votes and aggregate rating: {correlation:.2f}\n")
+
+            # Create a scatter plot with a regression line to visualize the correlation, rendered once all tasks have run
+            submit_chart("Level_3_Task_2_Votes_vs_Rating.png", draw_votes_vs_rating, figsize=(12, 8), votes_ratings=votes_ratings,
+                         title="Correlation Between Number of Votes and Aggregate Rating", alpha=0.5)
+
+        except KeyError as e:
+            file.write(f"Error: {e}\n")
+        except Exception as e:
+            file.write(f"An unexpected error occurred: {e}\n")
+
+    log("Finished Level 3, Task 2: Votes Analysis")
+
 
 # Level 3, Task 3: Price Range vs. Online Delivery and Table Booking
 
@@ -192,55 +233,105 @@ print("Finished Level 3, Task 2: Votes Analysis")  # Debug print
 
 # Additionally, create visualizations to display the relationship between price range and the availability of these services.
 
-print("Starting Level 3, Task 3: Price Range vs. Online Delivery and Table Booking")  # Debug print
-
-# Analyze the relationship between price range and the availability of online delivery and table booking
-with open("Level_3_Task_3_Output.txt", "w") as file:
-    try:
-        # Check if 'Price range', 'Has Online delivery', and 'Has Table booking' columns exist
-        if 'Price range' not in df.columns or 'Has Online delivery' not in df.columns or 'Has Table booking' not in df.columns:
-            raise KeyError("The required columns 'Price range', 'Has Online delivery', or 'Has Table booking' do not exist in the DataFrame.")
-
-        # Analyze the relationship between price range and online delivery
-        online_delivery_by_price = df.groupby('Price range')['Has Online delivery'].value_counts(normalize=True).unstack().fillna(0) * 100
-        file.write("\nOnline Delivery by Price Range (%):\n")
-        file.write(f"{online_delivery_by_price}\n")
-
-        # Analyze the relationship between price range and table booking
-        table_booking_by_price = df.groupby('Price range')['Has Table booking'].value_counts(normalize=True).unstack().fillna(0) * 100
-        file.write("\nTable Booking by Price Range (%):\n")
-        file.write(f"{table_booking_by_price}\n")
-
-        # Create a bar chart visualization for online delivery by price range
-        online_delivery_by_price.plot(kind='bar', stacked=True, figsize=(12, 8), color=['red', 'green'])
-        plt.title("Online Delivery by Price Range", fontsize=16)
-        plt.xlabel("Price Range", fontsize=14)
-        plt.ylabel("Percentage (%)", fontsize=14)
-        plt.xticks(fontsize=12)
-        plt.yticks(fontsize=12)
-        plt.legend(title='Online Delivery', labels=['No', 'Yes'], fontsize=12)
-        plt.grid(True)
-        plt.savefig("Level_3_Task_3_Online_Delivery_by_Price_Range.png")
-        plt.show()
-
-        # Create a bar chart visualization for table booking by price range
-        table_booking_by_price.plot(kind='bar', stacked=True, figsize=(12, 8), color=['red', 'green'])
-        plt.title("Table Booking by Price Range", fontsize=16)
-        plt.xlabel("Price Range", fontsize=14)
-        plt.ylabel("Percentage (%)", fontsize=14)
-        plt.xticks(fontsize=12)
-        plt.yticks(fontsize=12)
-        plt.legend(title='Table Booking', labels=['No', 'Yes'], fontsize=12)
-        plt.grid(True)
-        plt.savefig("Level_3_Task_3_Table_Booking_by_Price_Range.png")
-        plt.show()
-
-    except KeyError as e:
-        file.write(f"Error: {e}\n")
-    except Exception as e:
-        file.write(f"An unexpected error occurred: {e}\n")
-
-print("Finished Level 3, Task 3: Price Range vs. Online Delivery and Table Booking")  # Debug print
+def accumulate_services(chunks):
+    """Reduce DataFrame chunks to the restaurants per price range and service flag needed by Task 3."""
+    aggregates = {service: CountAccumulator() for service in SERVICE_COLUMNS[1:]}
+    for chunk in chunks:
+        # The price ranges are factorized once for both services
+        grouped = Grouper(chunk)
+        for service, counts in aggregates.items():
+            counts.add(grouped.observed(['Price range', service]))
+    return aggregates
+
+
+def index_services(index):
+    """The counts of accumulate_services(), as popcounts of the loaded dataset's bitmap index."""
+    aggregates = {service: CountAccumulator() for service in SERVICE_COLUMNS[1:]}
+    for service, counts in aggregates.items():
+        counts.add(index.observed(['Price range', service]))
+    return aggregates
+
+
+@intermediate('level3.services', requires=['run'], columns=SERVICE_COLUMNS)
+def service_aggregates(run):
+    """Restaurants per price range and service flag, from the bitmap index or saved state."""
+    # Update the saved aggregates with new or changed restaurants only
+    if run.incremental:
+        return incremental_aggregates('level3.services', SERVICE_COLUMNS, accumulate_services, path=run.path, delta=run.options.delta)
+    return index_services(run.get('bitmaps'))
+
+
+def percentages_by_price(counts, service):
+    """Share (%) of restaurants in each price range with and without `service`, as 'No'/'Yes' columns."""
+    table = pd.Series(counts.counts, dtype='int64').sort_index().unstack(fill_value=0)
+    table = table.div(table.sum(axis=1), axis=0) * 100
+    return table.rename_axis(index='Price range', columns=service).rename(columns=SERVICE_LABELS)
+
+
+# Task 3: Price Range vs. Online Delivery and Table Booking
+@task('level3.task3', requires=['level3.services'], incremental=True)
+def task3(aggregates):
+    log("Starting Level 3, Task 3: Price Range vs. Online Delivery and Table Booking")
+
+    # Analyze the relationship between price range and the availability of online delivery and table booking
+    with open_output("Level_3_Task_3_Output.txt") as file:
+        try:
+            # Analyze the relationship between price range and online delivery
+            online_delivery_by_price = percentages_by_price(aggregates['Has Online delivery'], 'Has Online delivery')
+            count_rows_out(len(online_delivery_by_price))
+            file.write("\nOnline Delivery by Price Range (%):\n")
+            file.write(f"{online_delivery_by_price}\n")
+
+            # Analyze the relationship between price range and table booking
+            table_booking_by_price = percentages_by_price(aggregates['Has Table booking'], 'Has Table booking')
+            count_rows_out(len(table_booking_by_price))
+            file.write("\nTable Booking by Price Range (%):\n")
+            file.write(f"{table_booking_by_price}\n")
+
+            # Create a bar chart visualization for online delivery by price range, rendered once all tasks have run
+            submit_chart("Level_3_Task_3_Online_Delivery_by_Price_Range.png", draw_online_delivery_by_price_range, figsize=(12, 8), online_delivery_by_price=online_delivery_by_price)
+
+            # Create a bar chart visualization for table booking by price range, rendered once all tasks have run
+            submit_chart("Level_3_Task_3_Table_Booking_by_Price_Range.png", draw_table_booking_by_price_range, figsize=(12, 8), table_booking_by_price=table_booking_by_price)
+
+        except KeyError as e:
+            file.write(f"Error: {e}\n")
+        except Exception as e:
+            file.write(f"An unexpected error occurred: {e}\n")
+
+    log("Finished Level 3, Task 3: Price Range vs. Online Delivery and Table Booking")
+
+
+def draw_online_delivery_by_price_range(online_delivery_by_price):
+    # Plotting libraries are only imported when charts are rendered
+    import matplotlib.pyplot as plt
+
+    online_delivery_by_price.plot(kind='bar', stacked=True, ax=plt.gca(), color=['red', 'green'])
+    plt.title("Online Delivery by Price Range", fontsize=16)
+    plt.xlabel("Price Range", fontsize=14)
+    plt.ylabel("Percentage (%)", fontsize=14)
+    plt.xticks(fontsize=12)
+    plt.yticks(fontsize=12)
+    plt.legend(title='Online Delivery', labels=['No', 'Yes'], fontsize=12)
+    plt.grid(True)
+
+
+def draw_table_booking_by_price_range(table_booking_by_price):
+    # Plotting libraries are only imported when charts are rendered
+    import matplotlib.pyplot as plt
+
+    table_booking_by_price.plot(kind='bar', stacked=True, ax=plt.gca(), color=['red', 'green'])
+    plt.title("Table Booking by Price Range", fontsize=16)
+    plt.xlabel("Price Range", fontsize=14)
+    plt.ylabel("Percentage (%)", fontsize=14)
+    plt.xticks(fontsize=12)
+    plt.yticks(fontsize=12)
+    plt.legend(title='Table Booking', labels=['No', 'Yes'], fontsize=12)
+    plt.grid(True)
+
+
+if __name__ == "__main__":
+    run_level('level3', start_time=START_TIME)
 
 # Summary of Results
 
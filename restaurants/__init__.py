@@ -0,0 +1,4 @@
+# Shared helpers for the restaurant analysis levels.
+
+# The level scripts in level1/, level2/ and level3/ import from this package so
+# that the dataset schema and loading logic live in one place.
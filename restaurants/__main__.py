@@ -0,0 +1,9 @@
+# Command-line entry point: python -m restaurants run level2.task4
+
+import time
+
+START_TIME = time.perf_counter()
+
+from restaurants.runner import main
+
+main(start_time=START_TIME)
@@ -0,0 +1,160 @@
+# Multi-key group counts and sums in one pass over a frame.
+
+# The group-by tasks ask for many small tables over overlapping keys: rows per
+# city, per (city, rating), per (price range, online delivery), votes per
+# restaurant name, and so on. Grouper factorizes each key column of a frame
+# once (categorical codes are used as they are), combines the codes of a key
+# set into one integer per row and computes every count and sum with
+# np.bincount, so a family of tables costs one scan per column instead of one
+# groupby per table.
+#
+# Rows can be excluded with a mask instead of copying the frame. Key
+# combinations are numbered densely when their product would be much larger
+# than the frame, which keeps bincount's output small for high-cardinality
+# keys such as restaurant names.
+
+import numpy as np
+import pandas as pd
+
+
+class Group:
+    """Codes of one key combination for the selected rows, and the index they stand for."""
+
+    def __init__(self, codes, valid, index):
+        self.codes = codes      # one code per row where no key is missing
+        self.valid = valid      # mask of those rows in the frame
+        self.index = index      # code -> key value, or key tuple (MultiIndex)
+
+
+class Grouper:
+    """Counts and sums over `frame` (a DataFrame or a dict of columns) grouped by key columns.
+
+    Factorized columns and combined codes are kept, so every table that shares
+    a key costs one more bincount rather than another pass over the key.
+    """
+
+    def __init__(self, frame, rows=None):
+        self.frame = frame
+        self.rows = None if rows is None else np.asarray(rows, dtype=bool)
+        self.factors = {}
+        self.groups = {}
+
+    def factorize(self, column):
+        """Return (codes, uniques) of a column; missing values and excluded rows get code -1."""
+        if column not in self.factors:
+            values = self.frame[column]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                codes, uniques = values.cat.codes.to_numpy().astype(np.int64), values.cat.categories
+            elif values.dtype == bool:
+                codes, uniques = values.to_numpy().astype(np.int64), pd.Index([False, True])
+            else:
+                codes, uniques = pd.factorize(values, sort=False)
+                codes = codes.astype(np.int64)
+            if self.rows is not None:
+                codes = np.where(self.rows, codes, -1)
+            self.factors[column] = (codes, pd.Index(uniques))
+        return self.factors[column]
+
+    def group(self, keys):
+        """Combine the codes of `keys`; rows where any key is missing are left out."""
+        keys = tuple(keys)
+        if keys not in self.groups:
+            factors = [self.factorize(key) for key in keys]
+            valid = np.logical_and.reduce([codes >= 0 for codes, _ in factors])
+            shape = tuple(len(uniques) for _, uniques in factors)
+            combined = np.zeros(int(valid.sum()), dtype=np.int64)
+            for (codes, _), width in zip(factors, shape):
+                combined = combined * width + codes[valid]
+            size = int(np.prod(shape, dtype=np.int64))
+            if size > 2 * len(combined) + 1024:
+                # Too many possible combinations for a dense table: number the observed ones
+                combined, observed = pd.factorize(combined, sort=True)
+            else:
+                observed = np.arange(size)
+            positions = np.unravel_index(observed, shape)
+            if len(keys) == 1:
+                index = factors[0][1].take(positions[0]).rename(keys[0])
+            else:
+                # The uniques are distinct already, so they are the levels as they are
+                index = pd.MultiIndex(levels=[uniques for _, uniques in factors], codes=list(positions),
+                                      names=list(keys), verify_integrity=False)
+            self.groups[keys] = Group(combined, valid, index)
+        return self.groups[keys]
+
+    def count_array(self, keys):
+        """Rows per code of `keys`, including codes without rows."""
+        group = self.group(keys)
+        return np.bincount(group.codes, minlength=len(group.index))
+
+    def sum_array(self, keys, value):
+        """Return (sums, rows with a value) per code of `keys`; missing values are ignored."""
+        group = self.group(keys)
+        values = np.asarray(self.frame[value])[group.valid]
+        present = ~pd.isna(values)
+        codes = group.codes[present]
+        sums = np.bincount(codes, weights=values[present].astype(np.float64), minlength=len(group.index))
+        if np.issubdtype(values.dtype, np.integer) or values.dtype == bool:
+            # Integer sums are exact in float64 below 2**53
+            sums = sums.astype(np.int64)
+        return sums, np.bincount(codes, minlength=len(group.index))
+
+    def counts(self, keys, observed=True):
+        """Rows per key combination; with observed=False, combinations without rows are kept as 0."""
+        counts = self.count_array(keys)
+        series = pd.Series(counts, index=self.group(keys).index, dtype='int64')
+        return series[counts > 0] if observed else series
+
+    def totals(self, keys, values=()):
+        """Frame of 'rows' per observed key combination, with '<value> count' and '<value> sum' for each value column."""
+        rows = self.count_array(keys)
+        columns = {'rows': rows}
+        for value in values:
+            sums, counts = self.sum_array(keys, value)
+            columns[f"{value} count"] = counts
+            columns[f"{value} sum"] = sums
+        return pd.DataFrame(columns, index=self.group(keys).index)[rows > 0]
+
+    def means(self, keys, value, observed=True):
+        """Mean of a value per key combination; with observed=False, combinations without values are NaN."""
+        sums, counts = self.sum_array(keys, value)
+        means = sums / np.where(counts > 0, counts, 1)
+        series = pd.Series(np.where(counts > 0, means, np.nan), index=self.group(keys).index, dtype='float64')
+        return series[counts > 0] if observed else series
+
+    def observed(self, keys):
+        """Return {key or key tuple: rows} for the combinations present, as the accumulators store them."""
+        counts = self.count_array(keys)
+        present = np.flatnonzero(counts)
+        return dict(zip(self.group(keys).index[present].tolist(), counts[present].tolist()))
+
+    def first_seen(self, column):
+        """Return {value: rows} of a column with the values in order of first appearance, as value_counts() finds them."""
+        codes, uniques = self.factorize(column)
+        present = codes[codes >= 0]
+        order = pd.unique(present)
+        counts = np.bincount(present, minlength=len(uniques))
+        return dict(zip(uniques.take(order).tolist(), counts[order].tolist()))
+
+    def value_counts(self, column):
+        """Rows per value of a column in the order of value_counts() on its values, ties included."""
+        first = self.first_seen(column)
+        series = pd.Series(list(first.values()), index=pd.Index(list(first), name=column), dtype='int64', name='count')
+        # value_counts() counts in order of first appearance and then sorts with the default sort
+        return series.sort_values(ascending=False)
+
+    def observed_sums(self, keys, value):
+        """Return ({key: rows with a value}, {key: sum of the value}) for the combinations present."""
+        sums, counts = self.sum_array(keys, value)
+        present = np.flatnonzero(counts)
+        labels = self.group(keys).index[present].tolist()
+        return dict(zip(labels, counts[present].tolist())), dict(zip(labels, sums[present].tolist()))
+
+    def missing(self, columns):
+        """Return {column: missing values} among the selected rows."""
+        result = {}
+        for column in columns:
+            missing = np.asarray(pd.isna(self.frame[column]))
+            if self.rows is not None:
+                missing = missing & self.rows
+            result[column] = int(missing.sum())
+        return result
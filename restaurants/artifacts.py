@@ -0,0 +1,98 @@
+# Content-addressed output files.
+
+# Every artifact a run produces (text outputs and charts) has a key: the SHA-256
+# of a text output's content, or of a chart's input data, figure size and draw
+# function. An artifact whose key and file are unchanged since the last run is
+# not written again: open_output() leaves identical text files untouched, and
+# charts whose key matches the manifest entry are not rendered at all.
+#
+# Worker processes only record what they did; the parent merges the records
+# into .restaurants_cache/artifacts.json, which keeps the key and file
+# fingerprint of every artifact and the hits and misses of the last run.
+
+import contextlib
+import hashlib
+import io
+import json
+import os
+
+from restaurants.cache import CACHE_DIR, fingerprint
+
+# Manifest file inside the cache directory
+MANIFEST_NAME = "artifacts.json"
+
+# (artifact, status, entry) records of this process, not collected yet
+RECORDS = []
+
+
+def manifest_path(cache_dir=CACHE_DIR):
+    return os.path.join(cache_dir, MANIFEST_NAME)
+
+
+def read_entries(cache_dir=CACHE_DIR):
+    """Return {artifact: entry} from the manifest, or {} when there is none."""
+    try:
+        with open(manifest_path(cache_dir)) as manifest:
+            return json.load(manifest).get('artifacts', {})
+    except (OSError, ValueError):
+        return {}
+
+
+def unchanged(path, key, entry):
+    """Whether `path` still holds the artifact recorded in `entry` under the same key."""
+    if not entry or entry.get('key') != key or not os.path.exists(path):
+        return False
+    return fingerprint(path, entry)['sha256'] == entry.get('sha256')
+
+
+def record(path, key, hit, previous=None):
+    """Note that an artifact was reused (hit) or written (miss) by this process."""
+    entry = {'key': key, **fingerprint(path, previous)}
+    RECORDS.append((path, 'hit' if hit else 'miss', entry))
+
+
+def collect():
+    """Return and clear the records of this process."""
+    records = RECORDS[:]
+    RECORDS.clear()
+    return records
+
+
+@contextlib.contextmanager
+def open_output(path):
+    """Like open(path, "w"), but the file is only rewritten when its content changes."""
+    buffer = io.StringIO()
+    try:
+        yield buffer
+    finally:
+        content = buffer.getvalue()
+        key = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        try:
+            with open(path) as existing:
+                hit = existing.read() == content
+        except (OSError, UnicodeDecodeError):
+            hit = False
+        if not hit:
+            with open(path, "w") as file:
+                file.write(content)
+        record(path, key, hit)
+
+
+def update_manifest(records, cache_dir=CACHE_DIR):
+    """Merge a run's records into the manifest; return the number of hits and misses."""
+    entries = read_entries(cache_dir)
+    statuses = {}
+    for path, status, entry in records:
+        entries[path] = entry
+        statuses[path] = status
+    hits = sum(status == 'hit' for status in statuses.values())
+    manifest = {
+        'artifacts': entries,
+        'last_run': {'hits': hits, 'misses': len(statuses) - hits, 'artifacts': statuses},
+    }
+    os.makedirs(cache_dir, exist_ok=True)
+    target = manifest_path(cache_dir)
+    with open(target + ".tmp", "w") as handle:
+        json.dump(manifest, handle, indent=2)
+    os.replace(target + ".tmp", target)
+    return hits, len(statuses) - hits
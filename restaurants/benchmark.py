@@ -0,0 +1,217 @@
+# Scaling benchmark of the analysis tasks on synthetic data.
+
+# For every requested size, a synthetic dataset (restaurants/synthetic.py) is
+# written once and reused by later benchmarks with the same size and seed.
+# Each task then runs on its own in a fresh `python -m restaurants run`
+# process, so its wall time and peak resident memory are measured in
+# isolation, including loading the columns it needs. The first process at each
+# size only loads the full dataset, which builds the columnar cache and is
+# reported as 'dataset' (the cold CSV parse).
+#
+# Results are written as JSON (with the environment they were measured in) and
+# as CSV, one row per size and task with its status, seconds, peak RSS and rows
+# per second. A task that fails or times out is not run at larger sizes, and the
+# summary shows the largest size each task completed. --compare reads an
+# earlier JSON file and flags tasks that got slower.
+#
+# Usage:
+#   python -m restaurants.benchmark
+#   python -m restaurants.benchmark --sizes 10000 100000 --tasks level1 level2.task4
+#   python -m restaurants.benchmark --compare benchmark_results.json --output benchmark_new
+
+import argparse
+import csv
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from restaurants.cache import CACHE_DIR
+from restaurants.metrics import VERBOSITY_LEVELS, log, set_verbosity
+from restaurants.runner import REPOSITORY, select
+from restaurants.synthetic import GENERATOR_VERSION, write_dataset
+
+# Row counts benchmarked by default
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000, 10_000_000]
+
+# Where synthetic datasets and per-size working directories are kept
+BENCHMARK_DIR = os.path.join(CACHE_DIR, "benchmark")
+
+# Seconds after which a task is stopped and reported as timed out
+DEFAULT_TIMEOUT = 3600
+
+# A task is flagged by --compare when it takes this many times as long as before
+SLOWDOWN_THRESHOLD = 1.25
+
+# Columns of the CSV results file
+RESULT_FIELDS = ['rows', 'task', 'status', 'seconds', 'peak_rss_mib', 'rows_per_second', 'returncode']
+
+
+def dataset_path(rows, seed, directory=BENCHMARK_DIR):
+    """Return the synthetic CSV for `rows` and `seed`, writing it first if it does not exist."""
+    path = os.path.join(directory, f"synthetic_{rows}_seed{seed}_v{GENERATOR_VERSION}.csv")
+    if not os.path.exists(path):
+        log(f"Writing {rows} synthetic rows to {path}")
+        started = time.perf_counter()
+        write_dataset(path, rows, seed)
+        log(f"Wrote {os.path.getsize(path) / 2**20:.1f} MiB in {time.perf_counter() - started:.2f} s")
+    return path
+
+
+def measure(command, cwd, timeout):
+    """Run `command` in `cwd`; return its status, wall time, peak RSS in MiB and return code.
+
+    The child is reaped with os.wait4() to read its own peak RSS. Worker
+    processes started by the task itself are not included.
+    """
+    environment = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [REPOSITORY, os.environ.get('PYTHONPATH')])))
+    with tempfile.TemporaryFile() as errors:
+        started = time.perf_counter()
+        process = subprocess.Popen(command, cwd=cwd, env=environment, stdout=subprocess.DEVNULL, stderr=errors)
+        timed_out = threading.Event()
+
+        def stop():
+            timed_out.set()
+            process.kill()
+
+        timer = threading.Timer(timeout, stop)
+        timer.start()
+        try:
+            _, status, usage = os.wait4(process.pid, 0)
+        finally:
+            timer.cancel()
+        seconds = time.perf_counter() - started
+        process.returncode = os.waitstatus_to_exitcode(status)
+        # ru_maxrss is in KiB on Linux and in bytes on macOS
+        peak_rss_mib = usage.ru_maxrss / (2**20 if sys.platform == 'darwin' else 2**10)
+        if timed_out.is_set():
+            return 'timeout', seconds, peak_rss_mib, process.returncode
+        if process.returncode != 0:
+            errors.seek(0)
+            sys.stderr.write(errors.read()[-2000:].decode("utf-8", "replace"))
+            return 'failed', seconds, peak_rss_mib, process.returncode
+    return 'ok', seconds, peak_rss_mib, process.returncode
+
+
+def run_benchmark(sizes, names, seed=0, timeout=DEFAULT_TIMEOUT, directory=BENCHMARK_DIR):
+    """Run every task at every size, smallest first; return one result dict per size and task."""
+    results, broken = [], set()
+    for rows in sorted(sizes):
+        path = os.path.abspath(dataset_path(rows, seed, directory))
+        workdir = os.path.join(directory, f"run_{rows}_seed{seed}")
+        os.makedirs(workdir, exist_ok=True)
+        # The first process builds the columnar cache; the tasks then load from it
+        load = [sys.executable, "-c", f"from restaurants.loader import load_dataset; load_dataset(path={path!r})"]
+        steps = [('dataset', load)] + [
+            (name, [sys.executable, "-m", "restaurants", "run", name, "--dataset", path, "--rebuild"]) for name in names
+        ]
+        for name, command in steps:
+            if name in broken:
+                results.append({'rows': rows, 'task': name, 'status': 'skipped', 'seconds': None,
+                                'peak_rss_mib': None, 'rows_per_second': None, 'returncode': None})
+                continue
+            status, seconds, peak_rss_mib, returncode = measure(command, workdir, timeout)
+            if status != 'ok':
+                broken.add(name)
+            results.append({'rows': rows, 'task': name, 'status': status, 'seconds': round(seconds, 3),
+                            'peak_rss_mib': None if peak_rss_mib is None else round(peak_rss_mib, 1),
+                            'rows_per_second': round(rows / seconds) if status == 'ok' else None,
+                            'returncode': returncode})
+            log(f"{rows:>10} rows  {name:<26} {status:<8} {seconds:9.2f} s  peak {peak_rss_mib or 0:8.1f} MiB")
+    return results
+
+
+def environment_info(seed):
+    """Describe where the results were measured, so runs on different machines are not compared blindly."""
+    return {
+        'created': time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        'seed': seed,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def write_results(results, info, output):
+    """Write `output`.json (with the environment) and `output`.csv; return both paths."""
+    with open(output + ".json", "w") as handle:
+        json.dump({'environment': info, 'results': results}, handle, indent=2)
+    with open(output + ".csv", "w", newline="") as handle:
+        writer = csv.DictWriter(handle, fieldnames=RESULT_FIELDS)
+        writer.writeheader()
+        writer.writerows(results)
+    return output + ".json", output + ".csv"
+
+
+def summarize(results):
+    """Return {task: largest row count it completed}, in the order the tasks were run."""
+    largest = {}
+    for result in results:
+        largest.setdefault(result['task'], None)
+        if result['status'] == 'ok':
+            largest[result['task']] = max(result['rows'], largest[result['task']] or 0)
+    return largest
+
+
+def compare(results, baseline, threshold=SLOWDOWN_THRESHOLD):
+    """Return (rows, task, before, after) for tasks at least `threshold` times slower than in `baseline`."""
+    before = {(result['rows'], result['task']): result['seconds'] for result in baseline
+              if result['status'] == 'ok'}
+    slower = []
+    for result in results:
+        previous = before.get((result['rows'], result['task']))
+        if previous and result['status'] == 'ok' and result['seconds'] >= threshold * previous:
+            slower.append((result['rows'], result['task'], previous, result['seconds']))
+        elif previous and result['status'] != 'ok':
+            slower.append((result['rows'], result['task'], previous, None))
+    return slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure how the analysis tasks scale on synthetic datasets.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="row counts to benchmark")
+    parser.add_argument("--tasks", nargs="+", default=['all'], help="task names, levels or 'all', as for 'python -m restaurants run'")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic datasets")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="seconds before a task is stopped")
+    parser.add_argument("--directory", default=BENCHMARK_DIR, help="where datasets and task outputs are kept")
+    parser.add_argument("--output", default="benchmark_results", help="results are written to OUTPUT.json and OUTPUT.csv")
+    parser.add_argument("--compare", help="earlier results JSON to check for slowdowns")
+    parser.add_argument("--verbosity", choices=sorted(VERBOSITY_LEVELS, key=VERBOSITY_LEVELS.get), default='normal',
+                        help="'quiet' prints only the results, not the progress of each dataset and task")
+    args = parser.parse_args(argv)
+    set_verbosity(args.verbosity)
+
+    try:
+        names = select(args.tasks)
+    except KeyError as e:
+        parser.error(e.args[0])
+
+    results = run_benchmark(args.sizes, names, args.seed, args.timeout, args.directory)
+    for path in write_results(results, environment_info(args.seed), args.output):
+        print(f"Results written to {path}")
+
+    print("\nLargest dataset completed:")
+    for name, rows in summarize(results).items():
+        print(f"{name:<26} {rows if rows is not None else 'none'}")
+
+    if args.compare:
+        with open(args.compare) as handle:
+            baseline = json.load(handle)['results']
+        slower = compare(results, baseline)
+        print(f"\n{len(slower)} slower than {args.compare}:")
+        for rows, name, before, after in slower:
+            change = f"{before:.2f} s -> {after:.2f} s" if after is not None else f"{before:.2f} s -> did not finish"
+            print(f"{rows:>10} rows  {name:<26} {change}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+# Bitmap indexes over low-cardinality columns (Level 1 Task 4, Level 3 Task 3).
+
+# Several tasks ask for the same kind of table: restaurants per price range
+# with and without online delivery, with and without table booking, the
+# delivery split on its own, and so on. Each used to be one more groupby over
+# the frame. A BitmapIndex keeps one packed bit vector per distinct value of
+# Price range, City, Country Code, the two service flags and the rating range:
+# bit i of a value's vector is set when row i has that value. The rows that
+# match several values are then the bitwise AND of their vectors and their
+# number is its popcount, so any cross-tab or filtered count reads n / 64 words
+# per cell instead of the rows of every key column.
+#
+# Cross-tabs are built key by key: a combination that matches no rows is not
+# ANDed with the next key's vectors. Missing values have no bit set in any
+# vector, so they are left out as groupby leaves them out. Vectors are uint64
+# words, 122 KiB per value for a million rows.
+#
+# Usage:
+#   python -m restaurants.bitmaps "Price range" "Has Online delivery"
+#   python -m restaurants.bitmaps "Has Table booking" --where "City=New Delhi" --where "Price range=4"
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from restaurants.aggregation import Grouper
+from restaurants.loader import DATASET_PATH, load_dataset
+
+# Columns indexed when they are loaded; 'Aggregate rating' is indexed by range
+BITMAP_COLUMNS = ['Country Code', 'City', 'Price range', 'Has Online delivery', 'Has Table booking', 'Aggregate rating']
+
+# Name and bins of the rating ranges, those of Level 2 Task 1
+RATING_RANGE = 'Rating range'
+RATING_BINS = [0, 1, 2, 3, 4, 5]
+
+# Set bits of every byte value, for numpy versions without np.bitwise_count
+BYTE_POPCOUNTS = np.array([bin(value).count("1") for value in range(256)], dtype=np.int64)
+
+
+class UnknownValue(KeyError):
+    """A filter value that does not occur in an indexed column, such as an unknown city."""
+
+
+def popcounts(words):
+    """Set bits per row of a 2D array of uint64 words (or in total, for a 1D array)."""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(words).sum(axis=-1, dtype=np.int64)
+    return BYTE_POPCOUNTS[words.view(np.uint8)].sum(axis=-1)
+
+
+def pack(mask):
+    """Pack a boolean row mask into uint64 words; bit i % 64 of word i // 64 stands for row i."""
+    packed = np.packbits(np.asarray(mask, dtype=bool), bitorder='little')
+    words = np.zeros(-(-len(packed) // 8) * 8, dtype=np.uint8)
+    words[:len(packed)] = packed
+    return words.view('<u8')
+
+
+def unpack(words, rows):
+    """The boolean row mask of `rows` rows packed into `words` by pack()."""
+    return np.unpackbits(words.view(np.uint8), count=rows, bitorder='little').astype(bool)
+
+
+class BitmapIndex:
+    """One packed bit vector per distinct value of each indexed column of `frame`."""
+
+    def __init__(self, frame, columns=BITMAP_COLUMNS):
+        self.rows = len(frame)
+        self.words = -(-self.rows // 64)
+        self.values = {}
+        self.bitmaps = {}
+        self.everything = pack(np.ones(self.rows, dtype=bool))
+        grouped = Grouper(frame)
+        for column in columns:
+            if column == 'Aggregate rating':
+                ranges = pd.cut(frame[column], bins=RATING_BINS)
+                self.add(RATING_RANGE, ranges.cat.codes.to_numpy().astype(np.int64), ranges.cat.categories)
+            else:
+                self.add(column, *grouped.factorize(column))
+
+    def add(self, column, codes, values):
+        """Index a column given as codes (-1 for missing) into `values`."""
+        bitmaps = np.zeros((len(values), self.words), dtype=np.uint64)
+        rows = np.flatnonzero(codes >= 0)
+        # Each row sets one bit of one word of its value's vector
+        cells = codes[rows] * self.words + (rows >> 6)
+        np.bitwise_or.at(bitmaps.reshape(-1), cells, np.left_shift(np.uint64(1), (rows & 63).astype(np.uint64)))
+        self.values[column] = pd.Index(values)
+        self.bitmaps[column] = bitmaps
+
+    @property
+    def columns(self):
+        return list(self.bitmaps)
+
+    @property
+    def nbytes(self):
+        return sum(bitmaps.nbytes for bitmaps in self.bitmaps.values())
+
+    def bitmap(self, column, value):
+        """The vector of rows where `column` equals `value`."""
+        return self.bitmaps[column][self.values[column].get_loc(value)]
+
+    def select(self, filters=None, where=None):
+        """The vector of rows matching every {column: value or list of values} filter, within the `where` rows.
+
+        `where` is a boolean row mask or a vector returned by select().
+        """
+        if where is None:
+            selected = self.everything
+        elif np.asarray(where).dtype == bool:
+            selected = pack(where)
+        else:
+            selected = where
+        for column, value in (filters or {}).items():
+            if isinstance(value, (list, tuple, set)):
+                # Rows with any of the values: OR their vectors
+                bitmap = np.bitwise_or.reduce([self.bitmap(column, item) for item in value]) if value else np.zeros_like(selected)
+            else:
+                bitmap = self.bitmap(column, value)
+            selected = selected & bitmap
+        return selected
+
+    def count(self, filters=None, where=None):
+        """Number of rows matching the filters; see select()."""
+        return int(popcounts(self.select(filters, where)))
+
+    def counts(self, keys, filters=None, where=None, observed=True):
+        """Rows per combination of `keys` among the selected rows, indexed like Grouper.counts()."""
+        keys = list(keys)
+        shape = tuple(len(self.values[key]) for key in keys)
+        counts = np.zeros(shape, dtype=np.int64)
+        prefixes = {(): self.select(filters, where)}
+        for depth, key in enumerate(keys):
+            # AND every combination of the previous keys with all vectors of this key at once
+            following = {}
+            for prefix, selected in prefixes.items():
+                cells = self.bitmaps[key] & selected
+                if depth == len(keys) - 1:
+                    counts[prefix] = popcounts(cells)
+                else:
+                    for code in np.flatnonzero(cells.any(axis=1)):
+                        following[prefix + (int(code),)] = cells[code]
+            prefixes = following
+
+        positions = np.unravel_index(np.arange(counts.size), shape)
+        if len(keys) == 1:
+            index = self.values[keys[0]].rename(keys[0])
+        else:
+            index = pd.MultiIndex(levels=[self.values[key] for key in keys], codes=list(positions), names=keys, verify_integrity=False)
+        series = pd.Series(counts.reshape(-1), index=index, dtype='int64')
+        return series[series > 0] if observed else series
+
+    def observed(self, keys, filters=None, where=None):
+        """Return {key or key tuple: rows} for the combinations present, as Grouper.observed() does."""
+        counts = self.counts(keys, filters, where)
+        return dict(zip(counts.index.tolist(), counts.tolist()))
+
+    def first_seen(self, column, filters=None, where=None):
+        """Return {value: rows} of one column among the selected rows in order of first appearance, as Grouper.first_seen() does."""
+        cells = self.bitmaps[column] & self.select(filters, where)
+        counts = popcounts(cells)
+        present = np.flatnonzero(counts)
+        # The first selected row of a value is the lowest set bit of its first non-zero word
+        words = cells[present]
+        first_word = np.argmax(words != 0, axis=1)
+        lowest = words[np.arange(len(present)), first_word]
+        bits = np.log2((lowest & (~lowest + np.uint64(1))).astype(np.float64)).astype(np.int64)
+        order = present[np.argsort(first_word * 64 + bits, kind='stable')]
+        return dict(zip(self.values[column].take(order).tolist(), counts[order].tolist()))
+
+    def crosstab(self, index, columns, filters=None, where=None):
+        """Rows per value of `index` (rows) and `columns` (columns), sorted on both axes like pd.crosstab()."""
+        return self.counts([index, columns], filters, where).unstack(fill_value=0).sort_index().sort_index(axis=1)
+
+    def parse(self, column, text):
+        """Return the indexed value of `column` written as `text`, such as "4" for price range 4.
+
+        Raises UnknownValue when no value of the column is written as `text`.
+        """
+        for value in self.values[column]:
+            if str(value) == text:
+                return value
+        raise UnknownValue(f"{text!r} is not a value of {column!r}.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cross-tabulate restaurants over indexed columns by bitmap popcounts.")
+    parser.add_argument("keys", nargs='+', help=f"columns to cross-tabulate, from: {', '.join(BITMAP_COLUMNS[:-1] + [RATING_RANGE])}")
+    parser.add_argument("--where", action="append", default=[], metavar="COLUMN=VALUE", help="only count rows with this value (repeatable)")
+    parser.add_argument("--dataset", default=DATASET_PATH)
+    args = parser.parse_args(argv)
+
+    frame = load_dataset(BITMAP_COLUMNS, path=args.dataset)
+    started = time.perf_counter()
+    index = BitmapIndex(frame)
+    print(f"Indexed {index.rows} rows in {time.perf_counter() - started:.3f} s ({index.nbytes / 2**20:.1f} MiB)")
+
+    filters = {}
+    for condition in args.where:
+        column, _, text = condition.partition('=')
+        filters[column] = index.parse(column, text)
+    started = time.perf_counter()
+    counts = index.counts(args.keys, filters)
+    seconds = time.perf_counter() - started
+    print((counts.unstack(fill_value=0) if len(args.keys) == 2 else counts).to_string())
+    print(f"\nAnswered in {seconds * 1e6:.0f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# Columnar cache in front of the CSV dataset.
+
+# Parsing cognifyz_dataset.csv is the largest fixed cost of every level script.
+# The first load converts the typed DataFrame to a Parquet file; later loads
+# memory-map that file and read only the requested columns. Each cache entry
+# keeps a small JSON manifest with the source file's size, mtime and SHA-256
+# content hash, and the entry is rebuilt whenever the source no longer matches.
+
+import hashlib
+import json
+import os
+
+# Directory holding cached Parquet files and their manifests
+CACHE_DIR = ".restaurants_cache"
+
+# Bump when the on-disk layout changes so old entries are rebuilt
+CACHE_VERSION = 1
+
+
+def content_hash(path, block_size=1 << 20):
+    """Return the SHA-256 hex digest of a file, read in 1 MiB blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as source:
+        for block in iter(lambda: source.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def fingerprint(path, previous=None):
+    """Return the size, mtime and content hash identifying a source file.
+
+    Hashing a large file is not free, so the hash from a previous fingerprint
+    is reused when size and mtime are unchanged.
+    """
+    stat = os.stat(path)
+    current = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if previous and all(previous.get(key) == value for key, value in current.items()):
+        current['sha256'] = previous['sha256']
+    else:
+        current['sha256'] = content_hash(path)
+    return current
+
+
+def entry_paths(path, cache_dir=CACHE_DIR):
+    """Return the (parquet, manifest) paths of the cache entry for a source file."""
+    key = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:16]
+    stem = os.path.join(cache_dir, f"{os.path.basename(path)}.{key}")
+    return stem + ".parquet", stem + ".json"
+
+
+def read_manifest(manifest_path):
+    try:
+        with open(manifest_path) as manifest:
+            return json.load(manifest)
+    except (OSError, ValueError):
+        return None
+
+
+def write_entry(frame, parquet_path, manifest_path, manifest):
+    """Write the Parquet file and its manifest, replacing any previous entry atomically."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    os.makedirs(os.path.dirname(parquet_path) or ".", exist_ok=True)
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    pq.write_table(table, parquet_path + ".tmp")
+    os.replace(parquet_path + ".tmp", parquet_path)
+    with open(manifest_path + ".tmp", "w") as handle:
+        json.dump(manifest, handle, indent=2)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+
+def select(frame, columns):
+    """Return the requested columns in file order, skipping any that are absent."""
+    if columns is None:
+        return frame
+    wanted = set(columns)
+    return frame[[column for column in frame.columns if column in wanted]]
+
+
+def load(path, parse, columns=None, schema_token="", cache_dir=CACHE_DIR):
+    """Return the dataset at `path`, served from the cache when it is still valid.
+
+    `parse` is called with the source path to build the full typed DataFrame on a
+    cache miss. `schema_token` identifies the schema used by `parse`; changing it
+    invalidates existing entries. When pyarrow is not installed the cache is
+    bypassed and the CSV is parsed directly.
+    """
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        return select(parse(path), columns)
+
+    parquet_path, manifest_path = entry_paths(path, cache_dir)
+    manifest = read_manifest(manifest_path)
+    previous = None
+    if manifest and manifest.get('version') == CACHE_VERSION and manifest.get('schema') == schema_token:
+        previous = manifest.get('source')
+    source = fingerprint(path, previous)
+
+    if previous is None or previous.get('sha256') != source['sha256'] or not os.path.exists(parquet_path):
+        frame = parse(path)
+        manifest = {'version': CACHE_VERSION, 'schema': schema_token, 'source': source}
+        try:
+            write_entry(frame, parquet_path, manifest_path, manifest)
+        except OSError:
+            # An unwritable cache directory should never stop the analysis
+            pass
+        return select(frame, columns)
+
+    if previous != source:
+        # Same content with a new mtime (e.g. the file was touched or copied)
+        manifest['source'] = source
+        try:
+            with open(manifest_path, "w") as handle:
+                json.dump(manifest, handle, indent=2)
+        except OSError:
+            pass
+
+    if columns is not None:
+        wanted = set(columns)
+        columns = [column for column in pq.read_schema(parquet_path).names if column in wanted]
+    table = pq.read_table(parquet_path, columns=columns, memory_map=True)
+    return table.to_pandas()
@@ -0,0 +1,243 @@
+# Restaurant chain resolution (Level 2, Task 4).
+
+# Counting exact names treats "Domino's Pizza", "Dominos Pizza" and
+# "Domino's Pizza " as three different restaurants. Names are resolved to
+# chains in three layers, over the distinct names only:
+#
+# 1. normalized keys: casefolded, apostrophes dropped, other punctuation
+#    turned into spaces and whitespace collapsed, so the three names above
+#    share the key "dominos pizza"
+# 2. an exact index: the distinct keys are factorized through a hash table
+# 3. near duplicates: MinHash signatures of each key's character trigrams are
+#    cut into LSH bands. Keys that agree on a whole band become candidates,
+#    and candidates whose trigram Jaccard similarity reaches the threshold are
+#    similar, so only colliding keys are ever compared, never all pairs.
+#    Similar keys are not merged transitively: keys are taken from the most
+#    restaurants down, and each key that is not yet in a chain starts one that
+#    its similar keys not yet in a chain join. Every key of a chain is then
+#    similar to the chain's leading key, and a run of one-letter steps
+#    ("... Day", "... Bay", "... Bar") cannot chain different names together.
+#
+# Every chain gets a chain_id derived from its smallest key, so ids do not
+# depend on row order and stay the same as long as that key is in the chain.
+
+import hashlib
+import re
+import string
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+# Trigram Jaccard similarity from which two keys are the same chain; 1 merges exact keys only.
+# One changed letter inside a key of n characters leaves (n - 3) / (n + 3) of the
+# trigrams shared, so 0.8 merges names that differ in a letter or two at the end
+# ("Moti Mahal Delux" / "Moti Mahal Deluxe") but keeps apart different restaurants
+# whose names differ by one letter inside, such as "Cafe Coffee Day" / "Cafe Coffee Bay"
+DEFAULT_SIMILARITY = 0.8
+
+# LSH bands and signature rows per band: 32 MinHash values, and a pair with
+# Jaccard similarity s becomes a candidate with probability 1 - (1 - s**4)**8
+# (about 0.96 at s = 0.8 and 0.006 at s = 0.3)
+BANDS = 8
+ROWS_PER_BAND = 4
+
+# Characters of a key used for its trigrams
+MAX_KEY_LENGTH = 64
+
+# Shorter keys only match exactly: a character or two is too large a change
+MIN_FUZZY_LENGTH = 8
+
+# Keys whose MinHash signatures are computed at once, bounding temporary arrays
+SIGNATURE_BLOCK = 50_000
+
+# Candidate pairs whose signatures are compared at once, for the same reason
+PAIR_BLOCK = 500_000
+
+# Seed of the MinHash functions, fixed so chains are the same on every run
+MINHASH_SEED = 20240601
+
+# Columns of the resolved names
+CHAIN_FIELDS = ['Restaurant Name', 'key', 'chain_id', 'chain']
+
+# Apostrophes are dropped ("Domino's" -> "dominos"); other punctuation separates words
+APOSTROPHES = "'’`"
+PUNCTUATION = re.compile(r"[^\w\s]|_")
+
+# The same for ASCII names in one translate() call, without the regular expression
+ASCII_PUNCTUATION = str.maketrans({character: None if character in APOSTROPHES else " "
+                                   for character in string.punctuation})
+
+
+def normalize_name(name):
+    """Return the chain key of a name: casefolded, punctuation stripped, whitespace collapsed."""
+    name = str(name)
+    if name.isascii():
+        key = " ".join(name.lower().translate(ASCII_PUNCTUATION).split())
+    else:
+        name = unicodedata.normalize('NFKC', name)
+        key = " ".join(PUNCTUATION.sub(" ", name.casefold().translate({ord(c): None for c in APOSTROPHES})).split())
+    # A name made of punctuation only keeps its own key rather than sharing the empty one
+    return key or name.strip().casefold()
+
+
+def normalize_names(names):
+    return [normalize_name(name) for name in names]
+
+
+def trigrams(keys):
+    """Return (codes, offsets, digits) of the keys.
+
+    `codes` are the character trigrams of all space-padded keys as int64, key
+    by key from `offsets`; `digits` hashes the sequence of digits in each key
+    (0 when it has none).
+    """
+    width = MAX_KEY_LENGTH + 2
+    padded = np.array([f" {key[:MAX_KEY_LENGTH]} " for key in keys], dtype=f"U{width}")
+    characters = padded.view(np.uint32).reshape(len(padded), width).astype(np.int64)
+    # Code points fit in 21 bits, so three of them pack into one integer
+    codes = (characters[:, :-2] << 42) | (characters[:, 1:-1] << 21) | characters[:, 2:]
+    counts = np.char.str_len(padded) - 2
+    valid = np.arange(width - 2) < counts[:, None]
+
+    # Each digit is hashed with its position among the key's digits, so "14" and "41" differ
+    is_digit = (characters >= ord('0')) & (characters <= ord('9'))
+    positions = np.cumsum(is_digit, axis=1).astype(np.uint64)
+    terms = mix((positions << np.uint64(8)) | characters.astype(np.uint64))
+    digits = np.bitwise_xor.reduce(np.where(is_digit, terms, np.uint64(0)), axis=1)
+    return codes[valid], np.r_[0, np.cumsum(counts)[:-1]], digits
+
+
+def mix(values):
+    """A fixed 64-bit finalizer (splitmix64), so nearby codes get unrelated hashes."""
+    values = values ^ (values >> np.uint64(30))
+    values = values * np.uint64(0xBF58476D1CE4E5B9)
+    values = values ^ (values >> np.uint64(27))
+    values = values * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+def minhash_signatures(keys, count=BANDS * ROWS_PER_BAND, seed=MINHASH_SEED):
+    """Return the (len(keys), count) MinHash signatures of the keys' trigram sets, and the keys' digit hashes."""
+    rng = np.random.default_rng(seed)
+    salts = rng.integers(0, 2 ** 63, size=count, dtype=np.uint64)
+    # Odd multipliers make each (hash ^ salt) * multiplier a permutation of the 64-bit hashes
+    multipliers = rng.integers(0, 2 ** 63, size=count, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+    signatures = np.empty((len(keys), count), dtype=np.uint64)
+    digits = np.empty(len(keys), dtype=np.uint64)
+    for start in range(0, len(keys), SIGNATURE_BLOCK):
+        codes, offsets, digits[start:start + len(offsets)] = trigrams(keys[start:start + SIGNATURE_BLOCK])
+        hashed = mix(codes.astype(np.uint64))
+        for column in range(count):
+            permuted = (hashed ^ salts[column]) * multipliers[column]
+            signatures[start:start + len(offsets), column] = np.minimum.reduceat(permuted, offsets)
+    return signatures, digits
+
+
+def candidate_pairs(signatures, digits):
+    """Return (left, right) indexes of keys with the same digits that agree on every row of at least one band."""
+    pairs = []
+    for band in range(BANDS):
+        rows = signatures[:, band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        # Numbers tell branches and codes apart ("Sector 14" and "Sector 41"), so they are part of every bucket
+        bucket = mix(digits ^ rows[:, 0])
+        for column in range(1, ROWS_PER_BAND):
+            bucket = mix(bucket ^ rows[:, column])
+        order = np.argsort(bucket, kind='stable')
+        ordered = bucket[order]
+        starts = np.r_[True, ordered[1:] != ordered[:-1]]
+        # Pair each key with the first key of its bucket: linear in the bucket size
+        first = order[np.maximum.accumulate(np.where(starts, np.arange(len(order)), 0))]
+        shared = ~starts
+        pairs.append(np.stack([first[shared], order[shared]], axis=1))
+    pairs = np.sort(np.concatenate(pairs), axis=1)
+    # Each pair as one integer, so duplicates from several bands are dropped with a flat sort
+    unique = np.unique(pairs[:, 0] * len(signatures) + pairs[:, 1])
+    return unique // len(signatures), unique % len(signatures)
+
+
+def jaccard(left, right):
+    """Trigram Jaccard similarity of two keys."""
+    left = {f" {left} "[i:i + 3] for i in range(len(left))}
+    right = {f" {right} "[i:i + 3] for i in range(len(right))}
+    return len(left & right) / len(left | right)
+
+
+def lead_chains(left, right, totals):
+    """Return (chain count, chain of every key) from the similar key pairs (left, right).
+
+    Keys are visited from the most restaurants in `totals` down, ties in key
+    order. A key not yet in a chain leads a new one, and its similar keys not
+    yet in a chain join it, so every key is similar to its chain's leader.
+    """
+    leaders = np.arange(len(totals))
+    if len(left):
+        rank = np.empty(len(totals), dtype=np.int64)
+        rank[np.argsort(-totals, kind='stable')] = np.arange(len(totals))
+        # Both directions of every pair, in the visiting order of their first key
+        sources, targets = np.concatenate([left, right]), np.concatenate([right, left])
+        order = np.argsort(rank[sources], kind='stable')
+        assigned = np.zeros(len(totals), dtype=bool)
+        previous, leading = -1, False
+        for source, target in zip(sources[order].tolist(), targets[order].tolist()):
+            if source != previous:
+                previous, leading = source, not assigned[source]
+                assigned[source] = True
+            if leading and not assigned[target]:
+                leaders[target] = source
+                assigned[target] = True
+    chains, components = np.unique(leaders, return_inverse=True)
+    return len(chains), components
+
+
+def resolve_chains(counts, similarity=DEFAULT_SIMILARITY):
+    """Resolve {restaurant name: restaurants} to chains.
+
+    Returns a DataFrame indexed by restaurant name with the normalized 'key',
+    a stable 'chain_id' and the 'chain' display name: the chain's name with
+    the most restaurants (ties broken by order in `counts`).
+    """
+    names = pd.Series(list(counts), dtype=object)
+    restaurants = np.fromiter(counts.values(), dtype=np.int64, count=len(names))
+
+    # Layers 1 and 2: normalized names, and one entry per distinct key
+    key_codes, keys = pd.factorize(np.array(normalize_names(names), dtype=object))
+    keys = np.asarray(keys, dtype=object)
+
+    # Layer 3: merge near-duplicate keys found through LSH candidates
+    left = right = np.empty(0, dtype=np.int64)
+    fuzzy = np.flatnonzero(np.fromiter((len(key) >= MIN_FUZZY_LENGTH for key in keys), dtype=bool, count=len(keys)))
+    if similarity < 1 and len(fuzzy) > 1:
+        signatures, digits = minhash_signatures(keys[fuzzy])
+        left, right = candidate_pairs(signatures, digits)
+        # Agreeing MinHash values estimate the similarity (within about 0.14 at two standard
+        # errors); only pairs that may reach the threshold are compared exactly
+        plausible = np.empty(len(left), dtype=bool)
+        for start in range(0, len(left), PAIR_BLOCK):
+            block = slice(start, start + PAIR_BLOCK)
+            plausible[block] = (signatures[left[block]] == signatures[right[block]]).mean(axis=1) >= similarity - 0.15
+        left, right = fuzzy[left[plausible]], fuzzy[right[plausible]]
+        similar = np.fromiter((jaccard(keys[a], keys[b]) >= similarity for a, b in zip(left, right)), dtype=bool, count=len(left))
+        left, right = left[similar], right[similar]
+    chain_count, components = lead_chains(left, right, np.bincount(key_codes, weights=restaurants, minlength=len(keys)))
+
+    # The smallest key of each chain names its id; most chains have a single key
+    smallest = np.empty(chain_count, dtype=object)
+    smallest[components] = keys
+    merged = np.flatnonzero(np.bincount(components, minlength=chain_count) > 1)
+    if len(merged):
+        members = np.flatnonzero(np.isin(components, merged))
+        first = pd.DataFrame({'chain': components[members], 'key': keys[members]}).sort_values(['chain', 'key']).drop_duplicates('chain')
+        smallest[first['chain'].to_numpy()] = first['key'].to_numpy()
+    chain_ids = np.array([hashlib.blake2b(key.encode('utf-8'), digest_size=8).hexdigest() for key in smallest], dtype=object)
+
+    name_components = components[key_codes]
+    resolved = pd.DataFrame({'Restaurant Name': names, 'key': keys[key_codes], 'chain_id': chain_ids[name_components], 'chain': names})
+
+    # The display name is the chain's most common name, the first seen on ties; a chain of one name keeps it
+    shared = np.flatnonzero(np.bincount(name_components, minlength=chain_count)[name_components] > 1)
+    if len(shared):
+        candidates = pd.DataFrame({'component': name_components[shared], 'restaurants': restaurants[shared], 'name': names.to_numpy()[shared]})
+        display = candidates.sort_values('restaurants', ascending=False, kind='stable').drop_duplicates('component')
+        resolved.loc[shared, 'chain'] = candidates['component'].map(display.set_index('component')['name']).to_numpy()
+    return resolved.set_index('Restaurant Name')[CHAIN_FIELDS[1:]]
@@ -0,0 +1,168 @@
+# Headless batch chart rendering.
+
+# Tasks describe their charts instead of drawing them: submit_chart() records the
+# output file, the figure size, a module-level draw function and the data it
+# plots. After the tasks have run, the task runner renders every collected
+# chart with the non-interactive Agg backend, in a pool of worker processes when
+# --jobs allows. Each chart gets a fresh figure that is closed as soon as it is
+# saved, so a full run never opens a window and figures do not accumulate.
+#
+# render() measures the time and the peak traced memory of every chart, and
+# write_report() lists them in Chart_Rendering_Report.txt.
+#
+# render_changed() skips charts whose key (a hash of the plotted data, the
+# figure size and the draw function's source, see restaurants/artifacts.py)
+# matches the existing file, so an unchanged rerun renders nothing.
+
+import hashlib
+import inspect
+import pickle
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from restaurants import artifacts
+
+# Non-interactive backend used for every chart
+HEADLESS_BACKEND = 'Agg'
+
+# Where the per-chart rendering report is written
+REPORT_PATH = "Chart_Rendering_Report.txt"
+
+# Charts submitted by the tasks of this process and not collected yet
+PENDING = []
+
+
+class Chart:
+    """What to draw: `draw(**data)` plots onto the current figure, which is saved to `filename`."""
+
+    def __init__(self, filename, draw, figsize, data):
+        self.filename = filename
+        self.draw = draw
+        self.figsize = figsize
+        self.data = data
+
+
+def submit_chart(filename, draw, figsize=(10, 6), **data):
+    """Queue a chart for rendering once the tasks have run."""
+    PENDING.append(Chart(filename, draw, figsize, data))
+
+
+def collect():
+    """Return and clear the charts submitted so far."""
+    charts = PENDING[:]
+    PENDING.clear()
+    return charts
+
+
+def update_digest(digest, value):
+    """Feed a chart input into `digest`; pandas and NumPy data are hashed by content."""
+    if isinstance(value, pd.Index):
+        digest.update(repr(('Index', list(value.names), str(value.dtype))).encode())
+        digest.update(pd.util.hash_pandas_object(value).to_numpy().tobytes())
+    elif isinstance(value, (pd.Series, pd.DataFrame)):
+        frame = value.to_frame() if isinstance(value, pd.Series) else value
+        digest.update(repr((type(value).__name__, list(frame.columns), [str(dtype) for dtype in frame.dtypes])).encode())
+        digest.update(pd.util.hash_pandas_object(value, index=False).to_numpy().tobytes())
+        update_digest(digest, value.index)
+    elif isinstance(value, np.ndarray):
+        digest.update(repr((value.dtype.str, value.shape)).encode())
+        digest.update(np.ascontiguousarray(value).tobytes())
+    else:
+        digest.update(pickle.dumps(value, protocol=4))
+
+
+def chart_key(chart):
+    """Return the SHA-256 of everything that determines a chart's image."""
+    digest = hashlib.sha256()
+    try:
+        source = inspect.getsource(chart.draw)
+    except (OSError, TypeError):
+        source = chart.draw.__qualname__
+    digest.update(repr((chart.filename, chart.figsize, chart.draw.__qualname__, source)).encode())
+    for name in sorted(chart.data):
+        digest.update(name.encode())
+        update_digest(digest, chart.data[name])
+    return digest.hexdigest()
+
+
+def use_headless_backend():
+    """Switch matplotlib to the non-interactive backend, whether or not pyplot is imported yet."""
+    import matplotlib
+    matplotlib.use(HEADLESS_BACKEND, force=True)
+
+
+def start_renderer():
+    """Select the backend and import the plotting libraries before any chart is timed."""
+    use_headless_backend()
+    import matplotlib.pyplot  # noqa: F401
+    try:
+        import seaborn  # noqa: F401
+    except ImportError:
+        pass
+
+
+def render(chart):
+    """Draw and save one chart on its own figure; return its filename, seconds, peak memory and error."""
+    import matplotlib.pyplot as plt
+
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    started = time.perf_counter()
+    error = None
+    figure = plt.figure(figsize=chart.figsize)
+    try:
+        chart.draw(**chart.data)
+        figure.savefig(chart.filename)
+    except Exception as e:
+        error = str(e)
+    finally:
+        plt.close(figure)
+    seconds = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    if not tracing:
+        tracemalloc.stop()
+    return {'chart': chart.filename, 'seconds': seconds, 'peak_bytes': peak, 'error': error}
+
+
+def render_all(charts, jobs=1):
+    """Render charts in order, or in up to `jobs` worker processes (0: one per CPU)."""
+    if jobs == 1 or len(charts) <= 1:
+        start_renderer()
+        return [render(chart) for chart in charts]
+    with ProcessPoolExecutor(max_workers=min(jobs, len(charts)) if jobs else None, initializer=start_renderer) as pool:
+        return list(pool.map(render, charts))
+
+
+def render_changed(charts, jobs=1, rebuild=False, cache_dir=artifacts.CACHE_DIR):
+    """Render only the charts whose key or file changed; record hits and misses in artifacts."""
+    entries = artifacts.read_entries(cache_dir)
+    keys = [chart_key(chart) for chart in charts]
+    cached = [not rebuild and artifacts.unchanged(chart.filename, key, entries.get(chart.filename))
+              for chart, key in zip(charts, keys)]
+    rendered = iter(render_all([chart for chart, hit in zip(charts, cached) if not hit], jobs))
+    reports = []
+    for chart, key, hit in zip(charts, keys, cached):
+        if hit:
+            report = {'chart': chart.filename, 'seconds': 0.0, 'peak_bytes': 0, 'error': None, 'cached': True}
+        else:
+            report = {**next(rendered), 'cached': False}
+        if report['error'] is None:
+            artifacts.record(chart.filename, key, hit, entries.get(chart.filename))
+        reports.append(report)
+    return reports
+
+
+def write_report(reports, path=REPORT_PATH):
+    """Write one line per chart with its render time and peak memory."""
+    with open(path, "w") as file:
+        file.write("Chart Rendering:\n")
+        for report in reports:
+            status = f"error: {report['error']}" if report['error'] else "unchanged, not rendered" if report.get('cached') else "ok"
+            file.write(f"{report['chart']}: {report['seconds']:.2f} s, peak {report['peak_bytes'] / 2**20:.1f} MiB, {status}\n")
+        file.write(f"Total: {len(reports)} charts, {sum(report['seconds'] for report in reports):.2f} s\n")
@@ -0,0 +1,246 @@
+# Partitioned geographic clustering for the geographic analysis (Level 2, Task 3).
+
+# Running DBSCAN on raw degree coordinates for the whole world at once builds a
+# single neighbour index over every restaurant and mixes countries that can
+# never share a cluster. Here restaurants are split by country (or city), each
+# partition is clustered with DBSCAN on haversine distances using a BallTree,
+# partitions run in parallel worker processes, and the per-partition labels are
+# offset into one global cluster ID space. Noise keeps the label -1.
+#
+# Countries are far from balanced: nearly all restaurants can sit in one of
+# them, and DBSCAN's neighbour lists grow with the density of a partition. A
+# partition with more than `max_rows` restaurants is therefore cut into grid
+# cells by repeated median splits of its bounding box. Each cell is clustered
+# together with a halo of the restaurants within eps of its box, which makes
+# the core points of its own restaurants exact, and the cells' clusters are
+# stitched back together:
+#
+# - a restaurant that is a core point in its own cell joins its cluster there
+#   with every cluster that reached it as a halo point of another cell
+# - a border restaurant left as noise in its own cell takes the cluster of a
+#   neighbouring cell that reached it
+#
+# so the clusters are those of DBSCAN on the whole partition, up to the choice
+# of cluster for border points that DBSCAN itself makes by visiting order.
+# Cells do not wrap around the antimeridian.
+#
+# A partition whose worker fails (or dies, which breaks the pool for the jobs
+# still queued) is retried alone; if it fails again its restaurants are left
+# unlabelled and a warning is printed, and the other partitions are kept.
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pandas as pd
+
+from restaurants.metrics import warn
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Kilometres per degree of latitude
+KM_PER_DEGREE = np.pi * EARTH_RADIUS_KM / 180
+
+# Neighbourhood radius; 0.01 degrees of latitude, as used before, is about 1.1 km
+DEFAULT_EPS_KM = 1.0
+DEFAULT_MIN_SAMPLES = 10
+
+# Partitions with more restaurants are clustered in grid cells
+DEFAULT_MAX_ROWS = 20_000
+
+# Columns a partition can be keyed on
+PARTITION_COLUMNS = {'country': 'Country Code', 'city': 'City'}
+
+# Columns of the per-partition report
+REPORT_COLUMNS = ['partition', 'rows', 'cells', 'clusters', 'noise']
+
+
+def cluster_partition(latitudes, longitudes, eps_km, min_samples):
+    """Run haversine DBSCAN on one partition or cell and return (labels, core mask, seconds)."""
+    from sklearn.cluster import DBSCAN
+
+    start = time.perf_counter()
+    labels = np.full(len(latitudes), -1, dtype=np.int64)
+    core = np.zeros(len(latitudes), dtype=bool)
+    # Too few restaurants form no cluster
+    if len(latitudes) >= min_samples:
+        coordinates = np.radians(np.column_stack([latitudes, longitudes]))
+        model = DBSCAN(eps=eps_km / EARTH_RADIUS_KM, min_samples=min_samples,
+                       metric='haversine', algorithm='ball_tree').fit(coordinates)
+        labels = model.labels_.astype(np.int64)
+        core[model.core_sample_indices_] = True
+    return labels, core, time.perf_counter() - start
+
+
+def grid_cells(latitudes, longitudes, max_rows):
+    """Split positions into cells of at most `max_rows` by median cuts along the longer side of each box."""
+    cells, pending = [], [np.arange(len(latitudes))]
+    while pending:
+        rows = pending.pop()
+        lat, lon = latitudes[rows], longitudes[rows]
+        lat_km = (lat.max() - lat.min()) * KM_PER_DEGREE
+        lon_km = (lon.max() - lon.min()) * KM_PER_DEGREE * np.cos(np.radians(np.abs(lat).max()))
+        if len(rows) <= max_rows or (lat_km == 0 and lon_km == 0):
+            cells.append(rows)
+            continue
+        order = np.argsort(lat if lat_km >= lon_km else lon, kind='stable')
+        half = len(rows) // 2
+        pending.extend([rows[order[half:]], rows[order[:half]]])
+    return cells
+
+
+def halo(latitudes, longitudes, cell, eps_km):
+    """Positions outside `cell` within eps_km of its bounding box (a slightly larger box, never a smaller one)."""
+    lat, lon = latitudes[cell], longitudes[cell]
+    margin = eps_km / KM_PER_DEGREE
+    south, north = lat.min() - margin, lat.max() + margin
+    cosine = np.cos(np.radians(min(max(abs(south), abs(north)), 90.0)))
+    lon_margin = margin / cosine if cosine > 1e-3 else 360.0
+    inside = ((latitudes >= south) & (latitudes <= north)
+              & (longitudes >= lon.min() - lon_margin) & (longitudes <= lon.max() + lon_margin))
+    inside[cell] = False
+    return np.flatnonzero(inside)
+
+
+def stitch(rows, jobs, results):
+    """Combine the cell results of one partition into (labels, clusters).
+
+    `jobs` are (own positions, halo positions) per cell and `results` their
+    (labels, core mask, seconds), with the cell's own rows first.
+    """
+    # Cell clusters get ids in one space; each owned restaurant keeps its cell's label and core flag
+    labels = np.full(rows, -1, dtype=np.int64)
+    core = np.zeros(rows, dtype=bool)
+    offset = 0
+    offsets = []
+    for (own, _), (cell_labels, cell_core, _) in zip(jobs, results):
+        offsets.append(offset)
+        mine = cell_labels[:len(own)]
+        labels[own] = np.where(mine >= 0, mine + offset, -1)
+        core[own] = cell_core[:len(own)]
+        offset += int(cell_labels.max()) + 1 if len(cell_labels) and cell_labels.max() >= 0 else 0
+
+    # Union the clusters that reached a true core point, and give reached noise points a cluster
+    parent = np.arange(offset)
+
+    def find(cluster):
+        while parent[cluster] != cluster:
+            parent[cluster] = parent[parent[cluster]]
+            cluster = parent[cluster]
+        return cluster
+
+    for (own, outside), (cell_labels, _, _), start in zip(jobs, results, offsets):
+        reached = cell_labels[len(own):]
+        hit = reached >= 0
+        for position, cluster in zip(outside[hit], reached[hit] + start):
+            if core[position]:
+                a, b = find(cluster), find(labels[position])
+                parent[max(a, b)] = min(a, b)
+            elif labels[position] < 0:
+                labels[position] = cluster
+
+    if not offset:
+        return labels, 0
+    clustered = labels >= 0
+    roots = np.array([find(cluster) for cluster in range(offset)], dtype=np.int64)
+    _, compact = np.unique(roots, return_inverse=True)
+    labels[clustered] = compact[labels[clustered]]
+
+    # Number the clusters as DBSCAN does on the whole partition: in order of their first core restaurant
+    clusters = int(compact.max()) + 1
+    first = np.full(clusters, rows, dtype=np.int64)
+    np.minimum.at(first, labels[core], np.flatnonzero(core))
+    rank = np.empty(clusters, dtype=np.int64)
+    rank[np.argsort(first, kind='stable')] = np.arange(clusters)
+    labels[clustered] = rank[labels[clustered]]
+    return labels, clusters
+
+
+def run_jobs(jobs, eps_km, min_samples, workers):
+    """Cluster (latitudes, longitudes) jobs; return one result or exception per job."""
+    def alone(latitudes, longitudes):
+        try:
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                return executor.submit(cluster_partition, latitudes, longitudes, eps_km, min_samples).result()
+        except Exception as error:
+            return error
+
+    if workers == 1 or len(jobs) <= 1:
+        results = []
+        for latitudes, longitudes in jobs:
+            try:
+                results.append(cluster_partition(latitudes, longitudes, eps_km, min_samples))
+            except Exception as error:
+                results.append(error)
+        return results
+
+    results = []
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as executor:
+        futures = [executor.submit(cluster_partition, latitudes, longitudes, eps_km, min_samples) for latitudes, longitudes in jobs]
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as error:
+                results.append(error)
+    # A dead worker breaks the pool for every job still queued: rerun those one by one
+    return [alone(*job) if isinstance(result, BrokenProcessPool) else result for job, result in zip(jobs, results)]
+
+
+def cluster_locations(frame, partition='country', eps_km=DEFAULT_EPS_KM,
+                      min_samples=DEFAULT_MIN_SAMPLES, workers=None, max_rows=DEFAULT_MAX_ROWS):
+    """Cluster restaurants by location, one partition (or grid cell of a large one) at a time.
+
+    `frame` needs 'Latitude' and 'Longitude' plus the partition column
+    ('Country Code' or 'City'); rows with missing values are left unlabelled.
+    Returns (labels, report, seconds): labels is a Series of global cluster IDs
+    aligned with `frame.index` (-1 for noise), int64 unless coordinates are
+    missing or a partition failed, which leaves those rows <NA> in an Int64
+    Series; report is a DataFrame with rows, cells,
+    clusters and noise per partition, and seconds the clustering time of each
+    partition.
+    """
+    column = PARTITION_COLUMNS[partition]
+    located = frame[[column, 'Latitude', 'Longitude']].dropna()
+    groups = located.groupby(column, observed=True, sort=True).indices
+    workers = workers or os.cpu_count() or 1
+    latitudes, longitudes = located['Latitude'].to_numpy(np.float64), located['Longitude'].to_numpy(np.float64)
+
+    # Every partition becomes one job, or one job per cell with its halo rows after its own
+    partitions, jobs = [], []
+    for key, rows in groups.items():
+        lat, lon = latitudes[rows], longitudes[rows]
+        if len(rows) > max_rows:
+            cells = [(cell, halo(lat, lon, cell, eps_km)) for cell in grid_cells(lat, lon, max_rows)]
+        else:
+            cells = [(np.arange(len(rows)), np.empty(0, dtype=np.int64))]
+        partitions.append((key, rows, cells, len(jobs)))
+        jobs.extend((lat[np.r_[own, outside]], lon[np.r_[own, outside]]) for own, outside in cells)
+    results = run_jobs(jobs, eps_km, min_samples, workers)
+
+    global_labels = pd.array(np.full(len(located), -1, dtype=np.int64), dtype='Int64')
+    report, seconds = [], {}
+    offset = 0
+    for key, rows, cells, first in partitions:
+        outcome = results[first:first + len(cells)]
+        failed = [result for result in outcome if isinstance(result, Exception)]
+        if failed:
+            warn(f"Warning: clustering {column} {key} failed ({failed[0]!r}); its restaurants are left unlabelled.")
+            global_labels[rows] = pd.NA
+            report.append({'partition': key, 'rows': len(rows), 'cells': len(cells), 'clusters': pd.NA, 'noise': pd.NA})
+            continue
+        labels, clusters = stitch(len(rows), cells, outcome)
+        clustered = labels >= 0
+        global_labels[rows[clustered]] = labels[clustered] + offset
+        offset += clusters
+        seconds[key] = round(sum(result[2] for result in outcome), 6)
+        report.append({'partition': key, 'rows': len(rows), 'cells': len(cells), 'clusters': clusters,
+                       'noise': int((~clustered).sum())})
+
+    labels = pd.Series(pd.NA, index=frame.index, dtype='Int64')
+    labels.loc[located.index] = global_labels
+    # Plain integers, as DBSCAN returns them, unless some restaurants are unlabelled
+    if not labels.hasnans:
+        labels = labels.astype('int64')
+    return labels, pd.DataFrame(report, columns=REPORT_COLUMNS), seconds
@@ -0,0 +1,130 @@
+# Cuisine co-occurrence and combination mining (Level 2, Task 2).
+
+# Exact 'Cuisines' strings only tell which full combinations are common. This
+# module scores every individual cuisine, every pair and every triple that
+# appears on a restaurant, using the restaurants x cuisines matrix from
+# restaurants/cuisines.py:
+#
+# - count / support: restaurants serving all cuisines of the itemset
+# - lift: support divided by the support expected if the cuisines were independent
+# - mean rating and votes-weighted rating of those restaurants
+#
+# Pair statistics come from one sparse product X.T @ X. Triples are only
+# generated from frequent pairs (Apriori pruning): an indicator matrix with one
+# column per frequent pair is multiplied with X, so no Python loop runs over
+# restaurants or itemsets.
+
+import math
+
+import numpy as np
+import pandas as pd
+
+# Itemsets served by fewer restaurants than this share are pruned
+DEFAULT_MIN_SUPPORT = 0.001
+
+# Metrics that can rank itemsets in top_k()
+METRICS = ('count', 'support', 'lift', 'mean rating', 'weighted rating')
+
+# Per-restaurant weights summed over each itemset: rating, rated (1 where a rating is present),
+# rating x votes and votes (both where the rating and the votes are present)
+WEIGHTS = ('rating', 'rated', 'weighted', 'votes')
+
+
+def itemset_table(cuisines, items, counts, sums, singles, total):
+    """Assemble one DataFrame of itemsets from aligned arrays of member IDs and {name: sums} of the WEIGHTS."""
+    items = np.asarray(items).reshape(len(counts), -1)
+    support = counts / total
+    expected = np.prod(singles[items] / total, axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return pd.DataFrame({
+            'itemset': [" + ".join(cuisines[row]) for row in items],
+            'size': items.shape[1],
+            'count': counts.astype(np.int64),
+            'support': support,
+            'lift': support / expected,
+            'mean rating': sums['rating'] / sums['rated'],
+            'weighted rating': sums['weighted'] / sums['votes'],
+        })
+
+
+def mine_combinations(cuisine_matrix, ratings, votes=None, max_size=3, min_support=DEFAULT_MIN_SUPPORT):
+    """Return statistics for every frequent cuisine itemset of 1 to `max_size` (at most 3) cuisines.
+
+    `ratings` and `votes` are aligned with the rows of `cuisine_matrix`; without
+    votes the weighted rating equals the mean rating. Itemsets served by fewer
+    than `min_support` of the restaurants are pruned, and so are larger
+    itemsets built from them.
+    """
+    from scipy import sparse
+
+    matrix = cuisine_matrix.matrix.astype(np.float64).tocsc()
+    total = matrix.shape[0]
+    min_count = max(1, math.ceil(min_support * total))
+    ratings = np.asarray(ratings, dtype=np.float64)
+    votes = np.ones(total) if votes is None else np.asarray(votes, dtype=np.float64)
+    names = cuisine_matrix.cuisines
+
+    # Row-scaled copies of the matrix give every sum in one product. Missing ratings are left out
+    # of the mean rating, and rows missing a rating or votes out of the weighted rating, numerator
+    # and denominator alike, as groupby().mean() leaves them out
+    rated = ~np.isnan(ratings)
+    weighted = rated & ~np.isnan(votes)
+    scaled = {key: sparse.diags(weights) @ matrix for key, weights in zip(WEIGHTS, (
+        np.where(rated, ratings, 0.0), rated.astype(np.float64),
+        np.where(weighted, ratings * votes, 0.0), np.where(weighted, votes, 0.0)))}
+
+    singles = np.asarray(matrix.sum(axis=0)).ravel()
+    frequent = np.flatnonzero(singles >= min_count)
+    tables = [itemset_table(names, frequent, singles[frequent],
+                            {key: np.asarray(scaled[key].sum(axis=0)).ravel()[frequent] for key in WEIGHTS},
+                            singles, total)]
+
+    if max_size >= 2 and len(frequent):
+        selected = matrix[:, frequent]
+        pair_counts = sparse.triu((selected.T @ selected).tocsr(), k=1).tocoo()
+        keep = pair_counts.data >= min_count
+        first, second = frequent[pair_counts.row[keep]], frequent[pair_counts.col[keep]]
+        pair_counts = pair_counts.data[keep]
+
+        def pair_sums(weighted):
+            # Elementwise product of the two member columns, summed over restaurants
+            return np.asarray(matrix[:, first].multiply(weighted[:, second]).sum(axis=0)).ravel()
+
+        tables.append(itemset_table(names, np.column_stack([first, second]), pair_counts,
+                                    {key: pair_sums(scaled[key]) for key in WEIGHTS}, singles, total))
+
+        if max_size >= 3 and len(first):
+            # One indicator column per frequent pair, multiplied with X for triple counts
+            pairs = matrix[:, first].multiply(matrix[:, second]).tocsc()
+            triple_counts = (pairs.T @ matrix).tocoo()
+            width = matrix.shape[1]
+            frequent_pairs = first * width + second
+            rows, third = triple_counts.row, triple_counts.col
+            keep = (third > second[rows]) & (triple_counts.data >= min_count)
+            keep &= np.isin(third, frequent)
+            rows, third, counts = rows[keep], third[keep], triple_counts.data[keep]
+            # Apriori: every pair inside a frequent triple must itself be frequent
+            closed = (np.isin(first[rows] * width + third, frequent_pairs)
+                      & np.isin(second[rows] * width + third, frequent_pairs))
+            rows, third, counts = rows[closed], third[closed], counts[closed]
+
+            def triple_sums(weighted):
+                return np.asarray((pairs.T @ weighted)[rows, third]).ravel()
+
+            tables.append(itemset_table(names, np.column_stack([first[rows], second[rows], third]), counts,
+                                        {key: triple_sums(scaled[key]) for key in WEIGHTS}, singles, total))
+
+    return pd.concat(tables, ignore_index=True)
+
+
+def top_k(itemsets, metric='count', k=10, size=None, min_count=1):
+    """Return the `k` itemsets ranked highest by `metric`, optionally of one size only.
+
+    `min_count` keeps rare itemsets from topping ratio metrics such as lift.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric {metric!r}; expected one of {', '.join(METRICS)}.")
+    selected = itemsets[itemsets['count'] >= min_count]
+    if size is not None:
+        selected = selected[selected['size'] == size]
+    return selected.sort_values([metric, 'count', 'itemset'], ascending=[False, False, True], kind='stable').head(k)
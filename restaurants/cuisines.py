@@ -0,0 +1,106 @@
+# Restaurants x cuisines as an interned sparse matrix.
+
+# 'Cuisines' holds comma-joined strings such as "North Indian, Chinese". Rather
+# than splitting those strings again for every per-cuisine question, each
+# individual cuisine is interned to an integer ID once and the data is stored
+# as a CSR boolean matrix with one row per restaurant and one column per
+# cuisine. Per-cuisine counts, means and filters then become sparse products.
+#
+# Only the distinct combination strings are split (there are far fewer of them
+# than restaurants); restaurant rows are gathered from the per-combination rows.
+
+import numpy as np
+import pandas as pd
+
+# Separator between cuisines within one 'Cuisines' value
+SEPARATOR = ","
+
+
+class CuisineMatrix:
+    """Restaurants x individual cuisines, as a CSR boolean matrix.
+
+    `cuisines` holds the cuisine names, where a cuisine's ID is its position;
+    `ids` maps each name back to its ID. Row i of `matrix` is the restaurant at
+    position i of `index`; restaurants without cuisines have empty rows.
+    """
+
+    def __init__(self, cuisines):
+        from scipy import sparse
+
+        combinations = cuisines.astype('category')
+        names = {}
+        rows, columns = [], []
+        for row, combination in enumerate(combinations.cat.categories):
+            for name in combination.split(SEPARATOR):
+                name = name.strip()
+                if name:
+                    rows.append(row)
+                    columns.append(names.setdefault(name, len(names)))
+
+        # Number cuisines alphabetically so IDs do not depend on row order
+        order = sorted(names, key=str.casefold)
+        renumber = np.empty(len(names), dtype=np.int32)
+        renumber[[names[name] for name in order]] = np.arange(len(order), dtype=np.int32)
+        self.cuisines = np.array(order, dtype=object)
+        self.ids = {name: position for position, name in enumerate(order)}
+
+        by_combination = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=bool), (rows, renumber[columns] if columns else [])),
+            shape=(len(combinations.cat.categories), len(order)))
+        by_combination.sum_duplicates()
+
+        # Missing cuisines have code -1; point them at an extra empty row
+        codes = combinations.cat.codes.to_numpy()
+        by_combination = sparse.vstack([by_combination, sparse.csr_matrix((1, len(order)), dtype=bool)], format='csr')
+        self.matrix = by_combination[np.where(codes < 0, by_combination.shape[0] - 1, codes)]
+        self.index = cuisines.index
+
+    @property
+    def shape(self):
+        return self.matrix.shape
+
+    def counts(self, weights=None):
+        """Return the number of restaurants serving each cuisine, most common first.
+
+        With `weights`, each row counts as its weight instead of one; this turns
+        a matrix built over distinct combinations into per-cuisine totals.
+        """
+        weights = np.ones(self.shape[0]) if weights is None else np.asarray(weights, dtype=np.float64)
+        totals = self.matrix.T.astype(np.float64) @ weights
+        series = pd.Series(totals, index=self.cuisines)
+        if weights.dtype.kind in 'iub' or np.all(np.mod(weights, 1) == 0):
+            series = series.astype(np.int64)
+        return series.sort_values(ascending=False, kind='stable')
+
+    def means(self, values):
+        """Return the mean of `values` (aligned with the rows) per cuisine, sorted by cuisine name.
+
+        Restaurants with a missing value are left out of that cuisine's mean.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        present = ~np.isnan(values)
+        matrix = self.matrix.T.astype(np.float64)
+        sums = matrix @ np.where(present, values, 0.0)
+        counts = matrix @ present.astype(np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return pd.Series(sums / counts, index=self.cuisines)
+
+    def mask(self, *cuisines, require_all=True):
+        """Return a boolean array marking restaurants that serve the given cuisines.
+
+        By default a restaurant must serve every listed cuisine; pass
+        require_all=False to match restaurants serving any of them. Unknown
+        cuisine names match no restaurant.
+        """
+        if any(name not in self.ids for name in cuisines):
+            if require_all:
+                return np.zeros(self.shape[0], dtype=bool)
+            cuisines = [name for name in cuisines if name in self.ids]
+        if not cuisines:
+            return np.zeros(self.shape[0], dtype=bool)
+        hits = np.asarray(self.matrix[:, [self.ids[name] for name in cuisines]].sum(axis=1)).ravel()
+        return hits == len(cuisines) if require_all else hits > 0
+
+    def cuisines_per_restaurant(self):
+        """Return the number of individual cuisines listed for each restaurant."""
+        return np.diff(self.matrix.indptr)
@@ -0,0 +1,203 @@
+# Incremental aggregates keyed by Restaurant ID.
+
+# Task aggregates built from mergeable accumulators (restaurants/streaming.py)
+# can be kept up to date instead of recomputed. The state of an aggregate is a
+# SQLite database holding the aggregates themselves plus, in a table keyed by
+# Restaurant ID, the values every restaurant contributed and a hash of them.
+# Applying a batch of rows then only touches the restaurants in the batch: new
+# ones are added, changed ones are retracted with their previous values and
+# added again, and unchanged ones are skipped. Only the rows of added, changed
+# and removed restaurants are read from or written to the database.
+#
+# With --delta FILE only that file (new or updated rows) is read. Without it the
+# whole dataset is compared against the state by row hash, which also retracts
+# restaurants that were removed from it. The first incremental run builds the
+# state from the full dataset, also when it is given a delta, which is then
+# applied on top. States are rebuilt from scratch whenever the
+# schema or the accumulate function changes.
+
+import hashlib
+import inspect
+import os
+import pickle
+import sqlite3
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from restaurants.cache import CACHE_DIR
+from restaurants.loader import DATASET_PATH, SCHEMA, load_dataset, parse_csv, schema_token
+from restaurants.metrics import count_rows_in, log
+
+# Column identifying a restaurant across dataset versions
+ID_COLUMN = 'Restaurant ID'
+
+# Directory holding one state database per incremental aggregate
+STATE_DIR = os.path.join(CACHE_DIR, "incremental")
+
+# Bump when the state layout changes so old states are rebuilt
+STATE_VERSION = 2
+
+
+def combine(total, part, sign):
+    """Add (sign 1) or retract (sign -1) aggregates `part` into `total`; return the result."""
+    if isinstance(total, Counter):
+        if sign > 0:
+            total.update(part)
+        else:
+            total.subtract(part)
+        return +total
+    if isinstance(total, dict):
+        for key in total:
+            total[key] = combine(total[key], part[key], sign)
+        return total
+    if isinstance(total, (int, np.integer)):
+        return total + sign * part
+    return total.merge(part) if sign > 0 else total.subtract(part)
+
+
+def row_hashes(frame):
+    """Return one 64-bit hash per row of `frame`, independent of its index and category codes."""
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy()
+
+
+def quote(column):
+    """`column` as an SQL identifier."""
+    return '"' + column.replace('"', '""') + '"'
+
+
+class IncrementalState:
+    """The aggregates of one saved state and the values each restaurant contributed to them, in a SQLite database."""
+
+    def __init__(self, connection, columns, accumulate, token):
+        self.connection = connection
+        self.columns = list(columns)
+        self.accumulate = accumulate
+        self.token = token
+        self.aggregates = accumulate([])
+        self.empty = True
+
+    @classmethod
+    def load(cls, path, columns, accumulate):
+        """Open a saved state, or start an empty one if it is missing or was built differently."""
+        try:
+            source = inspect.getsource(accumulate)
+        except (OSError, TypeError):
+            source = accumulate.__qualname__
+        token = hashlib.sha1(repr((STATE_VERSION, schema_token(), list(columns), source)).encode("utf-8")).hexdigest()[:12]
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        state = cls(sqlite3.connect(path), columns, accumulate, token)
+        try:
+            state.open()
+        except sqlite3.DatabaseError:
+            # Not a database (another file at the path): start over
+            state.connection.close()
+            os.remove(path)
+            state = cls(sqlite3.connect(path), columns, accumulate, token)
+            state.open()
+        return state
+
+    def open(self):
+        """Read the saved aggregates, clearing the tables when they were built with another token."""
+        self.connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value BLOB)")
+        saved = dict(self.connection.execute("SELECT key, value FROM meta"))
+        if saved.get('token') == self.token and 'aggregates' in saved:
+            try:
+                self.aggregates = pickle.loads(saved['aggregates'])
+                self.empty = False
+            except (pickle.UnpicklingError, EOFError, AttributeError):
+                pass
+        if self.empty:
+            self.connection.execute("DROP TABLE IF EXISTS rows")
+            self.connection.execute("DELETE FROM meta")
+        columns = ", ".join(quote(column) for column in self.columns)
+        self.connection.execute(f"CREATE TABLE IF NOT EXISTS rows (id INTEGER PRIMARY KEY, hash INTEGER NOT NULL, {columns})")
+        self.connection.execute("CREATE TEMP TABLE IF NOT EXISTS batch (id INTEGER PRIMARY KEY)")
+
+    def select(self, ids):
+        """Put `ids` in the temporary batch table that lookups join with."""
+        self.connection.execute("DELETE FROM batch")
+        self.connection.executemany("INSERT INTO batch VALUES (?)", ((id,) for id in ids.tolist()))
+
+    def stored_hashes(self, ids=None):
+        """Return the saved row hashes of `ids` (of every restaurant if None) as a Series indexed by ID."""
+        if ids is None:
+            query = "SELECT id, hash FROM rows"
+        else:
+            self.select(ids)
+            query = "SELECT id, hash FROM rows JOIN batch USING (id)"
+        stored = np.array(self.connection.execute(query).fetchall(), dtype=np.int64).reshape(-1, 2)
+        return pd.Series(stored[:, 1], index=stored[:, 0])
+
+    def stored_rows(self, ids):
+        """Return the saved values of `ids`, indexed by ID and typed as the loader types them."""
+        self.select(ids)
+        columns = ", ".join(quote(column) for column in self.columns)
+        rows = self.connection.execute(f"SELECT id, {columns} FROM rows JOIN batch USING (id)").fetchall()
+        frame = pd.DataFrame.from_records(rows, columns=[ID_COLUMN] + self.columns).set_index(ID_COLUMN)
+        return frame.astype({column: SCHEMA.get(column, 'object') for column in self.columns})
+
+    def save(self):
+        """Write the aggregates and commit every row change of this run at once."""
+        self.connection.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                                    [('token', self.token), ('aggregates', pickle.dumps(self.aggregates, protocol=pickle.HIGHEST_PROTOCOL))])
+        self.connection.commit()
+        self.connection.close()
+
+    def apply(self, frame, complete=False):
+        """Apply rows keyed by Restaurant ID; with `complete`, restaurants absent from `frame` are removed.
+
+        Returns the number of added, changed, removed and unchanged restaurants.
+        """
+        frame = frame.drop_duplicates(ID_COLUMN, keep='last').set_index(ID_COLUMN)[self.columns]
+        hashes = row_hashes(frame).view(np.int64)
+        ids = frame.index.to_numpy()
+        stored = self.stored_hashes(None if complete else ids)
+        positions = stored.index.get_indexer(frame.index)
+        known = positions >= 0
+        changed = known.copy()
+        changed[known] = stored.to_numpy()[positions[known]] != hashes[known]
+        added = ~known
+
+        retracted = ids[changed]
+        if complete:
+            retracted = np.concatenate([retracted, stored.index.difference(frame.index).to_numpy()])
+        incoming = frame[added | changed]
+
+        # Retract the previous values of changed and removed restaurants, then add the new rows
+        self.aggregates = combine(self.aggregates, self.accumulate([self.stored_rows(retracted)]), -1)
+        self.aggregates = combine(self.aggregates, self.accumulate([incoming]), 1)
+
+        # stored_rows() left the retracted IDs in the batch table
+        self.connection.execute("DELETE FROM rows WHERE id IN (SELECT id FROM batch)")
+        columns = [incoming.index.tolist(), hashes[added | changed].tolist()] + [incoming[column].tolist() for column in self.columns]
+        self.connection.executemany(f"INSERT INTO rows VALUES ({', '.join('?' * len(columns))})", zip(*columns))
+        self.empty = False
+        return {'added': int(added.sum()), 'changed': int(changed.sum()),
+                'removed': len(retracted) - int(changed.sum()), 'unchanged': int((known & ~changed).sum())}
+
+
+def incremental_aggregates(name, columns, accumulate, path=DATASET_PATH, delta=None, state_dir=STATE_DIR):
+    """Update the saved aggregates `name` with a delta file, or with the full dataset; return them.
+
+    `accumulate(frames)` must build the aggregates from an iterable of DataFrames
+    (an empty one giving empty aggregates), as the chunked level code does.
+    """
+    state_path = os.path.join(state_dir, f"{name}.sqlite")
+    state = IncrementalState.load(state_path, columns, accumulate)
+    wanted = [ID_COLUMN] + list(columns)
+    batches = []
+    if delta is None or state.empty:
+        # A delta only makes sense on top of the full dataset, so a missing state is built from it first
+        batches.append((path, lambda: load_dataset(wanted, path=path), True))
+    if delta is not None:
+        batches.append((delta, lambda: parse_csv(delta, wanted), False))
+    for source, read, complete in batches:
+        frame = read()
+        summary = state.apply(frame, complete=complete)
+        count_rows_in(len(frame))
+        log(f"Incremental {name} from {source}: {summary['added']} added, {summary['changed']} changed, "
+            f"{summary['removed']} removed, {summary['unchanged']} unchanged")
+    state.save()
+    return state.aggregates
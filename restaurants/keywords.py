@@ -0,0 +1,116 @@
+# Streaming keyword counting over review text (Level 3, Task 1).
+
+# Tokenizing every review with .apply() and concatenating the token lists with
+# .sum() copies the lists over and over and keeps every token in memory. Here
+# reviews are processed in fixed-size batches: each batch is tokenized, stop
+# words are dropped and the remaining words are added straight to one Counter
+# per rating bucket, so no token list outlives its review. Batches can be
+# spread over a process pool with a bounded number in flight, which keeps
+# memory constant regardless of the number of reviews.
+#
+# Tokenizers:
+# - regex: lower-cased runs of letters and digits (a compiled pattern; fast)
+# - nltk:  nltk.word_tokenize, keeping alphanumeric tokens as before
+
+import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+TOKENIZERS = ('regex', 'nltk')
+
+# Runs of letters and digits, i.e. the tokens str.isalnum() accepts
+WORD_PATTERN = re.compile(r"[^\W_]+")
+
+# Reviews per batch handed to a worker
+DEFAULT_BATCH_SIZE = 10_000
+
+# Rating buckets as (lowest, highest) inclusive bounds; None leaves a side open
+RATING_BUCKETS = {
+    'positive': (4.0, None),
+    'negative': (None, 2.0),
+}
+
+
+def tokenize(text, tokenizer='regex'):
+    """Return the lower-cased alphanumeric tokens of `text`."""
+    if tokenizer == 'regex':
+        return WORD_PATTERN.findall(text.lower())
+    from nltk.tokenize import word_tokenize
+
+    return [word for word in word_tokenize(text.lower()) if word.isalnum()]
+
+
+def bucket_ids(ratings, buckets=RATING_BUCKETS):
+    """Return, per rating, the position of the first bucket containing it, or -1."""
+    ratings = np.asarray(ratings, dtype=np.float64)
+    ids = np.full(len(ratings), -1, dtype=np.int64)
+    for position, (lowest, highest) in reversed(list(enumerate(buckets.values()))):
+        inside = np.ones(len(ratings), dtype=bool)
+        if lowest is not None:
+            inside &= ratings >= lowest
+        if highest is not None:
+            inside &= ratings <= highest
+        ids[inside] = position
+    return ids
+
+
+def count_batch(texts, ids, bucket_count, stop_words, tokenizer='regex'):
+    """Count keywords of one batch per bucket; returns (counters, rows, characters)."""
+    counters = [Counter() for _ in range(bucket_count)]
+    characters = 0
+    for text, bucket in zip(texts, ids):
+        characters += len(text)
+        if bucket >= 0:
+            counters[bucket].update(word for word in tokenize(text, tokenizer) if word not in stop_words)
+    return counters, len(texts), characters
+
+
+def batches(reviews, ratings, buckets, batch_size):
+    """Yield (texts, bucket ids) for consecutive slices of the reviews."""
+    ids = bucket_ids(ratings, buckets)
+    for start in range(0, len(reviews), batch_size):
+        yield list(reviews[start:start + batch_size]), ids[start:start + batch_size]
+
+
+def count_keywords(reviews, ratings, stop_words, buckets=RATING_BUCKETS, tokenizer='regex',
+                   batch_size=DEFAULT_BATCH_SIZE, workers=1):
+    """Count keywords per rating bucket across all reviews.
+
+    Returns (counters, average_length): a dict of bucket name -> Counter of
+    keywords, and the mean review length in characters. With `workers` > 1 the
+    batches are counted in a process pool, with at most two batches per worker
+    waiting at any time.
+    """
+    if tokenizer not in TOKENIZERS:
+        raise ValueError(f"Unknown tokenizer {tokenizer!r}; expected one of {', '.join(TOKENIZERS)}.")
+    reviews = np.asarray(reviews, dtype=object)
+    stop_words = frozenset(stop_words)
+    totals = [Counter() for _ in buckets]
+    rows = characters = 0
+
+    def merge(result):
+        nonlocal rows, characters
+        counters, batch_rows, batch_characters = result
+        for total, counter in zip(totals, counters):
+            total.update(counter)
+        rows += batch_rows
+        characters += batch_characters
+
+    work = batches(reviews, ratings, buckets, batch_size)
+    if workers <= 1:
+        for texts, ids in work:
+            merge(count_batch(texts, ids, len(buckets), stop_words, tokenizer))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = []
+            for texts, ids in work:
+                pending.append(executor.submit(count_batch, texts, ids, len(buckets), stop_words, tokenizer))
+                if len(pending) >= 2 * workers:
+                    merge(pending.pop(0).result())
+            for future in pending:
+                merge(future.result())
+
+    average_length = characters / rows if rows else float('nan')
+    return dict(zip(buckets, totals)), average_length
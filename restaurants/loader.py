@@ -0,0 +1,89 @@
+# Dataset loader shared by all three analysis levels.
+
+# Every level reads the same cognifyz_dataset.csv. Instead of letting pandas infer
+# object dtypes for every column, the schema is declared here once and each caller
+# asks only for the columns its tasks need. Parsed data is kept in a columnar
+# cache (see restaurants/cache.py) so unchanged files are not parsed again.
+
+import hashlib
+
+import pandas as pd
+
+from restaurants import cache
+
+# Default location of the dataset, relative to the working directory
+DATASET_PATH = "cognifyz_dataset.csv"
+
+# Columns stored as "Yes"/"No" in the CSV and loaded as booleans
+YES_NO_COLUMNS = [
+    'Has Table booking',
+    'Has Online delivery',
+    'Is delivering now',
+    'Switch to order menu',
+]
+
+# Declared dtype for every known column of the dataset
+SCHEMA = {
+    'Restaurant ID': 'int64',
+    'Restaurant Name': 'category',
+    'Country Code': 'int16',
+    'City': 'category',
+    'Address': 'object',
+    'Locality': 'category',
+    'Locality Verbose': 'category',
+    'Longitude': 'float64',
+    'Latitude': 'float64',
+    'Cuisines': 'category',
+    'Average Cost for two': 'int32',
+    'Currency': 'category',
+    'Has Table booking': 'bool',
+    'Has Online delivery': 'bool',
+    'Is delivering now': 'bool',
+    'Switch to order menu': 'bool',
+    'Price range': 'int8',
+    'Aggregate rating': 'float32',
+    'Rating color': 'category',
+    'Rating text': 'category',
+    'Votes': 'int32',
+    'Review': 'object',
+}
+
+
+def read_options(columns=None):
+    """Return the keyword arguments passed to pd.read_csv for the given columns.
+
+    Columns that are requested but not present in the file are silently skipped,
+    so callers can check for optional columns such as 'Review' afterwards.
+    """
+    wanted = set(SCHEMA if columns is None else columns)
+    return {
+        'usecols': lambda column: column in wanted,
+        'dtype': {column: dtype for column, dtype in SCHEMA.items() if column in wanted},
+        'true_values': ['Yes'],
+        'false_values': ['No'],
+    }
+
+
+def schema_token():
+    """Return a short hash of SCHEMA; cached data built with another schema is rebuilt."""
+    return hashlib.sha1(repr(sorted(SCHEMA.items())).encode("utf-8")).hexdigest()[:12]
+
+
+def parse_csv(path, columns=None):
+    """Parse the CSV with the declared schema, bypassing the cache."""
+    return pd.read_csv(path, **read_options(columns))
+
+
+def load_dataset(columns=None, path=DATASET_PATH, cache_dir=cache.CACHE_DIR):
+    """Load the restaurant dataset with the declared schema.
+
+    Only the requested columns are returned; pass None to load every column.
+    The first load of a file parses the whole CSV once and stores it in
+    `cache_dir`; later loads read the requested columns from that cache until
+    the file changes. Pass cache_dir=None to always parse the CSV.
+    Errors raised by pandas (missing file, empty file, parse errors) are left
+    to the caller, which reports them the same way the level scripts always have.
+    """
+    if cache_dir is None:
+        return parse_csv(path, columns)
+    return cache.load(path, parse_csv, columns=columns, schema_token=schema_token(), cache_dir=cache_dir)
@@ -0,0 +1,148 @@
+# Scalable map rendering for the geographic analysis (Level 2, Task 3).
+
+# Adding one folium.Marker per restaurant is a Python loop over every row and
+# produces an HTML file that grows linearly with the data; past a few tens of
+# thousands of points the page is unusable. Here every layer is built from
+# coordinate arrays, and a point budget bounds the size of the page and the
+# time needed to build it:
+#
+# - markers: one marker per restaurant, only sensible for small inputs
+# - cluster: client-side clustering of all points (FastMarkerCluster)
+# - heatmap: a heat layer built from the coordinate arrays, weighted by
+#            grid-aggregated counts once the budget is exceeded
+# - auto:    markers, then cluster, then a heatmap of grid-aggregated points
+#            once the number of points exceeds the budget
+#
+# The point budget is only a proxy for what matters, the size of the page and
+# the time taken to build it, so render_map() also checks both on the page it
+# built. In 'auto' mode a page over either budget is built again in the next
+# cheaper mode (markers, cluster, heatmap, then a heatmap of half as many
+# grid-aggregated points); an explicitly chosen mode is kept and the budgets it
+# exceeded are reported.
+
+import time
+
+import numpy as np
+
+MAP_MODES = ('auto', 'markers', 'cluster', 'heatmap')
+
+# Maximum number of coordinates written to the HTML page
+DEFAULT_MAX_POINTS = 50_000
+
+# Largest HTML page, and longest time to build and render it, before 'auto' falls back to a cheaper mode
+DEFAULT_MAX_BYTES = 5 * 2 ** 20
+DEFAULT_MAX_SECONDS = 10.0
+
+# Fewest grid-aggregated points a heatmap is reduced to when over budget
+MIN_HEATMAP_POINTS = 1_000
+
+# Largest input drawn with individual markers in 'auto' mode
+MARKER_LIMIT = 1_000
+
+# Decimal places kept per coordinate (about 1 m); shortens the embedded JSON
+COORDINATE_DECIMALS = 5
+
+
+def aggregate_points(latitudes, longitudes, max_points, cell_size=1e-4):
+    """Snap points to a square grid and return (latitudes, longitudes, counts) per cell.
+
+    The cell size starts at `cell_size` degrees and doubles until at most
+    `max_points` cells are occupied. Each cell is placed at the mean position
+    of the restaurants it contains.
+    """
+    while True:
+        rows = np.floor(latitudes / cell_size).astype(np.int64)
+        columns = np.floor(longitudes / cell_size).astype(np.int64)
+        cells, inverse = np.unique(np.stack([rows, columns], axis=1), axis=0, return_inverse=True)
+        if len(cells) <= max_points:
+            break
+        cell_size *= 2
+    inverse = inverse.ravel()
+    counts = np.bincount(inverse)
+    cell_latitudes = np.bincount(inverse, weights=latitudes) / counts
+    cell_longitudes = np.bincount(inverse, weights=longitudes) / counts
+    return cell_latitudes, cell_longitudes, counts
+
+
+def build_map(latitudes, longitudes, mode='auto', max_points=DEFAULT_MAX_POINTS, zoom_start=12):
+    """Return (folium.Map, details) showing the given restaurant coordinates.
+
+    `details` records the mode actually used, how many points were written and
+    whether they were aggregated to grid cells. Inputs above `max_points` are
+    aggregated into a weighted heatmap; asking for 'markers' or 'cluster' on
+    such an input raises ValueError.
+    """
+    import folium
+    from folium import plugins
+
+    if mode not in MAP_MODES:
+        raise ValueError(f"Unknown map mode {mode!r}; expected one of {', '.join(MAP_MODES)}.")
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    total = len(latitudes)
+
+    if mode == 'auto':
+        if total <= MARKER_LIMIT:
+            mode = 'markers'
+        elif total <= max_points:
+            mode = 'cluster'
+        else:
+            mode = 'heatmap'
+    elif total > max_points and mode != 'heatmap':
+        raise ValueError(f"{total} points exceed the map budget of {max_points}; use mode 'auto' or 'heatmap', or raise max_points.")
+
+    restaurant_map = folium.Map(location=[latitudes.mean(), longitudes.mean()], zoom_start=zoom_start)
+    details = {'mode': mode, 'restaurants': total, 'points': total, 'aggregated': False}
+
+    if total > max_points:
+        latitudes, longitudes, weights = aggregate_points(latitudes, longitudes, max_points)
+        details.update(points=len(latitudes), aggregated=True)
+    else:
+        weights = None
+
+    coordinates = np.round(np.column_stack([latitudes, longitudes]), COORDINATE_DECIMALS)
+    if mode == 'markers':
+        for latitude, longitude in coordinates.tolist():
+            folium.Marker([latitude, longitude]).add_to(restaurant_map)
+    elif mode == 'cluster':
+        plugins.FastMarkerCluster(coordinates.tolist()).add_to(restaurant_map)
+    else:
+        if weights is not None:
+            # Scale cell counts to [0, 1] so dense cells stay brightest
+            coordinates = np.column_stack([coordinates, np.round(weights / weights.max(), 4)])
+        plugins.HeatMap(coordinates.tolist()).add_to(restaurant_map)
+    return restaurant_map, details
+
+
+def render_map(latitudes, longitudes, mode='auto', max_points=DEFAULT_MAX_POINTS, max_bytes=DEFAULT_MAX_BYTES,
+               max_seconds=DEFAULT_MAX_SECONDS, zoom_start=12):
+    """Return (html, details) of the map of the given coordinates, built within the point, size and time budgets.
+
+    `details` is that of build_map() for the page returned, plus its 'bytes',
+    the 'seconds' taken by every attempt, the 'fallbacks' taken in 'auto' mode
+    as (mode, points, exceeded budgets) and the budgets the page itself still
+    exceeds in 'over_budget' ('size' and/or 'time').
+    """
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    current, points, fallbacks = mode, max_points, []
+    if mode == 'auto':
+        current = 'markers' if len(latitudes) <= MARKER_LIMIT else 'cluster' if len(latitudes) <= max_points else 'heatmap'
+    started = time.perf_counter()
+    while True:
+        attempt = time.perf_counter()
+        restaurant_map, details = build_map(latitudes, longitudes, mode=current, max_points=points, zoom_start=zoom_start)
+        html = restaurant_map.get_root().render()
+        size = len(html.encode('utf-8'))
+        over = [name for name, exceeded in (('size', size > max_bytes), ('time', time.perf_counter() - attempt > max_seconds)) if exceeded]
+        if not over or mode != 'auto' or (current == 'heatmap' and details['points'] <= MIN_HEATMAP_POINTS):
+            break
+        fallbacks.append((current, details['points'], over))
+        if current == 'markers':
+            current = 'cluster'
+        elif current == 'cluster':
+            current = 'heatmap'
+        else:
+            points = max(MIN_HEATMAP_POINTS, details['points'] // 2)
+    details.update(bytes=size, seconds=round(time.perf_counter() - started, 6), fallbacks=fallbacks, over_budget=over)
+    return html, details
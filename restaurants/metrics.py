@@ -0,0 +1,190 @@
+# Per-step metrics and verbosity-controlled logging.
+
+# The task runner measures every task and intermediate it computes: wall and
+# CPU time, rows read and produced, peak resident memory and the artifacts it
+# wrote. Each task's record is written to Level_X_Task_Y_Metrics.json next to
+# its output file, and Run_Metrics.json lists every step of the run, so run
+# cost can be tracked by other tools.
+#
+# Peak memory is the process's RSS high-water mark. On Linux it is reset at the
+# start of each step (through /proc/self/clear_refs), so it covers that step
+# alone; elsewhere it is the peak of the process so far, which the record notes
+# as its 'peak_rss_scope'.
+#
+# Progress messages go through log() and are shown at the 'normal' verbosity;
+# debug() output, such as whole frames, only at 'debug'.
+
+import contextlib
+import json
+import os
+import re
+import resource
+import sys
+import time
+
+import pandas as pd
+
+# Verbosity levels, from least to most output
+QUIET, NORMAL, DEBUG = 0, 1, 2
+VERBOSITY_LEVELS = {'quiet': QUIET, 'normal': NORMAL, 'debug': DEBUG}
+
+# Current verbosity of this process
+VERBOSITY = NORMAL
+
+# Where the metrics of the whole run are written
+RUN_METRICS_PATH = "Run_Metrics.json"
+
+# Records of the steps measured by this process and not collected yet
+STEPS = []
+
+# Steps being measured, innermost last
+ACTIVE = []
+
+# Rows read by each measured step, so steps that only see its result can report them
+ROWS_IN = {}
+
+
+def set_verbosity(level):
+    """Set the verbosity from a level name or number."""
+    global VERBOSITY
+    VERBOSITY = VERBOSITY_LEVELS[level] if isinstance(level, str) else level
+
+
+def enabled(level):
+    return VERBOSITY >= level
+
+
+def log(*values, level=NORMAL):
+    """Print progress messages unless the verbosity is below `level`."""
+    if VERBOSITY >= level:
+        print(*values)
+
+
+def debug(*values):
+    """Print diagnostics, such as whole frames, only at the 'debug' verbosity."""
+    log(*values, level=DEBUG)
+
+
+def warn(*values):
+    """Print a warning at every verbosity."""
+    log(*values, level=QUIET)
+
+
+def reset_peak_rss():
+    """Reset the RSS high-water mark of this process; return whether that is supported."""
+    try:
+        with open("/proc/self/clear_refs", "w") as handle:
+            handle.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss():
+    """Return the RSS high-water mark of this process in bytes."""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+
+
+def count_rows_in(rows):
+    """Add rows read by the step being measured, such as streamed chunks."""
+    if ACTIVE:
+        ACTIVE[-1]['rows_in'] += int(rows)
+
+
+def count_rows_out(rows):
+    """Add rows produced by the step being measured, such as the rows of its result table."""
+    if ACTIVE:
+        ACTIVE[-1]['rows_out'] = (ACTIVE[-1]['rows_out'] or 0) + int(rows)
+
+
+def note_file(path):
+    """Record a file written by the step being measured without open_output(), such as an HTML map."""
+    if ACTIVE:
+        ACTIVE[-1].setdefault('files', []).append(path)
+
+
+def note_metric(name, value):
+    """Record a measurement of the step being measured, such as a timing kept out of its text output."""
+    if ACTIVE:
+        ACTIVE[-1].setdefault('details', {})[name] = value
+
+
+def note_input(value):
+    """Count a DataFrame fetched while a step runs as rows read by it."""
+    if ACTIVE and isinstance(value, pd.DataFrame):
+        ACTIVE[-1]['rows_in'] += len(value)
+
+
+@contextlib.contextmanager
+def measure(name, kind, inputs=()):
+    """Measure one step; `inputs` are its resolved requirements as (name, value) pairs.
+
+    DataFrame inputs count as rows read; other inputs count the rows their own
+    step read.
+    """
+    record = {
+        'step': name,
+        'kind': kind,
+        'pid': os.getpid(),
+        'rows_in': sum(len(value) if isinstance(value, pd.DataFrame) else ROWS_IN.get(requirement, 0)
+                       for requirement, value in inputs),
+        'rows_out': None,
+    }
+    if ACTIVE:
+        # Resetting the high-water mark below would lose the enclosing step's peak so far
+        ACTIVE[-1]['nested_peak_rss_bytes'] = max(ACTIVE[-1].get('nested_peak_rss_bytes', 0), peak_rss())
+    scope = 'step' if reset_peak_rss() else 'process'
+    ACTIVE.append(record)
+    started, cpu_started = time.perf_counter(), time.process_time()
+    try:
+        yield record
+    finally:
+        record['wall_seconds'] = round(time.perf_counter() - started, 6)
+        record['cpu_seconds'] = round(time.process_time() - cpu_started, 6)
+        ACTIVE.pop()
+        # A nested step passes its peak up to the enclosing one
+        record['peak_rss_bytes'] = max(peak_rss(), record.pop('nested_peak_rss_bytes', 0))
+        record['peak_rss_scope'] = scope
+        if ACTIVE:
+            ACTIVE[-1]['nested_peak_rss_bytes'] = max(ACTIVE[-1].get('nested_peak_rss_bytes', 0), record['peak_rss_bytes'])
+        ROWS_IN[name] = record['rows_in']
+        STEPS.append(record)
+
+
+def collect():
+    """Return and clear the step records of this process."""
+    steps = STEPS[:]
+    STEPS.clear()
+    return steps
+
+
+def metrics_path(name):
+    """Return the metrics file of a task: level1.task1 -> Level_1_Task_1_Metrics.json."""
+    level, _, task = name.partition('.')
+    parts = [f"Level_{level.removeprefix('level')}"] + [
+        f"Task_{part.removeprefix('task')}" if re.fullmatch(r"task\d+", part) else part.capitalize()
+        for part in task.split('_')
+    ]
+    return "_".join(parts) + "_Metrics.json"
+
+
+def write_json(path, content):
+    with open(path, "w") as handle:
+        json.dump(content, handle, indent=2)
+        handle.write("\n")
+
+
+def write_metrics(steps, summary, path=RUN_METRICS_PATH):
+    """Write each task's record next to its output file and the whole run to `path`."""
+    for record in steps:
+        if record['kind'] == 'task':
+            write_json(metrics_path(record['step']), record)
+    write_json(path, {**summary, 'steps': steps})
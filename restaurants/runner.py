@@ -0,0 +1,444 @@
+# Task runner with shared, memoized intermediate results.
+
+# Each level script registers its tasks with @task and the data they share with
+# @intermediate, declaring what every step requires and which dataset columns
+# it reads. A run resolves only the dependencies of the selected tasks, loads
+# only the union of their columns, and computes every intermediate at most once,
+# so rerunning a single task costs just that task's inputs.
+#
+# Usage:
+#   python -m restaurants list
+#   python -m restaurants run level2.task4
+#   python -m restaurants run level1 level3.task3 --stream
+#   python -m restaurants run all --jobs 8
+#
+# With --jobs, shared intermediates are computed once in the parent process,
+# the loaded dataset is placed in shared memory (restaurants/shared.py) and the
+# independent tasks run in a pool of worker processes that attach to it instead
+# of receiving a pickled copy, so wall time approaches that of the slowest task.
+#
+# Charts submitted by the tasks (restaurants/charts.py) are rendered headlessly
+# after all tasks have finished, in the same number of worker processes. Text
+# outputs and charts that are unchanged since the last run are neither written
+# nor rendered again (restaurants/artifacts.py); --rebuild renders every chart.
+#
+# Every step is measured (restaurants/metrics.py) and each task's wall and CPU
+# time, rows, peak memory and artifacts are written to Level_X_Task_Y_Metrics.json;
+# --verbosity controls how much progress and diagnostic output is printed.
+#
+# --approximate computes top-K and distinct counts from fixed-size sketches
+# (restaurants/sketches.py) instead of exact per-key counters, with the error
+# bounds set by --sketch-epsilon, --sketch-delta and --distinct-error, and
+# quantiles from KLL sketches within --quantile-error.
+
+import argparse
+import importlib.util
+from concurrent.futures import ProcessPoolExecutor
+import os
+import sys
+import time
+
+import pandas as pd
+
+from restaurants import artifacts, charts, metrics
+from restaurants.bitmaps import BITMAP_COLUMNS, BitmapIndex
+from restaurants.loader import DATASET_PATH, SCHEMA, load_dataset
+from restaurants.shared import attach_frame, release, share_frame
+from restaurants.sketches import (DEFAULT_DELTA, DEFAULT_DISTINCT_ERROR, DEFAULT_EPSILON, DEFAULT_QUANTILE_ERROR, DistributionSketch,
+                                  HeavyHitters, HyperLogLog)
+
+# Root of the repository, which holds the level script directories
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Level name -> script registering that level's tasks
+LEVEL_SCRIPTS = {
+    'level1': os.path.join(REPOSITORY, 'level1', 'level1_analysis.py'),
+    'level2': os.path.join(REPOSITORY, 'level2', 'level2_analysis.py'),
+    'level3': os.path.join(REPOSITORY, 'level3', 'level3_analysis.py'),
+}
+
+# Registered steps by name, in registration order
+NODES = {}
+
+# Argument hooks registered by each level: level name -> add_arguments(parser)
+LEVEL_ARGUMENTS = {}
+
+# Names resolved by the run itself rather than by a registered step
+BUILTINS = ('run', 'options')
+
+
+class Node:
+    """A registered task or intermediate."""
+
+    def __init__(self, name, function, requires, columns, is_task, incremental=False):
+        self.name = name
+        self.function = function
+        self.requires = list(requires)
+        self.columns = list(columns)
+        self.is_task = is_task
+        self.incremental = incremental
+
+
+def register(name, requires, columns, is_task, incremental=False):
+    def decorator(function):
+        NODES[name] = Node(name, function, requires, columns, is_task, incremental)
+        return function
+    return decorator
+
+
+def task(name, requires=(), columns=(), incremental=False):
+    """Register a task; it is called with its resolved requirements, in order.
+
+    An `incremental` task reads only aggregates kept up to date by
+    restaurants/incremental.py, so it can run with --delta.
+    """
+    return register(name, requires, columns, is_task=True, incremental=incremental)
+
+
+def intermediate(name, requires=(), columns=()):
+    """Register a shared intermediate result, computed at most once per run."""
+    return register(name, requires, columns, is_task=False)
+
+
+def arguments(level):
+    """Register a level's add_arguments(parser) hook for its command-line options."""
+    def decorator(function):
+        LEVEL_ARGUMENTS[level] = function
+        return function
+    return decorator
+
+
+def load_level(level):
+    """Import a level script so its tasks are registered, unless that already happened."""
+    if level in LEVEL_ARGUMENTS or any(name.startswith(level + '.') for name in NODES):
+        return
+    spec = importlib.util.spec_from_file_location(f"{level}_analysis", LEVEL_SCRIPTS[level])
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+
+
+def tasks():
+    """Return the names of all registered tasks, in registration order."""
+    return [name for name, node in NODES.items() if node.is_task]
+
+
+def select(targets):
+    """Expand task names, level names and 'all' into task names, keeping their order."""
+    selected = []
+    for target in targets:
+        level = target.split('.')[0]
+        if level in LEVEL_SCRIPTS:
+            load_level(level)
+        if target == 'all':
+            for level in LEVEL_SCRIPTS:
+                load_level(level)
+            matches = tasks()
+        elif target in NODES and NODES[target].is_task:
+            matches = [target]
+        else:
+            matches = [name for name in tasks() if name.startswith(target + '.')]
+        if not matches:
+            raise KeyError(f"Unknown task or level {target!r}; see 'python -m restaurants list'.")
+        selected.extend(name for name in matches if name not in selected)
+    return selected
+
+
+class Run:
+    """One execution: options, the dataset location and the memoized results."""
+
+    def __init__(self, options=None, path=DATASET_PATH):
+        self.options = options if options is not None else argparse.Namespace()
+        self.path = path
+        self.results = {}
+        self.columns = []
+        self.segments = []
+
+    @property
+    def incremental(self):
+        """Whether aggregates are updated from saved state (--incremental or --delta)."""
+        return bool(getattr(self.options, 'incremental', False) or getattr(self.options, 'delta', None))
+
+    @property
+    def approximate(self):
+        """Whether top-K and distinct counts come from bounded-memory sketches (--approximate)."""
+        return bool(getattr(self.options, 'approximate', False))
+
+    def heavy_hitters(self, values=()):
+        """An empty top-K sketch with this run's error bounds, tracking sums of the `values` columns."""
+        return HeavyHitters(getattr(self.options, 'sketch_epsilon', DEFAULT_EPSILON), getattr(self.options, 'sketch_delta', DEFAULT_DELTA), values)
+
+    def distinct_counter(self):
+        """An empty distinct-count sketch with this run's error bound."""
+        return HyperLogLog(getattr(self.options, 'distinct_error', DEFAULT_DISTINCT_ERROR))
+
+    def distribution_sketch(self, name=None):
+        """An empty describe() sketch of the column `name` with this run's quantile error."""
+        return DistributionSketch(getattr(self.options, 'quantile_error', DEFAULT_QUANTILE_ERROR), name=name)
+
+    def delta_tasks(self, names):
+        """Drop the tasks that would read the dataset file, which does not contain the --delta rows, with a warning."""
+        skipped = [name for name in names if not NODES[name].incremental]
+        if skipped:
+            metrics.warn(f"Warning: --delta only updates incremental aggregates; skipping {', '.join(skipped)}, "
+                         "which would read the dataset file without the new rows.")
+        return [name for name in names if NODES[name].incremental]
+
+    def plan(self, names):
+        """Return the steps needed for `names`, dependencies first."""
+        order, visiting = [], set()
+
+        def visit(name):
+            if name in BUILTINS or name in order:
+                return
+            if name in visiting:
+                raise ValueError(f"Dependency cycle through {name!r}.")
+            if name not in NODES:
+                raise KeyError(f"Unknown task or intermediate {name!r}.")
+            visiting.add(name)
+            for requirement in NODES[name].requires:
+                visit(requirement)
+            visiting.discard(name)
+            order.append(name)
+
+        for name in names:
+            visit(name)
+        return order
+
+    def get(self, name):
+        """Return the result of a step, computing it and its requirements on first use.
+
+        A DataFrame fetched by a running step counts as rows read by that step.
+        """
+        result = self.resolve(name)
+        if name not in BUILTINS:
+            metrics.note_input(result)
+        return result
+
+    def resolve(self, name):
+        """Compute a step once, after its requirements, measuring it and the artifacts it writes."""
+        if name == 'run':
+            return self
+        if name == 'options':
+            return self.options
+        if name not in self.results:
+            node = NODES[name]
+            inputs = [(requirement, self.resolve(requirement)) for requirement in node.requires]
+            with metrics.measure(name, 'task' if node.is_task else 'intermediate', inputs) as record:
+                pending, written = len(charts.PENDING), len(artifacts.RECORDS)
+                result = node.function(*(value for _, value in inputs))
+                record['charts'] = [chart.filename for chart in charts.PENDING[pending:]]
+                record['outputs'] = [path for path, _, _ in artifacts.RECORDS[written:]]
+                if record['rows_out'] is None and isinstance(result, (pd.DataFrame, pd.Series)):
+                    record['rows_out'] = len(result)
+            self.results[name] = result
+        return self.results[name]
+
+    def execute(self, names, start_time=None, jobs=1, rebuild=False):
+        """Run the given tasks, in order or in `jobs` worker processes; columns are pruned to what they need."""
+        metrics.set_verbosity(getattr(self.options, 'verbosity', 'normal'))
+        if getattr(self.options, 'delta', None):
+            names = self.delta_tasks(names)
+            if not names:
+                return
+        started, cpu_started = time.perf_counter(), time.process_time()
+        steps = self.plan(names)
+        wanted = {column for step in steps for column in NODES[step].columns}
+        self.columns = [column for column in SCHEMA if column in wanted]
+        if jobs != 1 and len(names) > 1:
+            submitted, records, measured = self.execute_parallel(names, steps, start_time, jobs)
+        else:
+            for position, name in enumerate(names):
+                if position == 0 and start_time is not None:
+                    metrics.log(f"Time to first task: {time.perf_counter() - start_time:.2f} s")
+                self.get(name)
+            submitted, records, measured = charts.collect(), artifacts.collect(), metrics.collect()
+        reports = render_charts(submitted, jobs, rebuild)
+        records += artifacts.collect()
+        hits, misses = artifacts.update_manifest(records)
+        metrics.log(f"Artifacts: {hits} unchanged, {misses} written")
+        metrics.write_metrics(attach_artifacts(measured, records, reports), {
+            'targets': list(names),
+            'jobs': jobs,
+            'wall_seconds': round(time.perf_counter() - started, 6),
+            'cpu_seconds': round(time.process_time() - cpu_started, 6),
+            'artifacts_unchanged': hits,
+            'artifacts_written': misses,
+        })
+
+    def execute_parallel(self, names, steps, start_time, jobs):
+        """Compute the shared intermediates here, run the tasks in a process pool and return their charts and artifact records."""
+        for step in steps:
+            if not NODES[step].is_task:
+                self.get(step)
+        # The dataset goes to the workers through shared memory; other intermediates are small and pickled
+        shared, segments = None, []
+        results = dict(self.results)
+        if 'dataset' in results:
+            shared, segments = share_frame(results.pop('dataset'))
+        submitted, records, measured = [], [], metrics.collect()
+        try:
+            if start_time is not None:
+                metrics.log(f"Time to first task: {time.perf_counter() - start_time:.2f} s")
+            started = time.perf_counter()
+            workers = min(jobs or os.cpu_count() or 1, len(names))
+            with ProcessPoolExecutor(max_workers=workers, initializer=start_worker,
+                                     initargs=(self.options, self.path, self.columns, shared, results, dict(metrics.ROWS_IN))) as pool:
+                futures = [(name, pool.submit(run_task, name)) for name in names]
+                for name, future in futures:
+                    seconds, task_charts, task_records, task_metrics = future.result()
+                    submitted.extend(task_charts)
+                    records.extend(task_records)
+                    measured.extend(task_metrics)
+                    metrics.log(f"Finished {name} in {seconds:.2f} s")
+            metrics.log(f"Ran {len(names)} tasks in {workers} worker processes in {time.perf_counter() - started:.2f} s")
+        finally:
+            release(segments, unlink=True)
+        return submitted, records, measured
+
+
+# The Run of a worker process, set up once by start_worker()
+WORKER_RUN = None
+
+
+def start_worker(options, path, columns, shared, results, rows_in):
+    """Pool initializer: register the tasks and attach to the shared dataset."""
+    global WORKER_RUN
+    for level in LEVEL_SCRIPTS:
+        load_level(level)
+    metrics.set_verbosity(getattr(options, 'verbosity', 'normal'))
+    metrics.ROWS_IN.update(rows_in)
+    WORKER_RUN = Run(options, path)
+    WORKER_RUN.columns = columns
+    WORKER_RUN.results.update(results)
+    if shared is not None:
+        # The segments stay open for the life of the worker, which owns the views into them
+        WORKER_RUN.results['dataset'], WORKER_RUN.segments = attach_frame(shared)
+
+
+def run_task(name):
+    """Run one task in a worker process; return its duration in seconds, its charts, artifact records and metrics."""
+    started = time.perf_counter()
+    WORKER_RUN.get(name)
+    return time.perf_counter() - started, charts.collect(), artifacts.collect(), metrics.collect()
+
+
+def render_charts(submitted, jobs=1, rebuild=False):
+    """Render the changed charts submitted by the tasks headlessly; return the time and memory per chart."""
+    if not submitted:
+        return []
+    reports = charts.render_changed(submitted, jobs, rebuild)
+    for report in reports:
+        if report['error']:
+            metrics.warn(f"Error rendering {report['chart']}: {report['error']}")
+        elif report['cached']:
+            metrics.log(f"Unchanged {report['chart']}, not rendered")
+        else:
+            metrics.log(f"Rendered {report['chart']} in {report['seconds']:.2f} s, peak {report['peak_bytes'] / 2**20:.1f} MiB")
+    charts.write_report(reports)
+    return reports
+
+
+def attach_artifacts(measured, records, reports):
+    """Replace the output and chart names of each step record with the size and status of those artifacts."""
+    artifact_records = {path: (status, entry) for path, status, entry in records}
+    rendered = {report['chart']: report for report in reports}
+    for record in measured:
+        record['artifacts'] = []
+        for kind, paths in (('output', record.pop('outputs', [])), ('chart', record.pop('charts', [])), ('file', record.pop('files', []))):
+            for path in paths:
+                artifact = {'path': path, 'kind': kind}
+                if kind == 'file' and os.path.exists(path):
+                    size = os.path.getsize(path)
+                    artifact.update(status='written', bytes=size, bytes_written=size)
+                elif path in artifact_records:
+                    status, entry = artifact_records[path]
+                    artifact.update(status='unchanged' if status == 'hit' else 'written', bytes=entry['size'],
+                                    bytes_written=0 if status == 'hit' else entry['size'])
+                else:
+                    artifact.update(status='error', bytes=0, bytes_written=0)
+                if path in rendered:
+                    artifact.update(render_seconds=round(rendered[path]['seconds'], 6),
+                                    render_peak_bytes=rendered[path]['peak_bytes'], error=rendered[path]['error'])
+                record['artifacts'].append(artifact)
+    return measured
+
+
+@intermediate('dataset', requires=['run'])
+def dataset(run):
+    """The typed dataset, limited to the columns declared by the planned steps."""
+    return load_dataset(run.columns, path=run.path)
+
+
+@intermediate('bitmaps', requires=['dataset'])
+def bitmaps(dataset):
+    """Bitmap indexes over the low-cardinality columns the planned steps loaded."""
+    return BitmapIndex(dataset, [column for column in BITMAP_COLUMNS if column in dataset.columns])
+
+
+def execute_or_exit(names, options, path=DATASET_PATH, start_time=None):
+    """Execute tasks, reporting dataset loading errors the way the level scripts always have."""
+    try:
+        return Run(options, path).execute(names, start_time, jobs=options.jobs, rebuild=options.rebuild)
+    except FileNotFoundError:
+        print(f"Error: The file '{path}' was not found.")
+    except pd.errors.EmptyDataError:
+        print(f"Error: The file '{path}' is empty.")
+    except pd.errors.ParserError:
+        print(f"Error: The file '{path}' could not be parsed.")
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
+    sys.exit(1)
+
+
+def add_run_arguments(parser):
+    """Options shared by every way of running tasks."""
+    parser.add_argument("--dataset", default=DATASET_PATH, help="path of the restaurant CSV")
+    parser.add_argument("--jobs", type=int, default=1, help="run independent tasks in this many worker processes over a shared-memory dataset (0: one per CPU)")
+    parser.add_argument("--rebuild", action="store_true", help="render every chart even if its data and style are unchanged")
+    parser.add_argument("--incremental", action="store_true", help="update saved aggregates with new or changed rows instead of recomputing them from scratch")
+    parser.add_argument("--delta", default=None, help="CSV of new or changed rows, keyed by 'Restaurant ID', to apply in --incremental mode; tasks without saved aggregates are skipped")
+    parser.add_argument("--approximate", action="store_true", help="compute top-K and distinct counts from bounded-memory sketches instead of exact counters")
+    parser.add_argument("--sketch-epsilon", type=float, default=DEFAULT_EPSILON, help="in --approximate mode, largest overestimate of a top-K count as a fraction of all rows")
+    parser.add_argument("--sketch-delta", type=float, default=DEFAULT_DELTA, help="in --approximate mode, probability that a Count-Min estimate exceeds its error bound")
+    parser.add_argument("--distinct-error", type=float, default=DEFAULT_DISTINCT_ERROR, help="in --approximate mode, relative standard error of distinct counts")
+    parser.add_argument("--quantile-error", type=float, default=DEFAULT_QUANTILE_ERROR, help="in --approximate mode, rank error of sketched quartiles as a fraction of all values")
+    parser.add_argument("--verbosity", choices=sorted(metrics.VERBOSITY_LEVELS, key=metrics.VERBOSITY_LEVELS.get), default='normal',
+                        help="'quiet' prints only warnings and errors, 'debug' also prints intermediate frames")
+
+
+def run_level(level, argv=None, start_time=None):
+    """Entry point of a level script: parse its options and run all of its tasks."""
+    parser = argparse.ArgumentParser(description=f"{level.replace('level', 'Level ')} analysis of the restaurant dataset.")
+    add_run_arguments(parser)
+    LEVEL_ARGUMENTS[level](parser)
+    options = parser.parse_args(argv)
+    execute_or_exit(select([level]), options, options.dataset, start_time)
+
+
+def main(argv=None, start_time=None):
+    for level in LEVEL_SCRIPTS:
+        load_level(level)
+
+    parser = argparse.ArgumentParser(prog="python -m restaurants", description="Run restaurant analysis tasks.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="list tasks and intermediates with their requirements")
+    run_parser = commands.add_parser("run", help="run tasks, levels or 'all' with only their dependencies")
+    run_parser.add_argument("targets", nargs="+", help="task names (level2.task4), levels (level1) or 'all'")
+    add_run_arguments(run_parser)
+    for add_arguments in LEVEL_ARGUMENTS.values():
+        add_arguments(run_parser)
+    options = parser.parse_args(argv)
+
+    if options.command == "list":
+        for name, node in NODES.items():
+            kind = "task" if node.is_task else "intermediate"
+            requires = ", ".join(node.requires) or "-"
+            print(f"{name:<28} {kind:<13} requires: {requires}")
+        return
+
+    try:
+        names = select(options.targets)
+    except KeyError as e:
+        parser.error(e.args[0])
+    execute_or_exit(names, options, options.dataset, start_time)
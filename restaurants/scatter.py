@@ -0,0 +1,116 @@
+# Scalable scatter charts with a linear fit (Level 3, votes vs. rating).
+
+# sns.scatterplot draws one marker per row and sns.regplot bootstraps its
+# confidence band by refitting the line on 1000 resamples of every row, so both
+# slow down linearly with the data and the scatter turns into a solid blob. Here
+# a ScatterSummary is computed from the arrays once, and the chart only draws
+# that summary, so rendering time does not depend on the number of rows:
+#
+# - the regression line and its 95% confidence band come from closed-form
+#   least squares (the band of the mean response, which regplot estimates
+#   by bootstrapping)
+# - points:  every row is drawn, only sensible for small inputs
+# - density: a 2D histogram of all rows, overlaid with a sample of points
+#            stratified by the y value so rare values stay visible
+# - auto:    points, then density once the rows exceed the point budget
+
+import numpy as np
+
+from restaurants.distribution import value_edges
+
+SCATTER_MODES = ('auto', 'points', 'density')
+
+# Largest input drawn point by point in 'auto' mode
+DEFAULT_MAX_POINTS = 20_000
+
+# Points sampled over the density histogram
+SAMPLE_POINTS = 2_000
+
+# Bins along the x axis of the density histogram
+DEFAULT_X_BINS = 200
+
+# Most bins along the y axis; discrete values such as ratings get one bin each if they fit
+DEFAULT_Y_BINS = 100
+
+# Points at which the fitted line and its band are evaluated
+LINE_POINTS = 100
+
+
+class LinearFit:
+    """Least-squares line y = intercept + slope * x, with a confidence band of the mean response."""
+
+    def __init__(self, x, y, confidence=0.95):
+        from scipy import stats
+
+        self.rows = len(x)
+        x_mean, y_mean = x.mean(), y.mean()
+        dx, dy = x - x_mean, y - y_mean
+        sxx, sxy = np.dot(dx, dx), np.dot(dx, dy)
+        self.slope = sxy / sxx if sxx else 0.0
+        self.intercept = y_mean - self.slope * x_mean
+        residuals = dy - self.slope * dx
+        degrees = max(self.rows - 2, 1)
+        scale = np.sqrt(np.dot(residuals, residuals) / degrees)
+        self.x = np.linspace(x.min(), x.max(), LINE_POINTS)
+        self.y = self.intercept + self.slope * self.x
+        spread = scale * np.sqrt(1 / self.rows + ((self.x - x_mean) ** 2 / sxx if sxx else 0.0))
+        self.margin = stats.t.ppf((1 + confidence) / 2, degrees) * spread
+
+
+def stratified_sample(frame, column, max_points, seed=0):
+    """Sample at most `max_points` rows, with every distinct value of `column` represented."""
+    if len(frame) <= max_points:
+        return frame
+    rng = np.random.default_rng(seed)
+    strata = frame.groupby(column, sort=True, observed=True).indices
+    # Each stratum gets its share of the budget, and at least a few rows if it has them
+    floor = max(1, max_points // (10 * len(strata)))
+    picked = []
+    for rows in strata.values():
+        size = min(len(rows), max(floor, round(max_points * len(rows) / len(frame))))
+        picked.append(rng.choice(rows, size=size, replace=False))
+    return frame.iloc[np.sort(np.concatenate(picked))]
+
+
+class ScatterSummary:
+    """Everything a votes-vs-rating style chart draws, independent of the number of rows."""
+
+    def __init__(self, frame, x, y, mode='auto', max_points=DEFAULT_MAX_POINTS):
+        if mode not in SCATTER_MODES:
+            raise ValueError(f"Unknown scatter mode {mode!r}; expected one of {', '.join(SCATTER_MODES)}.")
+        frame = frame[[x, y]].dropna()
+        self.x, self.y = x, y
+        self.rows = len(frame)
+        self.mode = mode if mode != 'auto' else ('points' if self.rows <= max_points else 'density')
+        x_values = frame[x].to_numpy(dtype=np.float64)
+        y_values = frame[y].to_numpy(dtype=np.float64)
+        self.fit = LinearFit(x_values, y_values)
+        self.histogram = None
+        if self.mode == 'density':
+            self.x_edges = np.histogram_bin_edges(x_values, bins=DEFAULT_X_BINS)
+            self.y_edges = value_edges(y_values, DEFAULT_Y_BINS)
+            self.histogram, _, _ = np.histogram2d(x_values, y_values, bins=[self.x_edges, self.y_edges])
+            self.points = stratified_sample(frame, y, min(SAMPLE_POINTS, max_points))
+        else:
+            self.points = frame
+
+
+def draw_scatter_summary(summary, alpha=None, color='red'):
+    """Draw a ScatterSummary on the current axes: density or points, then the line and its band."""
+    # Plotting libraries are only imported when charts are rendered
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    from matplotlib.colors import LogNorm
+
+    if summary.mode == 'density':
+        counts = np.ma.masked_equal(summary.histogram.T, 0)
+        # The bins are equal-width, so the histogram is drawn as one image rather than a mesh of cells
+        extent = (summary.x_edges[0], summary.x_edges[-1], summary.y_edges[0], summary.y_edges[-1])
+        image = plt.imshow(counts, extent=extent, origin='lower', aspect='auto', interpolation='nearest', norm=LogNorm(), cmap='Blues')
+        plt.colorbar(image, label="Restaurants")
+        sns.scatterplot(x=summary.x, y=summary.y, data=summary.points, s=6, color='black', alpha=0.3, linewidth=0,
+                        label=f"{len(summary.points):,} of {summary.rows:,} restaurants (stratified sample)")
+    else:
+        sns.scatterplot(x=summary.x, y=summary.y, data=summary.points, alpha=alpha)
+    plt.plot(summary.fit.x, summary.fit.y, color=color)
+    plt.fill_between(summary.fit.x, summary.fit.y - summary.fit.margin, summary.fit.y + summary.fit.margin, color=color, alpha=0.15, linewidth=0)
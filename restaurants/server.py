@@ -0,0 +1,440 @@
+# Local HTTP/JSON query server over the preloaded dataset.
+
+# Asking a new question of the data ("top cuisines in Noida", "delivery share
+# for price range 3") otherwise means editing a level script and rerunning it,
+# which starts Python and loads the CSV again. The server loads the dataset
+# once, builds the bitmap index (restaurants/bitmaps.py), the cuisine matrix
+# (restaurants/cuisines.py) and the chain of every restaurant name
+# (restaurants/chains.py), and answers the analyses of Levels 1-3 as GET
+# endpoints filtered by city, country code, price range and cuisine.
+#
+# Requests are served by asyncio. Analyses run in a small thread pool, so a
+# slow query does not hold up the others, and identical requests that arrive
+# while one is being computed wait for that result. Encoded responses are kept
+# in an LRU cache bounded by their total size in bytes (--cache-mb).
+#
+# Usage:
+#   python -m restaurants.server --port 8000
+#   curl 'http://127.0.0.1:8000/cuisines?city=New%20Delhi&top=5'
+#   curl 'http://127.0.0.1:8000/delivery?price_range=3'
+#   curl 'http://127.0.0.1:8000/chains?country=1&top=10'
+
+import argparse
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+import json
+import math
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from restaurants.aggregation import Grouper
+from restaurants.bitmaps import BitmapIndex, UnknownValue, pack, unpack
+from restaurants.chains import DEFAULT_SIMILARITY, resolve_chains
+from restaurants.cuisines import CuisineMatrix
+from restaurants.distribution import Distribution
+from restaurants.loader import DATASET_PATH, load_dataset
+from restaurants.metrics import log, warn
+
+# Columns loaded by the server
+SERVER_COLUMNS = ['Restaurant Name', 'Country Code', 'City', 'Cuisines', 'Price range',
+                  'Has Online delivery', 'Has Table booking', 'Aggregate rating', 'Votes']
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8000
+DEFAULT_CACHE_MB = 64
+DEFAULT_WORKERS = 4
+
+# Rows returned by top-K endpoints unless ?top= says otherwise, and the most they return
+DEFAULT_TOP = 10
+MAX_TOP = 1000
+
+# Query parameters accepted by every analysis, narrowing it to matching restaurants
+FILTERS = ('city', 'country', 'price_range', 'cuisine')
+
+# Price range descriptions, as in Level 1 Task 3
+PRICE_RANGE_DESCRIPTIONS = {1: "Low cost ($)", 2: "Moderate cost ($$)", 3: "High cost ($$$)", 4: "Very high cost ($$$$)"}
+
+
+class ResultCache:
+    """Encoded responses by request; the least recently used are evicted once their total size exceeds `max_bytes`."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key):
+        body = self.entries.get(key)
+        if body is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return body
+
+    def put(self, key, body):
+        # A response larger than the whole cache would only evict everything else
+        if len(body) > self.max_bytes:
+            return
+        if key in self.entries:
+            self.bytes -= len(self.entries.pop(key))
+        self.entries[key] = body
+        self.bytes += len(body)
+        while self.bytes > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.bytes -= len(evicted)
+            self.evictions += 1
+
+    def stats(self):
+        return {'entries': len(self.entries), 'bytes': self.bytes, 'max_bytes': self.max_bytes,
+                'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+
+def jsonable(value):
+    """Convert numpy and pandas values to JSON types; NaN becomes null."""
+    if isinstance(value, dict):
+        return {str(key): jsonable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [jsonable(item) for item in value]
+    if isinstance(value, (np.bool_, bool)):
+        return bool(value)
+    if isinstance(value, (np.integer, int)):
+        return int(value)
+    if isinstance(value, np.float32):
+        # Ratings are float32: 4.9 rather than 4.900000095367432
+        value = float(str(value))
+    if isinstance(value, (np.floating, float)):
+        return None if math.isnan(value) else float(value)
+    if isinstance(value, pd.Interval):
+        return str(value)
+    return value
+
+
+def parse_query(text, allowed):
+    """Return the normalized parameters of a query string; unknown or malformed parameters raise ValueError."""
+    query = {}
+    for name, values in parse_qs(text, keep_blank_values=True).items():
+        if name not in allowed:
+            raise ValueError(f"Unknown parameter {name!r}; expected one of {', '.join(allowed)}.")
+        value = values[-1].strip()
+        if name == 'city':
+            query[name] = value
+        elif name == 'cuisine':
+            # Several cuisines, comma-separated or repeated, must all be served
+            query[name] = tuple(sorted({item.strip() for value in values for item in value.split(',') if item.strip()}))
+        else:
+            try:
+                number = int(value)
+            except ValueError:
+                raise ValueError(f"Parameter {name!r} must be an integer, not {value!r}.") from None
+            if name == 'top' and not 1 <= number <= MAX_TOP:
+                raise ValueError(f"Parameter 'top' must be between 1 and {MAX_TOP}.")
+            if name == 'min_restaurants' and number < 1:
+                raise ValueError("Parameter 'min_restaurants' must be at least 1.")
+            query[name] = number
+    return query
+
+
+class QueryData:
+    """The dataset and the structures built from it once, answering one analysis per endpoint."""
+
+    def __init__(self, frame, chain_similarity=DEFAULT_SIMILARITY):
+        self.frame = frame.reset_index(drop=True)
+        self.index = BitmapIndex(self.frame)
+        self.cuisines = CuisineMatrix(self.frame['Cuisines'])
+        self.ratings = self.frame['Aggregate rating'].to_numpy(dtype=np.float64)
+
+        # Level 1 leaves out 'Inner City' and restaurants without cuisines
+        self.level1_rows = pack(((self.frame['City'] != 'Inner City') & self.frame['Cuisines'].notna()).to_numpy())
+
+        # The chain of every restaurant, as a categorical column next to the others
+        names = self.frame['Restaurant Name']
+        counts = Grouper({'name': names}).observed(['name'])
+        chains = resolve_chains(counts, similarity=chain_similarity)['chain']
+        self.chains = names.map(chains).astype('category')
+
+    def rows(self, query, level1=False):
+        """Boolean mask of the restaurants matching the query's filters."""
+        filters = {}
+        for parameter, column in (('city', 'City'), ('country', 'Country Code'), ('price_range', 'Price range')):
+            if parameter in query:
+                filters[column] = self.index.parse(column, str(query[parameter]))
+        mask = unpack(self.index.select(filters, where=self.level1_rows if level1 else None), self.index.rows)
+        if query.get('cuisine'):
+            mask &= self.cuisines.mask(*query['cuisine'])
+        return mask
+
+    def cuisines_endpoint(self, query):
+        """Level 1 Task 1 and Level 2 Task 2: the most common cuisine combinations and individual cuisines."""
+        rows = self.rows(query, level1=True)
+        total, top = int(rows.sum()), query.get('top', DEFAULT_TOP)
+        combinations = Grouper(self.frame, rows=rows).counts(['Cuisines']).sort_index().sort_values(ascending=False, kind='stable')
+        individual = self.cuisines.counts(weights=rows)
+        individual = individual[individual > 0]
+        ratings = self.cuisines.means(np.where(rows, self.ratings, np.nan))
+        return {
+            'restaurants': total,
+            'top_combinations': [{'cuisines': name, 'restaurants': count, 'percentage': count / total * 100}
+                                 for name, count in combinations[:top].items()],
+            'top_cuisines': [{'cuisine': name, 'restaurants': count, 'percentage': count / total * 100, 'average_rating': ratings[name]}
+                             for name, count in individual[:top].items()],
+        }
+
+    def cities_endpoint(self, query):
+        """Level 1 Task 2: cities with the most restaurants and with the highest average rating."""
+        rows = self.rows(query, level1=True)
+        top = query.get('top', DEFAULT_TOP)
+        grouped = Grouper(self.frame, rows=rows)
+        counts = grouped.counts(['City']).sort_index().sort_values(ascending=False, kind='stable')
+        ratings = grouped.means(['City'], 'Aggregate rating').sort_index().sort_values(ascending=False, kind='stable')
+        return {
+            'restaurants': int(rows.sum()),
+            'most_restaurants': [{'city': city, 'restaurants': count} for city, count in counts[:top].items()],
+            'highest_average_rating': [{'city': city, 'average_rating': rating, 'restaurants': counts[city]} for city, rating in ratings[:top].items()],
+        }
+
+    def price_ranges_endpoint(self, query):
+        """Level 1 Task 3: restaurants per price range."""
+        rows = self.rows(query, level1=True)
+        total = int(rows.sum())
+        counts = self.index.counts(['Price range'], where=rows).sort_index().sort_values(ascending=False, kind='stable')
+        return {
+            'restaurants': total,
+            'price_ranges': [{'price_range': price, 'description': PRICE_RANGE_DESCRIPTIONS.get(price, f"Price Range {price}"),
+                              'restaurants': count, 'percentage': count / total * 100} for price, count in counts.items()],
+        }
+
+    def delivery_endpoint(self, query):
+        """Level 1 Task 4: share of restaurants with online delivery and their average ratings."""
+        rows = self.rows(query, level1=True)
+        total = int(rows.sum())
+        counts = self.index.counts(['Has Online delivery'], where=rows, observed=False)
+        ratings = Grouper(self.frame, rows=rows).means(['Has Online delivery'], 'Aggregate rating', observed=False)
+        return {
+            'restaurants': total,
+            'online_delivery': {('yes' if status else 'no'): {'restaurants': counts[status], 'percentage': counts[status] / total * 100 if total else None,
+                                                               'average_rating': ratings[status]} for status in (False, True)},
+        }
+
+    def services_endpoint(self, query):
+        """Level 3 Task 3: share (%) of restaurants with online delivery and table booking per price range."""
+        rows = self.rows(query)
+        result = {'restaurants': int(rows.sum())}
+        for service, key in (('Has Online delivery', 'online_delivery'), ('Has Table booking', 'table_booking')):
+            table = self.index.crosstab('Price range', service, where=rows)
+            shares = table.div(table.sum(axis=1), axis=0) * 100
+            result[key] = [{'price_range': price, 'restaurants': table.loc[price].sum(), 'percentage': shares.loc[price].get(True, 0.0)}
+                           for price in table.index]
+        return result
+
+    def ratings_endpoint(self, query):
+        """Level 2 Task 1: rating statistics, the most common rating range and average votes per range."""
+        rows = self.rows(query)
+        by_rating = Grouper(self.frame, rows=rows).totals(['Aggregate rating'], ['Votes'])
+        ratings = Distribution(by_rating.index.to_numpy(), by_rating['rows'], name='Aggregate rating')
+        by_range = by_rating.groupby(pd.cut(by_rating.index, bins=[0, 1, 2, 3, 4, 5]), observed=False).sum()
+        return {
+            'restaurants': int(rows.sum()),
+            # Six decimals, as the task prints them, rather than the float32 ratings' binary expansions
+            'statistics': ratings.describe().round(6).to_dict(),
+            'most_common_range': by_range['rows'].idxmax() if by_range['rows'].any() else None,
+            'ranges': [{'range': rating_range, 'restaurants': row['rows'],
+                        'average_votes': row['Votes sum'] / row['Votes count'] if row['Votes count'] else None}
+                       for rating_range, row in by_range.iterrows()],
+        }
+
+    def chains_endpoint(self, query):
+        """Level 2 Task 4: chains with their restaurants, average rating and average votes."""
+        rows = self.rows(query)
+        top, minimum = query.get('top', DEFAULT_TOP), query.get('min_restaurants', 2)
+        totals = Grouper({'chain': self.chains, 'Aggregate rating': self.frame['Aggregate rating'], 'Votes': self.frame['Votes']},
+                         rows=rows).totals(['chain'], ['Aggregate rating', 'Votes'])
+        chains = totals[totals['rows'] >= minimum].sort_index().sort_values('rows', ascending=False, kind='stable')
+        top_chains = chains[:top]
+        ratings = top_chains['Aggregate rating sum'] / top_chains['Aggregate rating count']
+        votes = top_chains['Votes sum'] / top_chains['Votes count']
+        return {
+            'restaurants': int(rows.sum()),
+            'chains': len(chains),
+            'top_chains': [{'chain': chain, 'restaurants': count, 'average_rating': rating, 'average_votes': average_votes}
+                           for chain, count, rating, average_votes in zip(top_chains.index, top_chains['rows'], ratings, votes)],
+        }
+
+    def votes_endpoint(self, query):
+        """Level 3 Task 2: the most and least voted restaurants and the votes-rating correlation."""
+        rows = self.rows(query)
+        selected = self.frame.loc[rows, ['Restaurant Name', 'Votes', 'Aggregate rating']]
+        if selected.empty:
+            return {'restaurants': 0, 'highest_votes': None, 'lowest_votes': None, 'correlation': None}
+
+        def restaurant(row):
+            return {'name': row['Restaurant Name'], 'votes': row['Votes'], 'rating': row['Aggregate rating']}
+
+        return {
+            'restaurants': len(selected),
+            'highest_votes': restaurant(selected.loc[selected['Votes'].idxmax()]),
+            'lowest_votes': restaurant(selected.loc[selected['Votes'].idxmin()]),
+            'correlation': selected['Votes'].corr(selected['Aggregate rating']),
+        }
+
+
+# Path -> (QueryData method, extra parameters beyond FILTERS)
+ENDPOINTS = {
+    '/cuisines': ('cuisines_endpoint', ('top',)),
+    '/cities': ('cities_endpoint', ('top',)),
+    '/price-ranges': ('price_ranges_endpoint', ()),
+    '/delivery': ('delivery_endpoint', ()),
+    '/services': ('services_endpoint', ()),
+    '/ratings': ('ratings_endpoint', ()),
+    '/chains': ('chains_endpoint', ('top', 'min_restaurants')),
+    '/votes': ('votes_endpoint', ()),
+}
+
+
+class QueryServer:
+    """Serves QueryData over HTTP/1.1 with keep-alive, caching encoded responses."""
+
+    def __init__(self, data, cache_bytes=DEFAULT_CACHE_MB * 2**20, workers=DEFAULT_WORKERS):
+        self.data = data
+        self.cache = ResultCache(cache_bytes)
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.pending = {}
+        self.started = time.time()
+        self.requests = 0
+
+    def describe(self):
+        return {'endpoints': {path: {'description': getattr(QueryData, method).__doc__, 'parameters': list(FILTERS + extra)}
+                              for path, (method, extra) in ENDPOINTS.items()},
+                'other': ['/', '/stats']}
+
+    def stats(self):
+        return {'restaurants': self.data.index.rows, 'requests': self.requests, 'uptime_seconds': time.time() - self.started,
+                'cache': self.cache.stats()}
+
+    async def respond(self, method, target):
+        """Return (status, encoded body, cache status) for a request."""
+        if method not in ('GET', 'HEAD'):
+            return HTTPStatus.METHOD_NOT_ALLOWED, encode({'error': f"Method {method} is not allowed."}), None
+        url = urlsplit(target)
+        path = url.path.rstrip('/') or '/'
+        if path == '/':
+            return HTTPStatus.OK, encode(self.describe()), None
+        if path == '/stats':
+            return HTTPStatus.OK, encode(self.stats()), None
+        if path not in ENDPOINTS:
+            return HTTPStatus.NOT_FOUND, encode({'error': f"Unknown endpoint {path!r}; see / for the list."}), None
+        name, extra = ENDPOINTS[path]
+        try:
+            query = parse_query(url.query, FILTERS + extra)
+        except ValueError as e:
+            return HTTPStatus.BAD_REQUEST, encode({'error': str(e)}), None
+
+        # Equivalent queries (reordered or repeated parameters) share one entry
+        key = (path, tuple(sorted(query.items())))
+        body = self.cache.get(key)
+        if body is not None:
+            return HTTPStatus.OK, body, 'hit'
+        future = self.pending.get(key)
+        if future is None:
+            future = self.pending[key] = asyncio.get_running_loop().run_in_executor(self.executor, self.compute, name, query)
+            future.add_done_callback(lambda _: self.pending.pop(key, None))
+        status, body, cacheable = await asyncio.shield(future)
+        if cacheable:
+            self.cache.put(key, body)
+        return status, body, 'miss'
+
+    def compute(self, name, query):
+        """Run one analysis in a worker thread; return (status, encoded body, whether to cache it)."""
+        try:
+            return HTTPStatus.OK, encode(getattr(self.data, name)(query)), True
+        except UnknownValue as e:
+            # Filters naming a value that does not occur, such as an unknown city; any other
+            # KeyError is a bug and is answered below as an uncached server error
+            return HTTPStatus.BAD_REQUEST, encode({'error': e.args[0] if e.args else str(e)}), True
+        except Exception as e:
+            warn(f"Error answering {name} {query}: {e}")
+            return HTTPStatus.INTERNAL_SERVER_ERROR, encode({'error': f"An unexpected error occurred: {e}"}), False
+
+    async def handle(self, reader, writer):
+        """Answer the requests of one connection until the client closes it or asks to."""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    method, target, version = line.decode('latin-1').split()
+                except ValueError:
+                    await self.send(writer, HTTPStatus.BAD_REQUEST, encode({'error': "Malformed request line."}), None, False, 'GET')
+                    break
+                headers = {}
+                while True:
+                    header = await reader.readline()
+                    if header in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = header.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                # Request bodies are not used; skip them so the next request starts where it should
+                if headers.get('content-length', '').isdigit():
+                    await reader.readexactly(int(headers['content-length']))
+
+                self.requests += 1
+                status, body, cache_status = await self.respond(method, target)
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                await self.send(writer, status, body, cache_status, keep_alive, method)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def send(writer, status, body, cache_status, keep_alive, method):
+        head = [f"HTTP/1.1 {status.value} {status.phrase}", "Content-Type: application/json",
+                f"Content-Length: {len(body)}", f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        if cache_status:
+            head.append(f"X-Cache: {cache_status}")
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode('latin-1') + (body if method != 'HEAD' else b''))
+        await writer.drain()
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        server = await asyncio.start_server(self.handle, host, port)
+        address = server.sockets[0].getsockname()
+        log(f"Serving {self.data.index.rows} restaurants on http://{address[0]}:{address[1]}/")
+        async with server:
+            await server.serve_forever()
+
+
+def encode(result):
+    return json.dumps(jsonable(result), separators=(',', ':')).encode('utf-8')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the Level 1-3 analyses as JSON over HTTP, with the dataset loaded once.")
+    parser.add_argument("--dataset", default=DATASET_PATH)
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--cache-mb", type=float, default=DEFAULT_CACHE_MB, help="size of the response cache in MiB")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="threads computing analyses")
+    parser.add_argument("--chain-similarity", type=float, default=DEFAULT_SIMILARITY, help="trigram similarity from which two restaurant names are the same chain")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    data = QueryData(load_dataset(SERVER_COLUMNS, path=args.dataset), chain_similarity=args.chain_similarity)
+    log(f"Loaded and indexed the dataset in {time.perf_counter() - started:.2f} s")
+    server = QueryServer(data, cache_bytes=int(args.cache_mb * 2**20), workers=args.workers)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# DataFrames in shared memory.
+
+# share_frame() copies each column of a DataFrame once into named
+# multiprocessing.shared_memory blocks and returns a small, picklable spec.
+# attach_frame() rebuilds the DataFrame in another process from that spec as
+# read-only NumPy views of the same memory, so worker processes never receive a
+# pickled copy of the data.
+#
+# Columns are laid out by kind:
+#   numeric and bool  one buffer of values
+#   category          one buffer of integer codes; the categories travel in the spec
+#   strings           integer codes as for category; the distinct strings travel in the spec
+# Anything else (rare extension dtypes) is pickled in the spec.
+
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+
+def create_block(array, segments):
+    """Copy `array` into a new shared memory block and return its descriptor."""
+    array = np.ascontiguousarray(array)
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+    segments.append(block)
+    return {'name': block.name, 'dtype': array.dtype.str, 'shape': array.shape}
+
+
+def attach_block(descriptor, segments):
+    """Return a read-only view of the shared memory block described by `descriptor`."""
+    block = shared_memory.SharedMemory(name=descriptor['name'])
+    segments.append(block)
+    array = np.ndarray(descriptor['shape'], dtype=np.dtype(descriptor['dtype']), buffer=block.buf)
+    array.flags.writeable = False
+    return array
+
+
+def share_column(column, segments):
+    """Describe one column, copying its data into shared memory."""
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return {'kind': 'category', 'codes': create_block(column.cat.codes.to_numpy(), segments),
+                'categories': column.cat.categories, 'ordered': column.cat.ordered}
+    if isinstance(column.dtype, np.dtype) and column.dtype.kind in 'biuf':
+        return {'kind': 'values', 'values': create_block(column.to_numpy(), segments)}
+    if column.dtype == object and pd.api.types.infer_dtype(column, skipna=True) in ('string', 'empty'):
+        # Missing values get code -1, which picks the trailing NaN when the column is rebuilt
+        codes, uniques = pd.factorize(column)
+        return {'kind': 'strings', 'codes': create_block(codes, segments),
+                'uniques': np.append(np.asarray(uniques, dtype=object), np.nan)}
+    return {'kind': 'pickled', 'values': column.to_numpy()}
+
+
+def attach_column(description, segments):
+    """Rebuild one column's values from its description."""
+    kind = description['kind']
+    if kind == 'category':
+        codes = attach_block(description['codes'], segments)
+        return pd.Categorical.from_codes(codes, categories=description['categories'], ordered=description['ordered'])
+    if kind == 'values':
+        return attach_block(description['values'], segments)
+    if kind == 'strings':
+        # One vectorised take; the strings themselves are shared by every row that repeats them
+        return description['uniques'][attach_block(description['codes'], segments)]
+    return description['values']
+
+
+def share_frame(frame):
+    """Copy `frame` into shared memory; return (spec, segments) for attach_frame() and release()."""
+    segments = []
+    try:
+        spec = {'columns': [(name, share_column(frame[name], segments)) for name in frame.columns],
+                'index': frame.index}
+    except BaseException:
+        release(segments, unlink=True)
+        raise
+    return spec, segments
+
+
+def attach_frame(spec):
+    """Rebuild a shared DataFrame; keep the returned segments open while it is in use."""
+    segments = []
+    columns = {name: attach_column(description, segments) for name, description in spec['columns']}
+    return pd.DataFrame(columns, index=spec['index'], copy=False), segments
+
+
+def release(segments, unlink=False):
+    """Close shared memory blocks, and free them when `unlink` is set (by their creator)."""
+    for block in segments:
+        block.close()
+        if unlink:
+            block.unlink()
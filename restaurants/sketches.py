@@ -0,0 +1,524 @@
+# Mergeable sketches for top-K, distinct counts and quantiles over unbounded inputs.
+
+# The top cuisines, cities and chains only need the few most frequent keys,
+# yet CountAccumulator keeps a counter for every distinct key, so memory grows
+# with the input. With --approximate these statistics come from fixed-size
+# sketches. Each one is updated from a chunk's exact per-key counts (one
+# factorize/bincount pass, restaurants/aggregation.py) and merged with others,
+# so any number of rows is processed in bounded memory:
+#
+# - Space-Saving keeps k = ceil(1 / epsilon) counters. Every key whose true
+#   count exceeds epsilon * rows is among them, and a counter overestimates
+#   its key's count by at most its recorded error <= epsilon * rows.
+#   Merging follows Agarwal et al., "Mergeable Summaries" (2012).
+# - Count-Min with width ceil(e / epsilon) and depth ceil(ln(1 / delta))
+#   estimates any key's count to within epsilon * rows with probability
+#   1 - delta. It tightens the Space-Saving estimates of the top keys.
+# - HyperLogLog with 2**p registers counts distinct keys with a relative
+#   standard error of 1.04 / sqrt(2**p); p is chosen from the requested error.
+# - A KLL quantile sketch (Karnin, Lang and Liberty, 2016) keeps about
+#   3.3 / error weighted values, so any quantile is the value at most
+#   `error` * rows ranks from the exact one. DistributionSketch uses it for
+#   describe(): the count, mean, std (merged with Chan et al.'s update), min
+#   and max are exact, and the quartiles stay exact while the column has at
+#   most DEFAULT_MAX_EXACT distinct values, as ratings do.
+#
+# Keys are hashed with pandas' fixed-key SipHash, so sketches built in other
+# processes or runs merge correctly. Sketches only grow, so --incremental,
+# which also retracts rows, keeps the exact accumulators.
+#
+# Usage:
+#   python -m restaurants.sketches --jobs 4
+#   python -m restaurants.sketches Votes --quantile-error 0.005 --exact
+
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import math
+import time
+
+import numpy as np
+import pandas as pd
+
+from restaurants.chains import mix
+from restaurants.distribution import DESCRIBE_PERCENTILES, Distribution, describe_series
+from restaurants.loader import DATASET_PATH, load_dataset
+from restaurants.streaming import DEFAULT_CHUNKSIZE, iter_chunks
+
+# Default relative error of heavy-hitter counts, as a fraction of all rows
+DEFAULT_EPSILON = 0.001
+
+# Default probability that a Count-Min estimate exceeds its error bound
+DEFAULT_DELTA = 0.01
+
+# Default relative standard error of distinct counts
+DEFAULT_DISTINCT_ERROR = 0.01
+
+# Default rank error of sketched quantiles, as a fraction of all values
+DEFAULT_QUANTILE_ERROR = 0.01
+
+# Distinct values up to which a column's quantiles are computed exactly
+DEFAULT_MAX_EXACT = 2048
+
+# A KLL sketch of capacity k has a rank error of about KLL_RANK_ERROR / k; capacities shrink by KLL_DECAY per level
+KLL_RANK_ERROR = 3.3
+KLL_DECAY = 2 / 3
+
+# Columns described by the command line
+DESCRIBED_COLUMNS = ['Aggregate rating', 'Votes', 'Average Cost for two']
+
+# Seed of the Count-Min hash functions and KLL compactions; Count-Min sketches merge only with the same seed
+SKETCH_SEED = 20240607
+
+
+def hash_keys(keys):
+    """Stable 64-bit hashes of keys, the same in every process and run."""
+    return pd.util.hash_array(np.asarray(keys, dtype=object))
+
+
+class SpaceSaving:
+    """At most `capacity` counters over the most frequent keys, with optional tracked sums of value columns.
+
+    `counts` overestimate the true counts by at most `errors`. The sums and
+    the rows with a value of each column only cover the rows seen while the
+    key was monitored; for a frequent key that is nearly all of them.
+    """
+
+    def __init__(self, capacity, values=()):
+        self.capacity = capacity
+        self.values = tuple(values)
+        self.keys = np.empty(0, dtype=object)
+        self.counts = np.empty(0, dtype=np.int64)
+        self.errors = np.empty(0, dtype=np.int64)
+        self.value_counts = {column: np.empty(0, dtype=np.int64) for column in self.values}
+        self.value_sums = {column: np.empty(0, dtype=np.float64) for column in self.values}
+        self.rows = 0
+
+    def floor(self):
+        """The count a key that is not monitored can have at most: the smallest counter of a full summary."""
+        return int(self.counts.min()) if len(self.keys) >= self.capacity else 0
+
+    def add(self, counts, sums=None):
+        """Add exact {key: rows} of a chunk, with {column: ({key: rows with a value}, {key: sum})} for the value columns."""
+        exact = SpaceSaving(max(len(counts), 1), self.values)
+        exact.keys = np.array(list(counts), dtype=object)
+        exact.counts = np.fromiter(counts.values(), dtype=np.int64, count=len(counts))
+        exact.errors = np.zeros(len(counts), dtype=np.int64)
+        for column in self.values:
+            value_counts, value_sums = (sums or {})[column]
+            exact.value_counts[column] = np.array([value_counts.get(key, 0) for key in exact.keys], dtype=np.int64)
+            exact.value_sums[column] = np.array([value_sums.get(key, 0) for key in exact.keys], dtype=np.float64)
+        exact.rows = int(exact.counts.sum())
+        return self.merge(exact)
+
+    def merge(self, other):
+        """Combine with another summary over the same value columns, keeping the largest counters."""
+        keys = np.concatenate([self.keys, other.keys])
+        codes, uniques = pd.factorize(keys)
+        mine, theirs = codes[:len(self.keys)], codes[len(self.keys):]
+
+        # A key missing from one summary may have up to that summary's floor there
+        counts = np.full(len(uniques), self.floor() + other.floor(), dtype=np.int64)
+        errors = counts.copy()
+        counts[mine] += self.counts - self.floor()
+        counts[theirs] += other.counts - other.floor()
+        errors[mine] += self.errors - self.floor()
+        errors[theirs] += other.errors - other.floor()
+        value_counts, value_sums = {}, {}
+        for column in self.values:
+            value_counts[column] = np.zeros(len(uniques), dtype=np.int64)
+            value_sums[column] = np.zeros(len(uniques), dtype=np.float64)
+            for positions, summary in ((mine, self), (theirs, other)):
+                value_counts[column][positions] += summary.value_counts[column]
+                value_sums[column][positions] += summary.value_sums[column]
+
+        # Keep the largest counters; equal counts are ordered by key hash, so the result does not depend on merge order
+        keys = np.asarray(uniques, dtype=object)
+        order = np.lexsort((hash_keys(keys), -counts))[:self.capacity]
+        self.keys, self.counts, self.errors = keys[order], counts[order], errors[order]
+        self.value_counts = {column: value_counts[column][order] for column in self.values}
+        self.value_sums = {column: value_sums[column][order] for column in self.values}
+        self.rows += other.rows
+        return self
+
+
+class CountMinSketch:
+    """Counts of all keys in a depth x width table; estimates never undercount."""
+
+    def __init__(self, epsilon=DEFAULT_EPSILON, delta=DEFAULT_DELTA, seed=SKETCH_SEED):
+        self.width = math.ceil(math.e / epsilon)
+        self.depth = math.ceil(math.log(1 / delta))
+        self.seed = seed
+        self.salts = np.random.default_rng(seed).integers(0, 2 ** 63, size=self.depth, dtype=np.uint64)
+        self.table = np.zeros((self.depth, self.width), dtype=np.int64)
+
+    def columns(self, hashes):
+        return [mix(hashes ^ salt) % np.uint64(self.width) for salt in self.salts]
+
+    def add(self, hashes, weights):
+        weights = np.asarray(weights, dtype=np.float64)
+        for row, columns in zip(self.table, self.columns(hashes)):
+            # Float sums of integer weights are exact below 2**53 per chunk
+            row += np.bincount(columns.astype(np.int64), weights=weights, minlength=self.width).astype(np.int64)
+        return self
+
+    def merge(self, other):
+        if (self.width, self.depth, self.seed) != (other.width, other.depth, other.seed):
+            raise ValueError("Count-Min sketches with different dimensions or seeds cannot be merged.")
+        self.table += other.table
+        return self
+
+    def estimate(self, hashes):
+        return np.min([row[columns.astype(np.int64)] for row, columns in zip(self.table, self.columns(hashes))], axis=0)
+
+
+class HeavyHitters:
+    """Approximate counts of the most frequent keys: Space-Saving candidates, tightened by Count-Min.
+
+    Has the interface of CountAccumulator that the tasks use (add, merge,
+    counts, total, to_series, regroup); every count is at most
+    `epsilon` * total() above the true one.
+    """
+
+    def __init__(self, epsilon=DEFAULT_EPSILON, delta=DEFAULT_DELTA, values=()):
+        self.epsilon = epsilon
+        self.summary = SpaceSaving(math.ceil(1 / epsilon), values)
+        self.sketch = CountMinSketch(epsilon, delta)
+
+    def add(self, counts, sums=None):
+        """Add exact {key: rows} of a chunk (and value sums, see SpaceSaving.add)."""
+        self.summary.add(counts, sums)
+        self.sketch.add(hash_keys(list(counts)), list(counts.values()))
+
+    def merge(self, other):
+        self.summary.merge(other.summary)
+        if self.sketch is not None and other.sketch is not None:
+            self.sketch.merge(other.sketch)
+        else:
+            self.sketch = None
+        return self
+
+    def estimates(self):
+        """Estimated counts of the monitored keys: the smaller of the two upper bounds."""
+        if self.sketch is None or not len(self.summary.keys):
+            return self.summary.counts
+        return np.minimum(self.summary.counts, self.sketch.estimate(hash_keys(self.summary.keys)))
+
+    @property
+    def counts(self):
+        """{key: estimated rows} of the monitored keys."""
+        return dict(zip(self.summary.keys.tolist(), self.estimates().tolist()))
+
+    def total(self):
+        """Exact number of rows added."""
+        return self.summary.rows
+
+    def error_bound(self):
+        """Largest amount by which any reported count can exceed the true count."""
+        return int(self.summary.errors.max()) if len(self.summary.errors) else 0
+
+    def to_series(self):
+        """Estimated counts sorted by frequency, ties broken by key."""
+        counts = self.counts
+        keys = sorted(counts)
+        series = pd.Series([counts[key] for key in keys], index=keys, dtype='int64')
+        return series.sort_values(ascending=False, kind='stable')
+
+    def guaranteed(self, k):
+        """Whether the first k keys of to_series() are certainly the k most frequent keys."""
+        estimates = self.to_series()
+        if len(estimates) <= k:
+            return self.summary.floor() == 0
+        lower = pd.Series(self.summary.counts - self.summary.errors, index=self.summary.keys)
+        # The k-th key's lowest possible count must exceed every other key's highest
+        return bool(lower[estimates.index[:k]].min() > max(estimates.iloc[k], self.summary.floor()))
+
+    def means(self, column):
+        """Mean of a value column per monitored key, over the rows seen while it was monitored."""
+        counts, sums = self.summary.value_counts[column], self.summary.value_sums[column]
+        present = counts > 0
+        keys = self.summary.keys[present]
+        series = pd.Series(sums[present] / counts[present], index=keys, dtype='float64')
+        return series.sort_index()
+
+    def regroup(self, mapping):
+        """Return a sketch with the counters of each key in `mapping` added to the key it maps to.
+
+        The combined counts are sums of estimates, so the result no longer
+        consults the Count-Min table.
+        """
+        keys = np.array([mapping.get(key, key) for key in self.summary.keys.tolist()], dtype=object)
+        codes, uniques = pd.factorize(keys)
+        regrouped = HeavyHitters.__new__(HeavyHitters)
+        regrouped.epsilon, regrouped.sketch = self.epsilon, None
+        summary = regrouped.summary = SpaceSaving(self.summary.capacity, self.summary.values)
+        summary.keys = np.asarray(uniques, dtype=object)
+        summary.counts = np.bincount(codes, weights=self.estimates(), minlength=len(uniques)).astype(np.int64)
+        summary.errors = np.bincount(codes, weights=self.summary.errors, minlength=len(uniques)).astype(np.int64)
+        for column in summary.values:
+            summary.value_counts[column] = np.bincount(codes, weights=self.summary.value_counts[column], minlength=len(uniques)).astype(np.int64)
+            summary.value_sums[column] = np.bincount(codes, weights=self.summary.value_sums[column], minlength=len(uniques))
+        summary.rows = self.summary.rows
+        return regrouped
+
+
+class TrackedMeans:
+    """Means of one value column per key of a HeavyHitters sketch, with the regroup() and to_series() of the mean accumulators."""
+
+    def __init__(self, sketch, column):
+        self.sketch = sketch
+        self.column = column
+
+    def regroup(self, mapping):
+        return TrackedMeans(self.sketch.regroup(mapping), self.column)
+
+    def to_series(self):
+        return self.sketch.means(self.column)
+
+
+class HyperLogLog:
+    """Approximate number of distinct keys, with relative standard error about `error`."""
+
+    def __init__(self, error=DEFAULT_DISTINCT_ERROR):
+        self.precision = min(max(math.ceil(math.log2((1.04 / error) ** 2)), 4), 18)
+        self.registers = np.zeros(1 << self.precision, dtype=np.uint8)
+
+    @property
+    def error(self):
+        """Relative standard error of estimate()."""
+        return 1.04 / math.sqrt(len(self.registers))
+
+    def add(self, keys):
+        """Add keys; repeated keys change nothing, so a chunk's distinct keys are enough."""
+        hashes = hash_keys(keys)
+        if not len(hashes):
+            return self
+        precision = np.uint64(self.precision)
+        registers = (hashes >> np.uint64(64 - self.precision)).astype(np.int64)
+        # The register value is the position of the first set bit after the register bits
+        rest = hashes << precision
+        length = np.zeros(len(rest), dtype=np.int64)
+        for shift in (32, 16, 8, 4, 2, 1):
+            above = rest >= (np.uint64(1) << np.uint64(shift))
+            length += np.where(above, shift, 0)
+            rest = np.where(above, rest >> np.uint64(shift), rest)
+        length += (rest > 0)
+        ranks = np.minimum(64 - length + 1, 64 - self.precision + 1).astype(np.uint8)
+        np.maximum.at(self.registers, registers, ranks)
+        return self
+
+    def merge(self, other):
+        if self.precision != other.precision:
+            raise ValueError("HyperLogLog sketches with different precisions cannot be merged.")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        empty = int(np.count_nonzero(self.registers == 0))
+        # Linear counting is more accurate while many registers are still empty
+        if raw <= 2.5 * m and empty:
+            return m * math.log(m / empty)
+        return float(raw)
+
+
+class QuantileSketch:
+    """KLL sketch of numeric values: quantiles within about `error` x count ranks of the true ones.
+
+    Level h holds items that each stand for 2**h values. A level that
+    outgrows its capacity is sorted and every other item, from a random
+    first one, is promoted to the next level, so the total weight stays
+    exactly the number of values added.
+    """
+
+    def __init__(self, error=DEFAULT_QUANTILE_ERROR, seed=SKETCH_SEED):
+        self.k = max(math.ceil(KLL_RANK_ERROR / error), 8)
+        self.levels = [np.empty(0, dtype=np.float64)]
+        self.rng = np.random.default_rng(seed)
+        self.count = 0
+
+    @property
+    def error(self):
+        """Rank error of quantile(), as a fraction of count, not exceeded in 99% of runs."""
+        return KLL_RANK_ERROR / self.k
+
+    def capacity(self, level):
+        # Capacities shrink geometrically below the top level, which bounds the items kept to about 3k
+        return max(math.ceil(self.k * KLL_DECAY ** (len(self.levels) - level - 1)), 2)
+
+    def add(self, values, counts=None):
+        """Add values (missing values are ignored), each `counts` times when given."""
+        values = np.asarray(values, dtype=np.float64)
+        if counts is None:
+            values = values[~np.isnan(values)]
+            self.levels[0] = np.concatenate([self.levels[0], values])
+            self.count += len(values)
+        else:
+            # A value counted c times goes to level h for every set bit h of c, which keeps its weight exact
+            counts = np.asarray(counts, dtype=np.int64)
+            for level in range(int(counts.max()).bit_length() if len(counts) else 0):
+                self.push(level, values[(counts >> level) & 1 == 1])
+            self.count += int(counts.sum())
+        self.compress()
+        return self
+
+    def merge(self, other):
+        for level, items in enumerate(other.levels):
+            self.push(level, items)
+        self.count += other.count
+        self.compress()
+        return self
+
+    def push(self, level, items):
+        while len(self.levels) <= level:
+            self.levels.append(np.empty(0, dtype=np.float64))
+        self.levels[level] = np.concatenate([self.levels[level], items])
+
+    def compress(self):
+        # Growing the top level lowers the capacities below it, so repeat until every level fits
+        while any(len(items) > self.capacity(level) for level, items in enumerate(self.levels)):
+            for level in range(len(self.levels)):
+                items = self.levels[level]
+                if len(items) <= self.capacity(level):
+                    continue
+                items = np.sort(items)
+                # An odd item out stays on this level
+                odd = len(items) % 2
+                self.levels[level] = items[:odd]
+                self.push(level + 1, items[odd + int(self.rng.integers(2))::2])
+
+    def distribution(self, dtype=np.float64, name=None):
+        """The kept items with their weights, as a Distribution whose quantiles are those of the sketch."""
+        values = np.concatenate(self.levels).astype(dtype)
+        weights = np.concatenate([np.full(len(items), 1 << level, dtype=np.int64) for level, items in enumerate(self.levels)])
+        return Distribution(values, weights, name=name)
+
+
+class DistributionSketch:
+    """Mergeable describe() statistics of a numeric column.
+
+    The count, mean, std, min and max are exact (the mean and std up to
+    floating-point rounding). The quartiles are exact while the column has at
+    most `max_exact` distinct values and come from a QuantileSketch after
+    that, within rank_error() x count ranks.
+    """
+
+    def __init__(self, error=DEFAULT_QUANTILE_ERROR, max_exact=DEFAULT_MAX_EXACT, name=None):
+        self.error = error
+        self.max_exact = max_exact
+        self.name = name
+        self.dtype = None
+        self.exact = Counter()
+        self.sketch = None
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def add(self, values):
+        """Add a chunk of the column; missing values are ignored."""
+        values = np.asarray(values)
+        if self.dtype is None:
+            self.dtype = values.dtype
+        values = values[~pd.isna(values)]
+        if not len(values):
+            return self
+        wide = values.astype(np.float64)
+        chunk = DistributionSketch(self.error, self.max_exact)
+        chunk.count, chunk.mean = len(values), float(wide.mean())
+        chunk.m2 = float(np.dot(wide - chunk.mean, wide - chunk.mean))
+        chunk.min, chunk.max = float(wide.min()), float(wide.max())
+        distinct, counts = np.unique(values, return_counts=True)
+        chunk.exact = Counter(dict(zip(distinct.tolist(), counts.tolist())))
+        chunk.dtype = self.dtype
+        return self.merge(chunk)
+
+    def merge(self, other):
+        if self.dtype is None:
+            self.dtype = other.dtype
+        # Chan et al.'s pairwise update of the mean and the sum of squared deviations
+        count = self.count + other.count
+        if count:
+            delta = other.mean - self.mean
+            self.m2 += other.m2 + delta * delta * self.count * other.count / count
+            self.mean += delta * other.count / count
+        self.count = count
+        self.min, self.max = min(self.min, other.min), max(self.max, other.max)
+
+        if self.sketch is None and other.sketch is None:
+            self.exact.update(other.exact)
+            if len(self.exact) > self.max_exact:
+                self.sketch = QuantileSketch(self.error).add(list(self.exact), list(self.exact.values()))
+                self.exact = None
+        else:
+            if self.sketch is None:
+                self.sketch = QuantileSketch(self.error).add(list(self.exact), list(self.exact.values()))
+                self.exact = None
+            if other.sketch is None:
+                self.sketch.add(list(other.exact), list(other.exact.values()))
+            else:
+                self.sketch.merge(other.sketch)
+        return self
+
+    def rank_error(self):
+        """Largest rank error of the quartiles, as a fraction of count (0 while they are exact)."""
+        return 0.0 if self.sketch is None else self.sketch.error
+
+    def distribution(self):
+        """A Distribution of the exact value counts, or of the sketch's weighted items."""
+        if self.sketch is None:
+            return Distribution.from_counts(self.exact, dtype=self.dtype, name=self.name)
+        return self.sketch.distribution(self.dtype, self.name)
+
+    def describe(self):
+        """The Series.describe() of the column: identical while exact, else with sketched quartiles."""
+        if self.sketch is None:
+            return self.distribution().describe()
+        if not self.count:
+            return describe_series(0, name=self.name)
+        distribution = self.distribution()
+        quantiles = [distribution.quantile(q) for q in DESCRIBE_PERCENTILES]
+        variance = self.m2 / (self.count - 1) if self.count > 1 else np.nan
+        return describe_series(self.count, self.mean, variance, self.min, quantiles, self.max, self.dtype, self.name)
+
+
+def describe_chunk(chunk, error=DEFAULT_QUANTILE_ERROR):
+    """Return {column: DistributionSketch} of one chunk, to be merged with those of other chunks."""
+    sketches = {}
+    for column in chunk.columns:
+        sketches[column] = DistributionSketch(error, name=column).add(chunk[column])
+    return sketches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Describe numeric columns from quantile sketches merged across worker processes.")
+    parser.add_argument("columns", nargs='*', default=DESCRIBED_COLUMNS, help=f"numeric columns (default: {', '.join(DESCRIBED_COLUMNS)})")
+    parser.add_argument("--quantile-error", type=float, default=DEFAULT_QUANTILE_ERROR, help="rank error of the sketched quartiles")
+    parser.add_argument("--jobs", type=int, default=1, help="worker processes summarizing chunks")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--exact", action="store_true", help="also load the columns and print pandas' describe() for comparison")
+    parser.add_argument("--dataset", default=DATASET_PATH)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    merged = {column: DistributionSketch(args.quantile_error, name=column) for column in args.columns}
+    chunks = iter_chunks(args.columns, path=args.dataset, chunksize=args.chunksize)
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        for sketches in executor.map(partial(describe_chunk, error=args.quantile_error), chunks):
+            for column, sketch in sketches.items():
+                merged[column].merge(sketch)
+    print(f"Summarized in {time.perf_counter() - started:.2f} s")
+
+    for column, sketch in merged.items():
+        print(f"\n{sketch.describe().to_string()}")
+        print(f"quartile rank error: {sketch.rank_error():.2%}")
+        if args.exact:
+            print(f"exact:\n{load_dataset([column], path=args.dataset)[column].describe().to_string()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# In-memory spatial index over restaurant coordinates.
+
+# Questions such as "how many restaurants, and at what average rating, lie
+# within 1 km of this point" otherwise need a full scan of the Latitude and
+# Longitude columns per question. The index is a haversine BallTree built once
+# from the loaded frame; radius and k-nearest queries are answered in batches
+# and return row IDs (the frame's index labels) together with aggregates of the
+# indexed value columns. An index can be saved to disk and loaded again without
+# rebuilding the tree.
+#
+# Usage:
+#   python -m restaurants.spatial 28.6315 77.2167 --radius-km 1
+#   python -m restaurants.spatial 28.6315 77.2167 --k 5 --index restaurants.idx
+
+import argparse
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from restaurants.clustering import EARTH_RADIUS_KM
+from restaurants.loader import DATASET_PATH, load_dataset
+
+# Columns summarised for the restaurants returned by a query
+DEFAULT_VALUE_COLUMNS = ['Aggregate rating', 'Votes']
+
+
+class SpatialIndex:
+    """Haversine BallTree over restaurant coordinates with per-row values."""
+
+    def __init__(self, frame, value_columns=DEFAULT_VALUE_COLUMNS, leaf_size=40):
+        from sklearn.neighbors import BallTree
+
+        located = frame.dropna(subset=['Latitude', 'Longitude'])
+        self.row_ids = located.index.to_numpy()
+        self.value_columns = list(value_columns)
+        self.values = located[self.value_columns].to_numpy(dtype=np.float64)
+        coordinates = np.radians(located[['Latitude', 'Longitude']].to_numpy(dtype=np.float64))
+        self.tree = BallTree(coordinates, leaf_size=leaf_size, metric='haversine')
+
+    def __len__(self):
+        return len(self.row_ids)
+
+    @staticmethod
+    def points(latitudes, longitudes):
+        """Return query points as an (n, 2) array of radians."""
+        return np.radians(np.column_stack([np.atleast_1d(latitudes), np.atleast_1d(longitudes)]).astype(np.float64))
+
+    def radius(self, latitudes, longitudes, radius_km):
+        """Return, for each query point, the row IDs within `radius_km`, nearest first."""
+        positions, _ = self.tree.query_radius(self.points(latitudes, longitudes), r=radius_km / EARTH_RADIUS_KM,
+                                              return_distance=True, sort_results=True)
+        return [self.row_ids[rows] for rows in positions]
+
+    def nearest(self, latitudes, longitudes, k=5):
+        """Return (row IDs, distances in km) of the `k` nearest restaurants to each query point."""
+        distances, positions = self.tree.query(self.points(latitudes, longitudes), k=min(k, len(self)))
+        return self.row_ids[positions], distances * EARTH_RADIUS_KM
+
+    def radius_summary(self, latitudes, longitudes, radius_km):
+        """Return one row per query point with the count and mean values of restaurants within `radius_km`."""
+        positions = self.tree.query_radius(self.points(latitudes, longitudes), r=radius_km / EARTH_RADIUS_KM)
+        counts = np.fromiter((len(rows) for rows in positions), dtype=np.int64, count=len(positions))
+        summary = pd.DataFrame({'restaurants': counts})
+        if counts.sum():
+            # Sum the values of all matches at once, then split the sums per query
+            flat = np.concatenate(positions)
+            owners = np.repeat(np.arange(len(positions)), counts)
+            for column, values in zip(self.value_columns, self.values.T):
+                sums = np.bincount(owners, weights=values[flat], minlength=len(positions))
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    summary[f'mean {column}'] = sums / counts
+        else:
+            for column in self.value_columns:
+                summary[f'mean {column}'] = np.nan
+        return summary
+
+    def save(self, path):
+        """Write the index, including the built tree, to `path`."""
+        with open(path, "wb") as handle:
+            pickle.dump(self, handle, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(path):
+        """Read an index written by save()."""
+        with open(path, "rb") as handle:
+            return pickle.load(handle)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Radius and nearest-neighbour queries over restaurant locations.")
+    parser.add_argument("latitude", type=float)
+    parser.add_argument("longitude", type=float)
+    parser.add_argument("--radius-km", type=float, default=1.0, help="summarise restaurants within this distance")
+    parser.add_argument("--k", type=int, default=0, help="also list the k nearest restaurants")
+    parser.add_argument("--index", help="load the index from this file, building and saving it first if it does not exist")
+    parser.add_argument("--dataset", default=DATASET_PATH)
+    args = parser.parse_args(argv)
+
+    frame = None
+    if args.index and os.path.exists(args.index):
+        index = SpatialIndex.load(args.index)
+    else:
+        frame = load_dataset(['Restaurant Name', 'Latitude', 'Longitude'] + DEFAULT_VALUE_COLUMNS, path=args.dataset)
+        index = SpatialIndex(frame)
+        if args.index:
+            index.save(args.index)
+
+    summary = index.radius_summary(args.latitude, args.longitude, args.radius_km).iloc[0]
+    print(f"Restaurants within {args.radius_km} km: {int(summary['restaurants'])}")
+    for column in index.value_columns:
+        print(f"Average {column}: {summary[f'mean {column}']:.2f}")
+
+    if args.k:
+        if frame is None:
+            frame = load_dataset(['Restaurant Name'], path=args.dataset)
+        row_ids, distances = index.nearest(args.latitude, args.longitude, k=args.k)
+        print(f"\nNearest {len(row_ids[0])} restaurants:")
+        for row_id, distance in zip(row_ids[0], distances[0]):
+            print(f"{frame.at[row_id, 'Restaurant Name']}: {distance:.2f} km")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+# English stop words without a network download.
+
+# Level 3 used to call nltk.download() on every run, which costs seconds and
+# fails on machines without network access. NLTK's stop word corpus is used
+# when it is already installed locally; otherwise the copy bundled below (the
+# English list shipped with NLTK) is used. Nothing is downloaded.
+
+# NLTK's English stop word list
+ENGLISH_STOP_WORDS = frozenset("""
+i me my myself we our ours ourselves you you're you've you'll you'd your yours
+yourself yourselves he him his himself she she's her hers herself it it's its
+itself they them their theirs themselves what which who whom this that that'll
+these those am is are was were be been being have has had having do does did
+doing a an the and but if or because as until while of at by for with about
+against between into through during before after above below to from up down
+in out on off over under again further then once here there when where why how
+all any both each few more most other some such no nor not only own same so
+than too very s t can will just don don't should should've now d ll m o re ve
+y ain aren aren't couldn couldn't didn didn't doesn doesn't hadn hadn't hasn
+hasn't haven haven't isn isn't ma mightn mightn't mustn mustn't needn needn't
+shan shan't shouldn shouldn't wasn wasn't weren weren't won won't wouldn
+wouldn't
+""".split())
+
+
+def nltk_resource_available(resource):
+    """Return True if an NLTK data resource (e.g. 'corpora/stopwords') is installed locally."""
+    try:
+        import nltk
+    except ImportError:
+        return False
+    try:
+        nltk.data.find(resource)
+    except LookupError:
+        return False
+    return True
+
+
+def english_stop_words():
+    """Return English stop words from the local NLTK corpus, or the bundled copy."""
+    if nltk_resource_available('corpora/stopwords'):
+        from nltk.corpus import stopwords
+
+        return frozenset(stopwords.words('english'))
+    return ENGLISH_STOP_WORDS
+
+
+def nltk_tokenizer_available():
+    """Return True if the punkt models needed by nltk.word_tokenize are installed locally."""
+    return nltk_resource_available('tokenizers/punkt_tab/english') or nltk_resource_available('tokenizers/punkt')
@@ -0,0 +1,185 @@
+# Chunked reading and mergeable accumulators.
+
+# Count- and mean-style statistics can be computed one chunk at a time and the
+# partial results merged, so inputs larger than memory are processed with a
+# footprint bounded by the chunk size and the number of distinct keys.
+#
+# Results never depend on how the input was split into chunks: counts are
+# integers, and means are finished from per-(key, value) counts summed in a
+# fixed order, so a single in-memory "chunk" and many small chunks produce
+# byte-identical reports.
+#
+# The per-chunk counts come from restaurants.aggregation.Grouper, so callers
+# that need several tables from one chunk can compute them in a single pass and
+# hand them to the accumulators with add().
+
+from collections import Counter
+
+import pandas as pd
+
+from restaurants.aggregation import Grouper
+from restaurants.loader import DATASET_PATH, read_options
+from restaurants.metrics import count_rows_in
+
+# Rows per chunk when streaming the CSV
+DEFAULT_CHUNKSIZE = 100_000
+
+
+def iter_chunks(columns=None, path=DATASET_PATH, chunksize=DEFAULT_CHUNKSIZE):
+    """Yield the dataset as typed DataFrames of at most `chunksize` rows."""
+    with pd.read_csv(path, chunksize=chunksize, **read_options(columns)) as reader:
+        for chunk in reader:
+            count_rows_in(len(chunk))
+            yield chunk
+
+
+def observed_counts(frame, keys):
+    """Return {key tuple or key: rows} for the key combinations present in `frame`."""
+    return Grouper(frame).observed([keys] if isinstance(keys, str) else keys)
+
+
+class CountAccumulator:
+    """Mergeable number of rows per key."""
+
+    def __init__(self):
+        self.counts = Counter()
+
+    def update(self, keys):
+        """Add the rows of a Series of keys, or of a DataFrame of key columns (tuple keys); missing keys are ignored."""
+        if isinstance(keys, pd.DataFrame):
+            self.counts.update(observed_counts(keys, list(keys.columns)))
+        else:
+            self.counts.update(observed_counts(keys.to_frame('key'), 'key'))
+
+    def add(self, counts):
+        """Add precomputed {key: rows}, such as Grouper.observed() of a chunk."""
+        self.counts.update(counts)
+
+    def merge(self, other):
+        self.counts.update(other.counts)
+        return self
+
+    def subtract(self, other):
+        """Remove rows previously added from `other`'s input, as when a restaurant changes."""
+        self.counts.subtract(other.counts)
+        self.counts = +self.counts
+        return self
+
+    def total(self):
+        return sum(self.counts.values())
+
+    def regroup(self, mapping):
+        """Return a new accumulator with the rows of each key in `mapping` moved to the key it maps to."""
+        regrouped = CountAccumulator()
+        regrouped.counts = Counter(self.counts)
+        for key, new_key in mapping.items():
+            if key in regrouped.counts:
+                regrouped.counts[new_key] += regrouped.counts.pop(key)
+        return regrouped
+
+    def to_series(self):
+        """Return counts sorted by frequency like value_counts(), from the keys in the order they were first added.
+
+        Adding Grouper.first_seen() tables keeps that order the order of first
+        appearance, which value_counts() sorts with the same (unstable) sort,
+        so ties come out as value_counts() returns them.
+        """
+        series = pd.Series(list(self.counts.values()), index=list(self.counts), dtype='int64')
+        return series.sort_values(ascending=False)
+
+
+class MeanAccumulator:
+    """Mergeable mean of a value per key.
+
+    Rows are tallied per (key, value) pair. The number of distinct values is
+    small for the columns this is used on (ratings have one decimal), and
+    summing the tallies in sorted order at the end makes the result independent
+    of chunk boundaries.
+    """
+
+    def __init__(self):
+        self.tallies = Counter()
+
+    def update(self, keys, values):
+        """Add rows given as aligned Series of keys and values; missing entries are ignored."""
+        frame = pd.DataFrame({'key': keys, 'value': values})
+        self.tallies.update(observed_counts(frame, ['key', 'value']))
+
+    def add(self, tallies):
+        """Add precomputed {(key, value): rows}, such as Grouper.observed([key, value]) of a chunk."""
+        self.tallies.update(tallies)
+
+    def merge(self, other):
+        self.tallies.update(other.tallies)
+        return self
+
+    def subtract(self, other):
+        self.tallies.subtract(other.tallies)
+        self.tallies = +self.tallies
+        return self
+
+    def regroup(self, mapping):
+        """Return a new accumulator with the tallies of each key in `mapping` moved to the key it maps to."""
+        regrouped = MeanAccumulator()
+        regrouped.tallies = Counter(self.tallies)
+        for key, value in [pair for pair in self.tallies if pair[0] in mapping]:
+            regrouped.tallies[mapping[key], value] += regrouped.tallies.pop((key, value))
+        return regrouped
+
+    def to_series(self):
+        """Return the mean per key, indexed by sorted key like groupby().mean()."""
+        sums, counts = {}, Counter()
+        for key, value in sorted(self.tallies):
+            count = self.tallies[key, value]
+            sums[key] = sums.get(key, 0.0) + float(value) * count
+            counts[key] += count
+        keys = sorted(sums)
+        return pd.Series([sums[key] / counts[key] for key in keys], index=keys, dtype='float64')
+
+
+class IntegerMeanAccumulator:
+    """Mergeable mean of an integer value per key, such as votes.
+
+    Integer sums are exact in any order, so only a count and a sum are kept per
+    key instead of a tally of every distinct value.
+    """
+
+    def __init__(self):
+        self.counts = Counter()
+        self.sums = Counter()
+
+    def update(self, keys, values):
+        """Add rows given as aligned Series of keys and integer values; missing entries are ignored."""
+        self.add(*Grouper({'key': keys, 'value': values}).observed_sums(['key'], 'value'))
+
+    def add(self, counts, sums):
+        """Add precomputed {key: rows} and {key: sum}, such as Grouper.observed_sums() of a chunk."""
+        self.counts.update(counts)
+        self.sums.update(sums)
+
+    def merge(self, other):
+        self.counts.update(other.counts)
+        self.sums.update(other.sums)
+        return self
+
+    def subtract(self, other):
+        self.counts.subtract(other.counts)
+        self.sums.subtract(other.sums)
+        self.counts = +self.counts
+        self.sums = Counter({key: self.sums[key] for key in self.counts})
+        return self
+
+    def regroup(self, mapping):
+        """Return a new accumulator with the counts and sums of each key in `mapping` moved to the key it maps to."""
+        regrouped = IntegerMeanAccumulator()
+        regrouped.counts, regrouped.sums = Counter(self.counts), Counter(self.sums)
+        for key, new_key in mapping.items():
+            if key in regrouped.counts:
+                regrouped.counts[new_key] += regrouped.counts.pop(key)
+                regrouped.sums[new_key] += regrouped.sums.pop(key)
+        return regrouped
+
+    def to_series(self):
+        """Return the mean per key, indexed by sorted key like groupby().mean()."""
+        keys = sorted(self.counts)
+        return pd.Series([self.sums[key] / self.counts[key] for key in keys], index=keys, dtype='float64')
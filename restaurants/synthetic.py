@@ -0,0 +1,279 @@
+# Seeded synthetic restaurant datasets of any size.
+
+# The only real dataset has about 9,500 rows, too few to see how the tasks
+# scale. This module writes CSV files with the same columns and value formats
+# as cognifyz_dataset.csv (plus a 'Review' column for Level 3 Task 1) and
+# distributions modelled on it:
+#   - most restaurants are in a few Indian cities, with a long tail elsewhere,
+#     and their coordinates are clustered around localities within each city
+#   - 'Cuisines' holds one to several comma-separated cuisines, drawn from a
+#     pool of combinations whose popularity follows a power law
+#   - some restaurants belong to chains whose sizes follow a Zipf law, and the
+#     others have names of their own
+#   - ratings, rating text and colour, votes, price range, cost and services
+#     are correlated the way they are in the real data
+#
+# A dataset depends only on its row count and seed. Rows are generated and
+# written in chunks, so even 10 million rows need little memory.
+#
+# Usage:
+#   python -m restaurants.synthetic 1000000 --output synthetic_1m.csv --seed 0
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from restaurants.loader import SCHEMA
+
+# Rows generated and written at a time
+DEFAULT_CHUNKSIZE = 250_000
+
+# Bump whenever generated values change, so saved datasets are not reused
+GENERATOR_VERSION = 1
+
+# (city, country code, currency, latitude, longitude, share of restaurants, cost of a price range 1 meal for two)
+CITIES = [
+    ('New Delhi', 1, 'Indian Rupees(Rs.)', 28.6139, 77.2090, 0.56, 300),
+    ('Gurgaon', 1, 'Indian Rupees(Rs.)', 28.4595, 77.0266, 0.12, 300),
+    ('Noida', 1, 'Indian Rupees(Rs.)', 28.5355, 77.3910, 0.11, 250),
+    ('Faridabad', 1, 'Indian Rupees(Rs.)', 28.4089, 77.3178, 0.03, 250),
+    ('Ghaziabad', 1, 'Indian Rupees(Rs.)', 28.6692, 77.4538, 0.01, 250),
+    ('Bangalore', 1, 'Indian Rupees(Rs.)', 12.9716, 77.5946, 0.01, 300),
+    ('Mumbai', 1, 'Indian Rupees(Rs.)', 19.0760, 72.8777, 0.01, 350),
+    ('Kolkata', 1, 'Indian Rupees(Rs.)', 22.5726, 88.3639, 0.01, 250),
+    ('Chennai', 1, 'Indian Rupees(Rs.)', 13.0827, 80.2707, 0.01, 250),
+    ('Pune', 1, 'Indian Rupees(Rs.)', 18.5204, 73.8567, 0.01, 250),
+    ('Jaipur', 1, 'Indian Rupees(Rs.)', 26.9124, 75.7873, 0.01, 200),
+    ('Lucknow', 1, 'Indian Rupees(Rs.)', 26.8467, 80.9462, 0.01, 200),
+    ('Orlando', 216, 'Dollar($)', 28.5383, -81.3792, 0.005, 15),
+    ('Dubai', 214, 'Emirati Diram(AED)', 25.2048, 55.2708, 0.01, 60),
+    ('London', 215, 'Pounds(£)', 51.5074, -0.1278, 0.005, 20),
+    ('Rio de Janeiro', 30, 'Brazilian Real(R$)', -22.9068, -43.1729, 0.005, 50),
+    ('Cape Town', 189, 'Rand(R)', -33.9249, 18.4241, 0.005, 150),
+    ('Auckland', 148, 'NewZealand($)', -36.8485, 174.7633, 0.005, 30),
+    ('Ankara', 208, 'Turkish Lira(TL)', 39.9334, 32.8597, 0.005, 50),
+    ('Jakarta', 94, 'Indonesian Rupiah(IDR)', -6.2088, 106.8456, 0.005, 100000),
+    ('Doha', 166, 'Qatari Rial(QR)', 25.2854, 51.5310, 0.005, 80),
+    ('Colombo', 191, 'Sri Lankan Rupee(LKR)', 6.9271, 79.8612, 0.005, 1000),
+    ('Makati City', 162, 'Botswana Pula(P)', 14.5547, 121.0244, 0.005, 400),
+    ('Inner City', 14, 'Dollar($)', -37.8136, 144.9631, 0.005, 20),
+]
+
+# Localities clustered around each city centre
+LOCALITIES_PER_CITY = 40
+LOCALITY_NAMES = [
+    'Connaught Place', 'Hauz Khas', 'Rajouri Garden', 'Saket', 'Lajpat Nagar', 'Karol Bagh',
+    'Greater Kailash', 'Vasant Kunj', 'Malviya Nagar', 'Janakpuri', 'Dwarka', 'Pitampura',
+    'Sector 18', 'DLF Phase', 'Sohna Road', 'Old Town', 'Civil Lines', 'Model Town',
+    'Market Road', 'Station Road',
+]
+
+# Cuisines weighted roughly by how often they appear in the real dataset
+CUISINES = {
+    'North Indian': 40, 'Chinese': 27, 'Fast Food': 19, 'Mughlai': 9, 'Italian': 7, 'Bakery': 7,
+    'Continental': 7, 'Cafe': 6, 'Desserts': 6, 'South Indian': 6, 'Street Food': 5, 'American': 4,
+    'Pizza': 4, 'Burger': 3, 'Beverages': 5, 'Mithai': 3, 'Biryani': 3, 'Asian': 3, 'Seafood': 3,
+    'Thai': 2, 'Healthy Food': 2, 'Ice Cream': 2, 'Japanese': 1, 'Mexican': 1, 'Lebanese': 1,
+    'Kebab': 1, 'Finger Food': 1, 'European': 1, 'Rolls': 1, 'Mediterranean': 1, 'Tibetan': 1,
+    'Raw Meats': 1, 'Sandwich': 1, 'Salad': 1, 'Bengali': 1, 'Hyderabadi': 1, 'Goan': 1,
+}
+
+# Number of cuisine combinations drawn for the pool (the real dataset has about
+# 1,800 distinct ones) and the Zipf exponent of their popularity
+CUISINE_COMBINATIONS = 3000
+CUISINE_EXPONENT = 0.9
+
+# Well-known chains get the most common chain ranks; the rest are numbered
+CHAINS = [
+    'Cafe Coffee Day', "Domino's Pizza", 'Subway', 'Green Chick Chop', "McDonald's", 'Keventers',
+    'Pizza Hut', 'Giani', 'Baskin Robbins', 'Barbeque Nation', "Giani's", "Dunkin' Donuts",
+    'Burger King', 'Costa Coffee', 'KFC', "Haldiram's", 'Starbucks', 'Sagar Ratna', 'Wow! Momo', 'Chaayos',
+]
+
+# Share of restaurants belonging to a chain, the Zipf exponent of chain sizes,
+# and the number of rows per distinct chain
+CHAIN_SHARE = 0.2
+CHAIN_EXPONENT = 0.8
+ROWS_PER_CHAIN = 20
+
+# Words combined into the names of independent restaurants
+NAME_WORDS = (
+    ['Royal', 'Spice', 'Green', 'Golden', 'Urban', 'Little', 'Big', 'Old', 'New', 'Café', 'Tandoori', 'Desi'],
+    ['Kitchen', 'Dhaba', 'Bistro', 'Grill', 'House', 'Corner', 'Express', 'Garden', 'Tadka', 'Treat', 'Point', 'Hub'],
+)
+
+# Rating text and colour by rating bin, as in the real dataset
+RATING_BINS = [0.0, 2.5, 3.5, 4.0, 4.5]
+RATING_TEXT = ['Not rated', 'Poor', 'Average', 'Good', 'Very Good', 'Excellent']
+RATING_COLORS = ['White', 'Red', 'Orange', 'Yellow', 'Green', 'Dark Green']
+
+# Review sentences by rating bin; reviews are two or three of them
+REVIEW_SENTENCES = [
+    ["Haven't been here yet.", "Looks interesting from outside.", "Heard mixed things about this place."],
+    ["The food was cold and bland.", "Service was slow and rude.", "Overpriced for the quality.", "Would not recommend it.", "The place was dirty."],
+    ["The food was okay.", "Service was average.", "Decent place for a quick bite.", "Nothing special but not bad.", "Prices are reasonable."],
+    ["The food was good.", "Friendly staff and quick service.", "Nice ambience.", "Good value for money.", "Would visit again."],
+    ["Really tasty food.", "Great service and lovely ambience.", "The desserts were delicious.", "Highly recommended.", "One of my favourite places."],
+    ["Amazing food, absolutely delicious!", "Excellent service and a wonderful atmosphere.", "Best meal I have had in a long time.", "A must visit.", "Perfect in every way."],
+]
+REVIEWS_PER_BIN = 200
+
+
+def zipf_cdf(count, exponent):
+    """Cumulative probabilities of ranks 1..count under a Zipf law."""
+    weights = 1.0 / np.arange(1, count + 1, dtype=np.float64) ** exponent
+    cdf = np.cumsum(weights)
+    return cdf / cdf[-1]
+
+
+def chain_name(rank):
+    return CHAINS[rank] if rank < len(CHAINS) else f"Chain {rank + 1}"
+
+
+class Catalog:
+    """Everything shared by all chunks of one dataset: cities, localities, cuisines, chains and reviews."""
+
+    def __init__(self, rows, seed=0):
+        rng = np.random.default_rng([seed, 0])
+        self.rows = rows
+        self.seed = seed
+
+        shares = np.array([city[5] for city in CITIES])
+        self.city_p = shares / shares.sum()
+        # Locality centres lie around the city centre; restaurants cluster around them
+        self.locality_offsets = rng.normal(0.0, 0.06, size=(len(CITIES), LOCALITIES_PER_CITY, 2))
+        self.locality_names = [
+            LOCALITY_NAMES[i % len(LOCALITY_NAMES)] + (f" {i // len(LOCALITY_NAMES) + 1}" if i >= len(LOCALITY_NAMES) else "")
+            for i in range(LOCALITIES_PER_CITY)
+        ]
+
+        # Cuisine combinations of one to eight cuisines, mostly one to three. They
+        # are ranked by how likely they were to be drawn (short combinations of
+        # popular cuisines first) and restaurants pick them by Zipf rank.
+        names = list(CUISINES)
+        weights = np.array(list(CUISINES.values()), dtype=np.float64)
+        weights /= weights.sum()
+        sizes = np.minimum(rng.geometric(0.45, CUISINE_COMBINATIONS), 8)
+        combinations = {}
+        for size in sizes:
+            chosen = rng.choice(len(names), size=size, replace=False, p=weights)
+            combinations[", ".join(names[i] for i in chosen)] = np.prod(weights[chosen]) * 0.55 ** size
+        self.cuisines = sorted(combinations, key=lambda combination: (-combinations[combination], combination))
+        self.cuisine_cdf = zipf_cdf(len(self.cuisines), CUISINE_EXPONENT)
+
+        chains = max(len(CHAINS), int(rows * CHAIN_SHARE) // ROWS_PER_CHAIN)
+        self.chain_names = np.array([chain_name(rank) for rank in range(chains)], dtype=object)
+        self.chain_cdf = zipf_cdf(chains, CHAIN_EXPONENT)
+
+        # REVIEWS_PER_BIN reviews for each rating bin, one after the other
+        self.reviews = np.array([
+            " ".join(rng.choice(sentences, size=rng.integers(2, 4), replace=False))
+            for sentences in REVIEW_SENTENCES for _ in range(REVIEWS_PER_BIN)
+        ], dtype=object)
+
+    def chunk(self, start, rows):
+        """Generate rows start .. start + rows - 1 as a DataFrame with the CSV's values."""
+        rng = np.random.default_rng([self.seed, 1, start])
+        ids = np.arange(start, start + rows) + 1
+
+        # Location: city, then a locality cluster, then a point near its centre
+        city = rng.choice(len(CITIES), size=rows, p=self.city_p)
+        locality = rng.integers(0, LOCALITIES_PER_CITY, size=rows)
+        centre = np.array([[c[3], c[4]] for c in CITIES])[city] + self.locality_offsets[city, locality]
+        point = centre + rng.normal(0.0, 0.008, size=(rows, 2))
+        # A few restaurants have no coordinates, recorded as 0 as in the real data
+        point[rng.random(rows) < 0.002] = 0.0
+        city_names = np.array([c[0] for c in CITIES], dtype=object)[city]
+        locality_names = np.array(self.locality_names, dtype=object)[locality]
+
+        # Names: chains by Zipf rank, independent restaurants by their own name
+        in_chain = rng.random(rows) < CHAIN_SHARE
+        chains = self.chain_names[np.searchsorted(self.chain_cdf, rng.random(rows))]
+        words = [rng.choice(np.array(group, dtype=object), size=rows) for group in NAME_WORDS]
+        names = np.where(in_chain, chains, words[0] + " " + words[1] + " " + ids.astype(str).astype(object))
+
+        cuisines = np.array(self.cuisines, dtype=object)[np.searchsorted(self.cuisine_cdf, rng.random(rows))]
+        cuisines[rng.random(rows) < 0.001] = None
+
+        # Price range drives cost, table booking and (slightly) rating
+        price = rng.choice([1, 2, 3, 4], size=rows, p=[0.46, 0.33, 0.15, 0.06])
+        unit = np.array([c[6] for c in CITIES])[city]
+        step = 10.0 ** np.floor(np.log10(unit)) / 2
+        cost = np.maximum(np.round(unit * price * rng.lognormal(0.0, 0.35, rows) / step), 1) * step
+        table_booking = rng.random(rows) < np.array([0.0, 0.02, 0.12, 0.45, 0.55])[price]
+        online_delivery = rng.random(rows) < np.array([0.0, 0.22, 0.35, 0.20, 0.10])[price]
+
+        # About a fifth of restaurants are not rated; votes grow with the rating
+        rated = rng.random(rows) >= 0.22
+        rating = np.where(rated, np.clip(np.round(rng.normal(3.2 + 0.1 * price, 0.5), 1), 1.8, 4.9), 0.0)
+        votes = np.where(rated, np.round(rng.lognormal(2.5 + 1.2 * (rating - 3.0), 1.2)), rng.integers(0, 4, rows)).astype(np.int64)
+        rating_bin = np.where(rated, np.searchsorted(RATING_BINS, rating, side='right'), 0)
+
+        reviews = self.reviews[rating_bin * REVIEWS_PER_BIN + rng.integers(0, REVIEWS_PER_BIN, size=rows)]
+
+        street = rng.integers(1, 300, size=rows).astype(str).astype(object)
+        yes_no = np.array(['No', 'Yes'], dtype=object)
+        frame = pd.DataFrame({
+            'Restaurant ID': ids,
+            'Restaurant Name': names,
+            'Country Code': np.array([c[1] for c in CITIES])[city],
+            'City': city_names,
+            'Address': street + ", Main Road, " + locality_names + ", " + city_names,
+            'Locality': locality_names,
+            'Locality Verbose': locality_names + ", " + city_names,
+            'Longitude': point[:, 1],
+            'Latitude': point[:, 0],
+            'Cuisines': cuisines,
+            'Average Cost for two': cost.astype(np.int64),
+            'Currency': np.array([c[2] for c in CITIES], dtype=object)[city],
+            'Has Table booking': yes_no[table_booking.astype(int)],
+            'Has Online delivery': yes_no[online_delivery.astype(int)],
+            'Is delivering now': yes_no[(online_delivery & (rng.random(rows) < 0.02)).astype(int)],
+            'Switch to order menu': 'No',
+            'Price range': price,
+            'Aggregate rating': rating,
+            'Rating color': np.array(RATING_COLORS, dtype=object)[rating_bin],
+            'Rating text': np.array(RATING_TEXT, dtype=object)[rating_bin],
+            'Votes': votes,
+            'Review': reviews,
+        })
+        return frame[list(SCHEMA)]
+
+
+def iter_synthetic(rows, seed=0, chunksize=DEFAULT_CHUNKSIZE):
+    """Yield a synthetic dataset of `rows` rows as DataFrames of at most `chunksize` rows."""
+    catalog = Catalog(rows, seed)
+    for start in range(0, rows, chunksize):
+        yield catalog.chunk(start, min(chunksize, rows - start))
+
+
+def generate(rows, seed=0, chunksize=DEFAULT_CHUNKSIZE):
+    """Return a synthetic dataset of `rows` rows as one DataFrame of CSV values."""
+    return pd.concat(iter_synthetic(rows, seed, chunksize), ignore_index=True)
+
+
+def write_dataset(path, rows, seed=0, chunksize=DEFAULT_CHUNKSIZE):
+    """Write a synthetic dataset to the CSV file `path`; a partial file is never left behind."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".tmp", "w", encoding="utf-8", newline="") as handle:
+        for number, chunk in enumerate(iter_synthetic(rows, seed, chunksize)):
+            chunk.to_csv(handle, header=number == 0, index=False)
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic restaurant dataset with the real schema.")
+    parser.add_argument("rows", type=int, help="number of restaurants")
+    parser.add_argument("--output", default="synthetic_dataset.csv", help="CSV file to write")
+    parser.add_argument("--seed", type=int, default=0, help="random seed; the same rows and seed give the same file")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="rows generated and written at a time")
+    args = parser.parse_args(argv)
+    write_dataset(args.output, args.rows, args.seed, args.chunksize)
+    print(f"Wrote {args.rows} rows to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pandas.testing as tm
+import pytest
+
+from restaurants.aggregation import Grouper
+
+
+def frame(rows=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    cuisines = rng.choice(['North Indian', 'Chinese', 'Cafe', 'Fast Food, Pizza', 'Bakery', None], size=rows)
+    ratings = (rng.integers(0, 50, size=rows) / 10).astype(np.float32)
+    return pd.DataFrame({
+        'City': pd.Categorical(rng.choice(['New Delhi', 'Gurgaon', 'Noida', 'Inner City'], size=rows)),
+        'Cuisines': pd.Series(cuisines, dtype='category'),
+        'Price range': rng.integers(1, 5, size=rows).astype(np.int8),
+        'Has Online delivery': rng.random(rows) < 0.3,
+        'Aggregate rating': np.where(rng.random(rows) < 0.05, np.nan, ratings).astype(np.float32),
+        'Votes': rng.integers(0, 900, size=rows).astype(np.int32),
+    })
+
+
+def table(series):
+    """{key: value} of a group-by result; Grouper indexes keys in order of first appearance, not sorted."""
+    return dict(series.items())
+
+
+def test_counts_match_groupby_size():
+    df = frame()
+    expected = df.groupby(['City', 'Price range'], observed=True).size()
+    assert table(Grouper(df).counts(['City', 'Price range'])) == table(expected)
+
+
+def test_means_match_groupby_mean():
+    df = frame()
+    expected = df.groupby(['Price range', 'Has Online delivery'])['Votes'].mean()
+    assert table(Grouper(df).means(['Price range', 'Has Online delivery'], 'Votes')) == pytest.approx(table(expected), rel=1e-12)
+    # Missing ratings are left out; groupby() averages float32 in float32
+    expected = df.groupby('City', observed=True)['Aggregate rating'].mean()
+    assert table(Grouper(df).means(['City'], 'Aggregate rating')) == pytest.approx(table(expected), rel=1e-6)
+
+
+def test_masked_rows_match_filtered_frame():
+    df = frame()
+    rows = (df['City'] != 'Inner City').to_numpy()
+    expected = df[rows].groupby('City', observed=True)['Votes'].mean()
+    assert table(Grouper(df, rows=rows).means(['City'], 'Votes')) == pytest.approx(table(expected), rel=1e-12)
+
+
+def test_value_counts_match_pandas_including_ties():
+    df = frame()
+    tm.assert_series_equal(Grouper(df).value_counts('Cuisines'), df['Cuisines'].astype(object).value_counts())
+    # Six keys with four rows each: only the tie order can differ
+    ties = pd.DataFrame({'key': pd.Series(list('fbdace') * 4, dtype='category')})
+    assert Grouper(ties).value_counts('key').index.tolist() == ties['key'].astype(object).value_counts().index.tolist()
+
+
+def test_totals_and_missing():
+    df = frame()
+    totals = Grouper(df).totals(['Price range'], ['Aggregate rating']).sort_index()
+    grouped = df.groupby('Price range')['Aggregate rating']
+    assert totals['rows'].tolist() == grouped.size().tolist()
+    assert totals['Aggregate rating count'].tolist() == grouped.count().tolist()
+    np.testing.assert_allclose(totals['Aggregate rating sum'], grouped.sum(), rtol=1e-6)
+    assert Grouper(df).missing(['Cuisines', 'Votes']) == {'Cuisines': int(df['Cuisines'].isna().sum()), 'Votes': 0}
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pandas.testing as tm
+import pytest
+
+from restaurants.bitmaps import RATING_BINS, RATING_RANGE, BitmapIndex, UnknownValue, pack, unpack
+
+
+def frame(rows=1000, seed=0):
+    # 1000 rows: the last word of every vector is only partly used
+    rng = np.random.default_rng(seed)
+    cities = rng.choice(['New Delhi', 'Gurgaon', 'Noida', 'Agra', None], size=rows, p=[.4, .3, .2, .09, .01])
+    return pd.DataFrame({
+        'Country Code': rng.choice([1, 14, 162], size=rows).astype(np.int16),
+        'City': pd.Series(cities, dtype='category'),
+        'Price range': rng.integers(1, 5, size=rows).astype(np.int8),
+        'Has Online delivery': rng.random(rows) < 0.3,
+        'Has Table booking': rng.random(rows) < 0.1,
+        'Aggregate rating': (rng.integers(0, 50, size=rows) / 10).astype(np.float32),
+    })
+
+
+def test_pack_round_trip():
+    mask = np.random.default_rng(1).random(1000) < 0.5
+    assert np.array_equal(unpack(pack(mask), len(mask)), mask)
+
+
+@pytest.mark.parametrize("index, columns", [
+    ('Price range', 'Has Online delivery'),
+    ('Price range', 'Has Table booking'),
+    ('City', 'Country Code'),
+])
+def test_crosstab_matches_pandas(index, columns):
+    df = frame()
+    tm.assert_frame_equal(BitmapIndex(df).crosstab(index, columns), pd.crosstab(df[index], df[columns]),
+                          check_names=False, check_index_type=False, check_column_type=False, check_categorical=False)
+
+
+def test_filtered_crosstab_matches_pandas():
+    df = frame()
+    index = BitmapIndex(df)
+    rows = (df['City'] == 'New Delhi') & df['Price range'].isin([3, 4])
+    result = index.crosstab('Price range', 'Has Online delivery', filters={'City': 'New Delhi', 'Price range': [3, 4]})
+    tm.assert_frame_equal(result, pd.crosstab(df.loc[rows, 'Price range'], df.loc[rows, 'Has Online delivery']),
+                          check_names=False, check_index_type=False, check_column_type=False)
+    assert index.count({'City': 'New Delhi'}, where=df['Has Table booking'].to_numpy()) == int((df['City'].eq('New Delhi') & df['Has Table booking']).sum())
+
+
+def test_rating_ranges_and_first_seen():
+    df = frame()
+    index = BitmapIndex(df)
+    expected = pd.cut(df['Aggregate rating'], bins=RATING_BINS).value_counts(sort=False)
+    assert index.counts([RATING_RANGE], observed=False).tolist() == expected.tolist()
+    assert index.first_seen('City') == df['City'].dropna().astype(object).value_counts(sort=False).to_dict()
+    assert list(index.first_seen('City')) == list(pd.unique(df['City'].dropna().astype(object)))
+
+
+def test_unknown_values_raise_unknown_value():
+    index = BitmapIndex(frame())
+    assert index.parse('Price range', '4') == 4
+    with pytest.raises(UnknownValue):
+        index.parse('City', 'Atlantis')
@@ -0,0 +1,62 @@
+import pytest
+
+from restaurants.chains import normalize_name, resolve_chains
+
+SAME_CHAIN = [
+    ("Domino's Pizza", "Dominos Pizza"),
+    ("Domino's Pizza", "Domino's Pizza "),
+    ("Haldiram's", "HALDIRAMS"),
+    ("Moti Mahal Delux", "Moti Mahal Deluxe"),
+    ("Barbeque Nation", "Barbeque-Nation"),
+]
+
+DIFFERENT_RESTAURANTS = [
+    ("Cafe Coffee Day", "Cafe Coffee Bay"),
+    ("The Chocolate Room", "The Chocolate Boom"),
+    ("Tandoori Nights", "Tandoori Knights"),
+    ("Sector 14 Dhaba", "Sector 41 Dhaba"),
+    ("Pizza Hut", "Pizza Hat"),
+]
+
+
+def same_chain(first, second, **options):
+    resolved = resolve_chains({first: 3, second: 1}, **options)
+    return resolved.loc[first, 'chain_id'] == resolved.loc[second, 'chain_id']
+
+
+@pytest.mark.parametrize("first, second", SAME_CHAIN)
+def test_spelling_variants_merge(first, second):
+    assert same_chain(first, second)
+
+
+@pytest.mark.parametrize("first, second", DIFFERENT_RESTAURANTS)
+def test_different_restaurants_stay_apart(first, second):
+    assert not same_chain(first, second)
+
+
+def test_exact_keys_only_at_similarity_one():
+    assert same_chain("Domino's Pizza", "Dominos Pizza", similarity=1)
+    assert not same_chain("Moti Mahal Delux", "Moti Mahal Deluxe", similarity=1)
+
+
+def test_similar_names_do_not_merge_transitively():
+    # At 0.65 "day" ~ "bay" and "bay" ~ "bar", but "day" and "bar" are not similar
+    counts = {"Cafe Coffee Bay": 2, "Cafe Coffee Day": 9, "Cafe Coffee Bar": 1}
+    resolved = resolve_chains(counts, similarity=0.65)
+    assert resolved.loc["Cafe Coffee Bay", 'chain'] == "Cafe Coffee Day"
+    assert resolved.loc["Cafe Coffee Bar", 'chain'] == "Cafe Coffee Bar"
+
+
+def test_display_name_is_most_common_then_first_seen():
+    resolved = resolve_chains({"Dominos Pizza": 2, "Domino's Pizza": 5, "DOMINOS PIZZA": 5})
+    assert set(resolved['chain']) == {"Domino's Pizza"}
+    resolved = resolve_chains({"Dominos Pizza": 2, "Domino's Pizza": 2})
+    assert set(resolved['chain']) == {"Dominos Pizza"}
+
+
+def test_chain_ids_do_not_depend_on_order():
+    counts = {"Domino's Pizza": 3, "Dominos Pizza": 1, "Pizza Hut": 4}
+    forward = resolve_chains(counts)
+    backward = resolve_chains(dict(reversed(counts.items())))
+    assert forward['chain_id'].to_dict() == backward['chain_id'].to_dict()
+    assert normalize_name("  Domino’s   Pizza!") == "dominos pizza"
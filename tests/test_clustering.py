@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+
+from restaurants.clustering import cluster_locations, grid_cells
+
+
+def restaurants(seed=0):
+    """A dense cluster and a looser one in one country, spread on both sides of the grid's median cuts, plus noise."""
+    rng = np.random.default_rng(seed)
+    dense = rng.normal([28.60, 77.20], 0.004, size=(600, 2))
+    loose = rng.normal([28.64, 77.26], 0.006, size=(300, 2))
+    scattered = rng.uniform([28.4, 77.0], [28.8, 77.5], size=(300, 2))
+    elsewhere = rng.normal([14.55, 121.02], 0.003, size=(40, 2))
+    points = np.vstack([dense, loose, scattered, elsewhere])
+    return pd.DataFrame({
+        'Country Code': np.r_[np.ones(1200, dtype=np.int16), np.full(40, 162, dtype=np.int16)],
+        'Latitude': points[:, 0],
+        'Longitude': points[:, 1],
+    })
+
+
+def test_grid_cells_cut_through_the_dense_cluster():
+    frame = restaurants()
+    cells = grid_cells(frame['Latitude'].to_numpy()[:1200], frame['Longitude'].to_numpy()[:1200], max_rows=200)
+    assert len(cells) > 1
+    assert sorted(np.concatenate(cells).tolist()) == list(range(1200))
+    # Rows of the dense cluster end up in more than one cell
+    assert sum(np.any(cell < 600) for cell in cells) > 1
+
+
+def test_stitched_cells_match_unsplit_dbscan():
+    frame = restaurants()
+    whole, whole_report, _ = cluster_locations(frame, workers=1)
+    split, split_report, _ = cluster_locations(frame, workers=1, max_rows=200)
+    assert split_report['cells'].tolist() == [8, 1]
+    assert whole_report['clusters'].tolist() == [2, 1]
+    assert split.dtype == 'int64'
+    pd.testing.assert_series_equal(split, whole)
+    assert split_report['noise'].tolist() == whole_report['noise'].tolist()
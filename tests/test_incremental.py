@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+
+from restaurants.aggregation import Grouper
+from restaurants.incremental import IncrementalState
+from restaurants.streaming import CountAccumulator, IntegerMeanAccumulator, MeanAccumulator
+
+COLUMNS = ['City', 'Has Online delivery', 'Aggregate rating', 'Votes']
+
+
+def accumulate(frames):
+    aggregates = {'cities': CountAccumulator(), 'ratings': MeanAccumulator(), 'votes': IntegerMeanAccumulator()}
+    for frame in frames:
+        grouped = Grouper(frame)
+        aggregates['cities'].add(grouped.first_seen('City'))
+        aggregates['ratings'].add(grouped.observed(['Has Online delivery', 'Aggregate rating']))
+        aggregates['votes'].add(*grouped.observed_sums(['City'], 'Votes'))
+    return aggregates
+
+
+def restaurants(ids, seed):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Restaurant ID': np.asarray(ids, dtype=np.int64),
+        'City': pd.Categorical(rng.choice(['New Delhi', 'Gurgaon', 'Noida', 'Agra'], size=len(ids))),
+        'Has Online delivery': rng.random(len(ids)) < 0.3,
+        'Aggregate rating': (rng.integers(0, 50, size=len(ids)) / 10).astype(np.float32),
+        'Votes': rng.integers(0, 900, size=len(ids)).astype(np.int32),
+    })
+
+
+def update(path, frame, complete):
+    state = IncrementalState.load(path, COLUMNS, accumulate)
+    summary = state.apply(frame, complete=complete)
+    state.save()
+    return summary
+
+
+def assert_same(aggregates, frame):
+    expected = accumulate([frame])
+    assert dict(aggregates['cities'].counts) == dict(expected['cities'].counts)
+    pd.testing.assert_series_equal(aggregates['ratings'].to_series(), expected['ratings'].to_series())
+    pd.testing.assert_series_equal(aggregates['votes'].to_series(), expected['votes'].to_series())
+
+
+def test_delta_matches_a_full_recompute(tmp_path):
+    path = str(tmp_path / "state.sqlite")
+    dataset = restaurants(range(1, 501), seed=0)
+    assert update(path, dataset, complete=True) == {'added': 500, 'changed': 0, 'removed': 0, 'unchanged': 0}
+
+    # 30 changed restaurants, 10 sent again unchanged and 20 new ones
+    changed = restaurants(range(1, 31), seed=1)
+    delta = pd.concat([changed, dataset.iloc[100:110], restaurants(range(1001, 1021), seed=2)], ignore_index=True)
+    summary = update(path, delta, complete=False)
+    assert summary['added'] == 20 and summary['removed'] == 0
+    assert summary['changed'] + summary['unchanged'] == 40
+
+    updated = pd.concat([changed, dataset.iloc[30:], delta.iloc[40:]], ignore_index=True)
+    state = IncrementalState.load(path, COLUMNS, accumulate)
+    assert not state.empty
+    assert_same(state.aggregates, updated)
+
+
+def test_complete_batch_removes_missing_restaurants(tmp_path):
+    path = str(tmp_path / "state.sqlite")
+    dataset = restaurants(range(1, 501), seed=0)
+    update(path, dataset, complete=True)
+
+    # Restaurants 1-50 are gone, 51-60 changed and 501-520 added
+    updated = pd.concat([restaurants(range(51, 61), seed=3), dataset.iloc[60:], restaurants(range(501, 521), seed=4)], ignore_index=True)
+    summary = update(path, updated, complete=True)
+    assert summary['added'] == 20 and summary['removed'] == 50
+    assert summary['changed'] + summary['unchanged'] == 450
+
+    state = IncrementalState.load(path, COLUMNS, accumulate)
+    assert_same(state.aggregates, updated)
+    assert update(path, updated, complete=True) == {'added': 0, 'changed': 0, 'removed': 0, 'unchanged': 470}
+
+
+def test_state_built_differently_starts_over(tmp_path):
+    path = str(tmp_path / "state.sqlite")
+    update(path, restaurants(range(1, 101), seed=0), complete=True)
+    state = IncrementalState.load(path, COLUMNS[:2], accumulate)
+    assert state.empty
+    assert state.aggregates['cities'].total() == 0
+    state.connection.close()
@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from restaurants.sketches import DistributionSketch, HeavyHitters, HyperLogLog, QuantileSketch
+
+
+def zipf_keys(rows=200_000, keys=20_000, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.Series(np.minimum(rng.zipf(1.3, size=rows), keys)).map("chain {}".format)
+
+
+def sketch(keys, epsilon, chunk=25_000):
+    sketch = HeavyHitters(epsilon=epsilon)
+    for start in range(0, len(keys), chunk):
+        sketch.add(keys.iloc[start:start + chunk].value_counts(sort=False).to_dict())
+    return sketch
+
+
+def assert_within_bound(sketch, exact, epsilon):
+    bound = epsilon * len(exact)
+    counts = sketch.counts
+    assert sketch.total() == len(exact)
+    truth = exact.value_counts()
+    # Every key above the bound is monitored, and no count is below the truth or more than the bound above it
+    assert set(truth[truth > bound].index) <= set(counts)
+    for key, count in counts.items():
+        assert truth.get(key, 0) <= count <= truth.get(key, 0) + bound
+    assert sketch.error_bound() <= bound
+
+
+def test_heavy_hitters_error_bound():
+    keys = zipf_keys()
+    assert_within_bound(sketch(keys, 0.002), keys, 0.002)
+
+
+def test_merged_heavy_hitters_keep_the_bound():
+    keys = zipf_keys()
+    first, second = sketch(keys.iloc[:120_000], 0.002), sketch(keys.iloc[120_000:], 0.002)
+    assert_within_bound(first.merge(second), keys, 0.002)
+
+
+def test_guaranteed_top_keys_are_the_exact_top_keys():
+    keys = zipf_keys()
+    hitters = sketch(keys, 0.001)
+    assert hitters.guaranteed(10)
+    assert hitters.to_series().index[:10].tolist() == keys.value_counts().index[:10].tolist()
+
+
+def test_distinct_count_error():
+    keys = zipf_keys(rows=300_000, keys=10**9, seed=1)
+    exact = keys.nunique()
+    first, second = HyperLogLog(0.01), HyperLogLog(0.01)
+    first.add(keys.iloc[:150_000].unique().tolist())
+    second.add(keys.iloc[150_000:].unique().tolist())
+    estimate = first.merge(second).estimate()
+    # Three standard errors
+    assert abs(estimate - exact) <= 3 * first.error * exact
+
+
+def rank_error(exact, value, q):
+    """Distance in ranks, as a fraction of all values, between quantile q and the ranks `value` has in `exact`."""
+    low, high = np.searchsorted(exact, value, side='left'), np.searchsorted(exact, value, side='right')
+    target = q * (len(exact) - 1)
+    return max(low - target, target - high, 0) / len(exact)
+
+
+def test_quantile_rank_error():
+    values = np.random.default_rng(2).lognormal(4, 1.5, size=300_000)
+    first, second = QuantileSketch(0.01), QuantileSketch(0.01)
+    for start in range(0, 150_000, 10_000):
+        first.add(values[start:start + 10_000])
+    second.add(values[150_000:])
+    merged = first.merge(second)
+    assert merged.count == len(values)
+    distribution = merged.distribution()
+    assert distribution.total() == len(values)
+    exact = np.sort(values)
+    for q in (0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99):
+        assert rank_error(exact, distribution.quantile(q), q) <= merged.error
+
+
+def test_describe_is_exact_for_few_distinct_values():
+    ratings = pd.Series((np.random.default_rng(3).integers(0, 50, size=50_000) / 10).astype(np.float32), name='Aggregate rating')
+    sketch = DistributionSketch(name='Aggregate rating')
+    for start in range(0, len(ratings), 7_000):
+        sketch.merge(DistributionSketch(name='Aggregate rating').add(ratings.iloc[start:start + 7_000]))
+    assert sketch.rank_error() == 0
+    pd.testing.assert_series_equal(sketch.describe(), ratings.describe())
+
+
+def test_sketched_describe_keeps_exact_moments():
+    votes = pd.Series(np.random.default_rng(4).zipf(1.5, size=100_000).clip(max=10**6).astype(np.int64), name='Votes')
+    sketch = DistributionSketch(max_exact=100, name='Votes')
+    for start in range(0, len(votes), 20_000):
+        sketch.add(votes.iloc[start:start + 20_000])
+    assert sketch.rank_error() > 0
+    described, expected = sketch.describe(), votes.describe()
+    for statistic in ('count', 'mean', 'std', 'min', 'max'):
+        assert described[statistic] == pytest.approx(expected[statistic], rel=1e-9)
+    exact = np.sort(votes.to_numpy())
+    for statistic, q in (('25%', 0.25), ('50%', 0.5), ('75%', 0.75)):
+        assert rank_error(exact, described[statistic], q) <= sketch.rank_error()
@@ -0,0 +1,81 @@
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+import pandas.testing as tm
+
+from restaurants.aggregation import Grouper
+from restaurants.streaming import CountAccumulator, IntegerMeanAccumulator, MeanAccumulator
+
+
+def frame(rows=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    cities = rng.choice(['New Delhi', 'Gurgaon', 'Noida', 'Pasay City', 'Inner City', 'Agra'], size=rows, p=[.4, .2, .15, .1, .1, .05])
+    ratings = rng.integers(0, 50, size=rows).astype(np.float32) / np.float32(10)
+    return pd.DataFrame({
+        'City': pd.Series(cities).astype('category'),
+        'Price range': rng.integers(1, 5, size=rows).astype(np.int8),
+        'Aggregate rating': np.where(rng.random(rows) < 0.05, np.nan, ratings).astype(np.float32),
+        'Votes': rng.integers(0, 500, size=rows).astype(np.int32),
+    })
+
+
+def chunks(df, size=300):
+    return [df.iloc[start:start + size] for start in range(0, len(df), size)]
+
+
+def test_counts_match_value_counts_across_chunks():
+    df = frame()
+    accumulator = CountAccumulator()
+    for chunk in chunks(df):
+        accumulator.add(Grouper(chunk).first_seen('Price range'))
+    expected = df['Price range'].value_counts()
+    result = accumulator.to_series()
+    assert result.index.tolist() == expected.index.tolist()
+    assert result.tolist() == expected.tolist()
+
+
+def test_counts_keep_value_counts_tie_order():
+    # Every key has the same count, so only the tie order tells the two apart
+    keys = pd.Series(['b', 'c', 'a', 'd', 'e', 'f'] * 5, dtype=object)
+    accumulator = CountAccumulator()
+    for chunk in chunks(keys.to_frame('key'), size=4):
+        accumulator.add(Grouper(chunk).first_seen('key'))
+    assert accumulator.to_series().index.tolist() == keys.value_counts().index.tolist()
+
+
+def test_merged_and_subtracted_counts():
+    df = frame()
+    first, second = CountAccumulator(), CountAccumulator()
+    first.update(df['City'].iloc[:1000])
+    second.update(df['City'].iloc[1000:])
+    merged = first.merge(second)
+    assert dict(merged.counts) == df['City'].value_counts().to_dict()
+    assert merged.subtract(second).counts == +Counter(df['City'].iloc[:1000].value_counts().to_dict())
+
+
+def test_means_match_groupby_mean_across_chunks():
+    df = frame()
+    accumulator = MeanAccumulator()
+    for chunk in chunks(df):
+        part = MeanAccumulator()
+        part.update(chunk['City'], chunk['Aggregate rating'])
+        accumulator.merge(part)
+    # groupby() averages float32 ratings in float32
+    expected = df.groupby('City', observed=True)['Aggregate rating'].mean().astype('float64')
+    expected.index = expected.index.astype(object)
+    tm.assert_series_equal(accumulator.to_series(), expected, check_names=False, check_index_type=False, rtol=1e-6)
+
+
+def test_integer_means_match_groupby_mean():
+    df = frame()
+    accumulator = IntegerMeanAccumulator()
+    for chunk in chunks(df):
+        accumulator.update(chunk['Price range'], chunk['Votes'])
+    expected = df.groupby('Price range')['Votes'].mean()
+    tm.assert_series_equal(accumulator.to_series(), expected, check_names=False, check_index_type=False)
+
+    removed = IntegerMeanAccumulator()
+    removed.update(df['Price range'].iloc[:500], df['Votes'].iloc[:500])
+    expected = df.iloc[500:].groupby('Price range')['Votes'].mean()
+    tm.assert_series_equal(accumulator.subtract(removed).to_series(), expected, check_names=False, check_index_type=False)